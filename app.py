@@ -1,14 +1,43 @@
+import time  # at the top of your file
+
+_run_started = time.perf_counter()
+
 import streamlit as st
-import openai
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
-import re
 import base64
-import json
-import time  # at the top of your file
-from deep_translator import GoogleTranslator
 
-max_wait = 15  # seconds
-elapsed = 0
+from pillai.admin import is_admin_request, render_admin_page
+from pillai.answer import (
+    answer_question, clean_answer, finish_answer, medsafe_footer, prepare_question, route_question,
+    stream_chat, stream_thread_run, write_stream, write_translated_stream,
+)
+from pillai.cache import cache_key, get_answer_cache
+from pillai.citations import Citations, get_file_names, with_cited
+from pillai.conversation import Conversation
+from pillai.engine import get_engine
+from pillai.medicines import complete_question, get_medicine_index
+from pillai.metrics import Trace, metrics
+from pillai.retrieval import get_retrieval_index
+from pillai.router import get_router
+from pillai.runs import wait_for_run
+from pillai.sessions import THREAD_TRUNCATION, get_session_registry
+from pillai.singleflight import follow, in_flight
+from pillai.timing import rerun_stats
+from pillai.translation import TranslationPipeline, get_translator
+from pillai.upstream import UpstreamError, get_upstream
+from pillai.warmer import start_cache_warmer
+
+max_wait = 15  # seconds a memory-mode run may take before we cancel it
+# Memory mode keeps the conversation in the session ("local") or in an
+# Assistants thread ("assistants", the original behaviour). By default
+# ("auto") it is local only when a retrieval index can ground the answers;
+# without one, file_search on the assistant is the only grounding there is.
+memory_backend = os.getenv("PILLAI_MEMORY", "auto")
+# Show answers token by token as they're generated (PILLAI_STREAM=0 to turn off)
+stream_answers = os.getenv("PILLAI_STREAM", "1") != "0"
+# While streaming, translate finished paragraphs as the rest is still generated
+pipeline_translation = os.getenv("PILLAI_PIPELINE_TRANSLATION", "1") != "0"
 
 # Page config
 st.set_page_config(page_title="Pill-AI 2.0", page_icon="💊", layout="wide")
@@ -105,11 +134,40 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Logo
+# Process-wide resources: built on the first run, reused by every rerun and session
+@st.cache_resource
 def get_base64_image(path):
     with open(path, "rb") as img_file:
         return f"data:image/png;base64,{base64.b64encode(img_file.read()).decode()}"
 
+
+@st.cache_resource
+def get_label_tables():
+    from pillai import labels
+    return labels
+
+
+@st.cache_resource
+def get_openai_client(api_key):
+    import openai  # deferred: only needed once a question is actually sent
+    # Retries, deadlines and the circuit breaker live in pillai.upstream
+    return openai.OpenAI(api_key=api_key, max_retries=0)
+
+
+@st.cache_resource
+def get_shared_resources():
+    # Answer cache (memory, then the SQLite file on disk), the medicine lookup
+    # over medsafe_source_links_cleaned.json, and the memory-mapped BM25 index
+    # over CMI leaflet text (None until one is built)
+    return get_answer_cache(), get_medicine_index(), get_retrieval_index()
+
+
+# Hidden metrics page (?admin=<PILLAI_ADMIN_TOKEN>)
+if is_admin_request():
+    render_admin_page(get_shared_resources()[0], get_translator())
+    st.stop()
+
+# Logo
 if os.path.exists("pillai_logo.png"):
     logo_base64 = get_base64_image("pillai_logo.png")
     st.markdown(f"<div style='text-align: center;'><img src='{logo_base64}' width='240' style='margin-bottom: 10px;'></div>", unsafe_allow_html=True)
@@ -117,152 +175,15 @@ if os.path.exists("pillai_logo.png"):
 # Language selector
 language = st.selectbox("\U0001f310 Choose answer language:", ["English", "Te Reo Māori", "Samoan", "Mandarin"])
 
-labels = {
-    "English": {
-        #"prompt": "Ask a medicine question:",
-        "placeholder": "💡 Ask a medication related question",
-        "send": "Send",
-        "thinking": "Thinking...",
-       # "tagline": "Helping Kiwis understand medicines, safely.",
-        "empty": "Please enter a question.",
-        "error": "The assistant failed to complete the request.",
-        "disclaimer": "⚠️ Pill-AI is not a substitute for professional advice from your pharmacist or doctor. Please contact them or Healthline (0800 611 116) if you have any questions or concerns.",
-        "privacy_title": "🔐 Privacy Policy – Click to expand",
-        "privacy": """### 🛡️ Pill-AI Privacy Policy (Prototype Version)
-
-Welcome to Pill-AI — your trusted medicines advisor. This is a prototype to test if a tool like this can help people learn about their medicines using trusted Medsafe resources.
-
-**📌 What we collect**  
-– The questions you type into the chat box  
-
-**🔁 Who else is involved**  
-– OpenAI (for generating answers)  
-– Streamlit (to host the app)  
-– Google (for hosting and analytics)
-
-**👶 Users under 16**  
-We don’t ask for names, emails, or any personal information.
-
-**🗑️ Temporary data**  
-All data will be deleted after testing. This is a prototype.
-
-**📬 Questions?**  
-Contact us: pillai.nz.contact@gmail.com
-
-*Pill-AI is not a substitute for professional medical advice.*"""
-    },
-    "Te Reo Māori": {
-      #  "prompt": "Pātaihia tētahi pātai e pā ana ki te rongoā:",
-        "placeholder": "💡 Hei tauira: Ka pai rānei te tango i te ibuprofen me te Panadol?",
-        "send": "Tukua",
-        "thinking": "E whakaaro ana...",
-      #  "tagline": "Āwhinatia ngā Kiwi kia mārama ki ā rātou rongoā mā ngā kōrero mai i a Medsafe.",
-        "empty": "Tēnā koa, tuhia he pātai.",
-        "error": "I rahua te kaiawhina ki te whakaoti i te tono.",
-        "disclaimer": "⚠️ Ehara a Pill-AI i te kaiārahi hauora tōtika. Me toro atu ki te rata, te kai rongoā rānei.",
-        "privacy_title": "🔐 Kaupapahere Tūmataiti – Pāwhiritia kia kite",
-        "privacy": """### 🛡️ Kaupapahere Tūmataiti o Pill-AI (Putanga Whakamātau)
-
-Nau mai ki a Pill-AI — tō kaiāwhina rongoā pono. He putanga whakamātau tēnei hei āwhina i te iwi kia mārama ki ā rātou rongoā mā ngā rauemi Medsafe.
-
-**📌 Ka kohia**  
-– Ngā pātai ka tuhia e koe  
-
-**🔁 Ko wai anō e uru ana**  
-– OpenAI (hei hanga whakautu)  
-– Streamlit (hei tuku i te pae tukutuku)  
-– Google (hei manaaki me te aromātai)
-
-**👶 Tamariki i raro i te 16**  
-Kāore mātou e tono mō ō ingoa, īmēra, rānei.
-
-**🗑️ Raraunga poto noa**  
-Ka mukua katoatia ngā raraunga i muri i te wā whakamātau. He putanga whakamātau tēnei.
-
-**📬 Pātai?**  
-Whakapā mai: pillai.nz.contact@gmail.com
-
-*Ehara a Pill-AI i te whakakapi mō ngā tohutohu hauora.*"""
-    },
-    "Samoan": {
-     #   "prompt": "Fesili i se fesili e uiga i fualaau:",
-        "placeholder": "💡 Fa'ata'ita'iga: E mafai ona ou inuina le ibuprofen ma le Panadol?",
-        "send": "Auina atu",
-        "thinking": "O mafaufau...",
-      #  "tagline": "Fesoasoani i tagata Niu Sila ia malamalama i a latou fualaau e ala i fa'amatalaga fa'atuatuaina mai le Medsafe.",
-        "empty": "Fa'amolemole tusia se fesili.",
-        "error": "Le mafai e le fesoasoani ona tali atu.",
-        "disclaimer": "⚠️ E le suitulaga Pill-AI i se foma'i moni. Fa'amolemole fa'afeso'ota'i se foma'i po'o se fomai fai fualaau.",
-        "privacy_title": "🔐 Faiga Fa'alilolilo – Kiliki e faitau",
-        "privacy": """### 🛡️ Faiga Fa'alilolilo a Pill-AI (Fa'ata'ita'iga)
-
-Afio mai i Pill-AI — lau fesoasoani i fualaau. O se fa'ata'ita'iga lenei e fesoasoani i tagata ia malamalama i fualaau e fa'aaogaina ai fa'amatalaga mai Medsafe.
-
-**📌 Mea matou te pueina**  
-– Fesili e te tusia i le pusa fesili  
-
-**🔁 O ai e fesoasoani**  
-– OpenAI (mo tali atamai)  
-– Streamlit (mo le upega tafa'ilagi)  
-– Google (mo le talimalo ma le iloiloga)
-
-**👶 I lalo o le 16 tausaga**  
-Matou te le aoina ni igoa, imeli, po'o fa'amatalaga patino.
-
-**🗑️ Fa'amatalaga le tumau**  
-O fa'amatalaga uma o le a tapea pe a uma le vaitaimi o le fa'ata'ita'iga.
-
-**📬 Fesili?**  
-Imeli: pillai.nz.contact@gmail.com
-
-*Pill-AI e le suitulaga i fautuaga fa'apolofesa tau soifua mālōlōina.*"""
-    },
-    "Mandarin": {
-  #      "prompt": "请提出一个与药物有关的问题：",
-        "placeholder": "💡 例如：布洛芬和扑热息痛可以一起吃吗？",
-        "send": "发送",
-        "thinking": "思考中...",
-   #     "tagline": "通过 Medsafe 的可靠信息帮助新西兰人了解他们的药物。",
-        "empty": "请输入一个问题。",
-        "error": "助手未能完成请求。",
-        "disclaimer": "⚠️ Pill-AI 不能替代专业医疗建议。请咨询医生或药剂师。",
-        "privacy_title": "🔐 隐私政策 – 点击展开",
-        "privacy": """### 🛡️ Pill-AI 隐私政策（测试版）
-
-欢迎使用 Pill-AI —— 您值得信赖的用药助手。本工具为测试版本，帮助用户通过 Medsafe 学习药品信息。
-
-**📌 我们收集的信息**  
-– 您在对话框中输入的问题  
-
-**🔁 涉及的平台**  
-– OpenAI（用于生成回答）  
-– Streamlit（用于网站托管）  
-– Google（托管和分析）
-
-**👶 16岁以下用户**  
-我们不会索取您的姓名、电邮或其他个人信息。
-
-**🗑️ 数据处理**  
-这是一个测试版本。所有数据将在测试结束后删除。
-
-**📬 联系方式**  
-邮箱：pillai.nz.contact@gmail.com
-
-*Pill-AI 并不能替代专业医疗建议。*"""
-    }
-}
-
+tables = get_label_tables()
+labels = tables.labels
+faq_sections = tables.faq_sections
+faq_titles = tables.faq_titles
+lang_codes = tables.lang_codes
 
 # Get selected labels
 L = labels.get(language, labels["English"])
 
-medsafe_footers = {
-    "English": "\n\n---\n_This information has been sourced from Medsafe NZ._ [https://www.medsafe.govt.nz/medicines/infoSearch.asp](https://www.medsafe.govt.nz/medicines/infoSearch.asp)",
-    "Te Reo Māori": "\n\n---\n_I ahu mai tēnei pārongo i Medsafe Aotearoa._ [https://www.medsafe.govt.nz/medicines/infoSearch.asp](https://www.medsafe.govt.nz/medicines/infoSearch.asp)",
-    "Samoan": "\n\n---\n_O lenei fa'amatalaga e sau mai Medsafe Niu Sila._ [https://www.medsafe.govt.nz/medicines/infoSearch.asp](https://www.medsafe.govt.nz/medicines/infoSearch.asp)",
-    "Mandarin": "\n\n---\n_本信息来自新西兰 Medsafe。_ [https://www.medsafe.govt.nz/medicines/infoSearch.asp](https://www.medsafe.govt.nz/medicines/infoSearch.asp)"
-}
-medsafe_footer = medsafe_footers.get(language, medsafe_footers["English"])
 
 # OpenAI setup
 api_key = st.secrets.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
@@ -270,10 +191,15 @@ if not api_key:
     st.error("OpenAI API key is not configured.")
     st.stop()
 
-client = openai.OpenAI(api_key=api_key)
 ASSISTANT_ID = "asst_dslQlYKM5FYGVEWj8pu7afAt"
 
-lang_codes = {"Te Reo Māori": "mi", "Samoan": "sm", "Mandarin": "zh-CN"}
+answer_cache, medicine_index, retrieval_index = get_shared_resources()
+assistants_memory = memory_backend == "assistants" or (memory_backend == "auto" and retrieval_index is None)
+
+# Last activity and state size of this session; idle sessions are reclaimed in the background
+_ctx = get_script_run_ctx()
+if _ctx is not None:
+    get_session_registry(api_key).touch(_ctx.session_id, _ctx.session_state)
 
 # UI Section
 st.markdown("<div class='section'>", unsafe_allow_html=True)
@@ -337,6 +263,19 @@ user_question = st.text_input(
     key="question_input"
 )
 
+# Brand-name typeahead for the word being typed; picking one completes it
+def apply_suggestion():
+    brand = st.session_state.get("medicine_suggestion")
+    if brand:
+        st.session_state["question_input"] = complete_question(st.session_state.get("question_input", ""), brand)
+        st.session_state["medicine_suggestion"] = None
+
+
+suggestions = medicine_index.suggest(user_question) if user_question else []
+if suggestions:
+    st.pills(L["medicine_suggestions"], [s.brand for s in suggestions], key="medicine_suggestion",
+             on_change=apply_suggestion, label_visibility="collapsed")
+
 # Manually insert the send button next to the input
 send_button = st.button(L["send"], use_container_width=False)
 
@@ -375,9 +314,6 @@ with col_center[1]:
         explain_like_12 = st.toggle("✨ Simplify the answer's language", value=False, key="simplify_toggle")
         use_memory = st.toggle("🧠 Memorise previous answers for context in follow-up questions", value=False, key="memory_toggle")
 
-if use_memory and "thread_id" not in st.session_state:
-    st.session_state["thread_id"] = client.beta.threads.create().id
-
 # Override send_clicked to work with button
 send_clicked = send_button and user_question.strip() != ""
 
@@ -394,56 +330,205 @@ if send_clicked:
     if not user_question.strip():
         st.warning(L["empty"])
     else:
+        send_started = time.perf_counter()
+        ttft = None
+        # Per-stage timings, API calls and cache outcomes for this answer
+        trace = Trace(language=language, simplify=explain_like_12, memory=use_memory,
+                      stream=stream_answers)
+        answer_box = st.empty()
+        stream_box = answer_box  # where streamed text goes (shared with followers when leading)
+        flight_leader = False
+        medicines = ()
+        citations = None  # the leaflets an Assistants answer cites
         with st.spinner(f"💬 {L['thinking']}"):
             try:
-                adjusted_question = user_question
-                if explain_like_12:
-                    adjusted_question += " Please explain this in simple language suitable for a 12-year-old (I am not actually 12 though, don’t use slang or colloquialisms, be encouraging)."
-
-                if use_memory:
-                    # Use memory mode
-                    client.beta.threads.messages.create(
-                        thread_id=st.session_state["thread_id"],
-                        role="user",
-                        content=adjusted_question
-                    )
-                    run = client.beta.threads.runs.create(
-                        thread_id=st.session_state["thread_id"],
-                        assistant_id=ASSISTANT_ID
-                    )
-                    while True:
-                        run_status = client.beta.threads.runs.retrieve(
-                            thread_id=st.session_state["thread_id"],
-                            run_id=run.id
-                        )
-                        if run_status.status in ["completed", "failed"]:
-                            break
-                    if run_status.status == "completed":
-                        messages = client.beta.threads.messages.list(
-                            thread_id=st.session_state["thread_id"], limit=1
+                with trace.span("cache_lookup") as span:
+                    # Memory-mode answers depend on the conversation, so never cache them
+                    if use_memory:
+                        answer, span["outcome"] = None, "bypass"
+                    else:
+                        # Exact question, else a cached paraphrase with the same medicines
+                        answer, found = answer_cache.find(user_question, language, explain_like_12)
+                        span["outcome"] = {"memory": "hit", "disk": "hit"}.get(found, found)
+
+                with trace.span("detect_medicines"):
+                    medicines = medicine_index.detect(user_question)
+
+                if answer is None and not use_memory:
+                    # Identical questions already being answered are shared, not repeated
+                    flight_key = cache_key(user_question, language, explain_like_12)
+                    flight, flight_leader = in_flight.begin(flight_key)
+                    if flight_leader:
+                        stream_box = flight.tee(answer_box)
+                    else:
+                        with trace.span("coalesced", outcome="follower"):
+                            answer, warning = follow(answer_box, flight)
+                        if warning:
+                            # The leader's fallback (English or stale answer) applies here too
+                            st.warning(L[warning])
+
+                if answer is None:
+                    client = get_openai_client(api_key)
+                    openai_upstream = get_upstream("openai")
+                    deltas = None
+                    history = ()
+                    conversation = None
+                    if use_memory and not assistants_memory:
+                        # Recent turns plus a summary of older ones, within a token budget
+                        with trace.span("memory_history"):
+                            conversation = st.session_state.get("conversation")
+                            if conversation is None:
+                                conversation = Conversation(client, upstream=openai_upstream)
+                                st.session_state["conversation"] = conversation
+                            history = conversation.history()
+                    # Requests from every session share the engine's connection pool and limits
+                    engine = get_engine(api_key)
+                    target = lang_codes.get(language) if language != "English" else None
+                    # Set when the translator is down and the English answer is shown instead
+                    translation_failed = False
+
+                    if not stream_answers and not (use_memory and assistants_memory):
+                        # Single chat completion, with the local history in memory mode;
+                        # the same pipeline as pillai.batch
+                        question, raw_answer, answer, medicines, translation_failed = answer_question(
+                            client, user_question, language, explain_like_12, medicines, history=history,
+                            trace=trace, engine=engine
                         )
-                        raw_answer = messages.data[0].content[0].text.value
                     else:
-                        raise RuntimeError("Threaded memory response failed.")
+                        # Questions typed in Te Reo, Samoan or Mandarin reach the model in English
+                        question, adjusted_question, medicines, passages = prepare_question(
+                            user_question, explain_like_12, medicines, trace,
+                            None if use_memory and assistants_memory else retrieval_index
+                        )
 
-                else:
-                    # Use fast chat model with no memory
-                    chat_response = client.chat.completions.create(
-                        model="gpt-4",
-                        messages=[{"role": "user", "content": adjusted_question}]
-                    )
-                    raw_answer = chat_response.choices[0].message.content
-
-                # Clean and translate if needed
-                cleaned = re.sub(r'【[^】]*】', '', raw_answer).strip()
-                if language != "English" and language in lang_codes:
-                    translated = GoogleTranslator(source='auto', target=lang_codes[language]).translate(cleaned)
-                    st.success(translated + medsafe_footer)
-                else:
-                    st.success(cleaned + medsafe_footer)
+                        if use_memory and assistants_memory:
+                            citations = Citations(get_file_names(api_key), medicine_index)
+                            # Use memory mode; the thread is only created once a question is sent
+                            if "thread_id" not in st.session_state:
+                                with trace.span("thread_create", api_calls=1):
+                                    st.session_state["thread_id"] = openai_upstream.call(
+                                        client.beta.threads.create, idempotent=False
+                                    ).id
+                            with trace.span("thread_message", api_calls=1):
+                                openai_upstream.call(
+                                    client.beta.threads.messages.create,
+                                    thread_id=st.session_state["thread_id"],
+                                    role="user",
+                                    content=adjusted_question,
+                                    idempotent=False
+                                )
+                            if stream_answers:
+                                deltas = stream_thread_run(
+                                    client, st.session_state["thread_id"], ASSISTANT_ID, max_wait=max_wait,
+                                    upstream=openai_upstream, citations=citations,
+                                    truncation_strategy=THREAD_TRUNCATION
+                                )
+                            else:
+                                with trace.span("run", api_calls=1) as span:
+                                    run = openai_upstream.call(
+                                        client.beta.threads.runs.create,
+                                        thread_id=st.session_state["thread_id"],
+                                        assistant_id=ASSISTANT_ID,
+                                        truncation_strategy=THREAD_TRUNCATION,
+                                        idempotent=False
+                                    )
+                                    # Backs off between polls, cancels the run past max_wait
+                                    # and raises for failed/cancelled/expired/requires_action
+                                    result = wait_for_run(
+                                        client, st.session_state["thread_id"], run.id, max_wait=max_wait
+                                    )
+                                    span["api_calls"] += result.polls
+                                st.session_state["last_run_polls"] = result.polls
+                                with trace.span("messages_list", api_calls=1):
+                                    messages = openai_upstream.call(
+                                        client.beta.threads.messages.list,
+                                        thread_id=st.session_state["thread_id"], limit=1
+                                    )
+                                raw_answer = messages.data[0].content[0].text.value
+                                citations.add(messages.data[0].content[0].text.annotations)
+
+                        else:
+                            # Fast model for simple lookups, strong model for the rest
+                            router = get_router()
+                            route = route_question(question, trace)
+                            if engine is not None:
+                                deltas = router.timed_stream(route.model, engine.stream_chat(
+                                    adjusted_question, model=route.model, passages=passages, history=history
+                                ))
+                            else:
+                                deltas = router.timed_stream(route.model, stream_chat(
+                                    client, adjusted_question, model=route.model, passages=passages,
+                                    upstream=openai_upstream, history=history
+                                ))
+
+                        if deltas is not None and target and pipeline_translation:
+                            # Generation and translation overlap, so they share one span
+                            with trace.span("generate_translate", api_calls=1) as span:
+                                pipeline = TranslationPipeline(get_translator(), target)
+                                raw_answer, answer, ttft = write_translated_stream(
+                                    stream_box, deltas, pipeline, start=send_started
+                                )
+                                span["api_calls"] += pipeline.backend_calls
+                                translation_failed = pipeline.failed
+                                if translation_failed:
+                                    # Untranslated pieces are English already; show it all in English
+                                    answer = clean_answer(raw_answer)
+                                    span["outcome"] = "untranslated"
+                        else:
+                            if deltas is not None:
+                                # Includes progressively rendering the streamed text
+                                with trace.span("generate", api_calls=1):
+                                    raw_answer, ttft = write_stream(stream_box, deltas, start=send_started)
+                            # Clean and translate if needed
+                            answer, translation_failed = finish_answer(raw_answer, language, trace)
+                    if translation_failed:
+                        st.warning(L["translation_unavailable"])
+                    elif not use_memory:
+                        with trace.span("cache_store"):
+                            answer_cache.set(user_question, language, explain_like_12, answer)
+                    if conversation is not None:
+                        # Remembered in English; compacted in the background if over budget
+                        conversation.add(question, clean_answer(raw_answer))
+                    if flight_leader:
+                        flight.finish((answer, "translation_unavailable" if translation_failed else None))
+
+                if citations is not None:
+                    # File names were looked up while the answer streamed
+                    with trace.span("citations") as span:
+                        cited = citations.medicines()
+                        span["outcome"] = "cited" if cited else "none"
+                    medicines = with_cited(cited, medicines)
+
+                # Link the CMI leaflets the answer cites and the medicines the question mentions
+                with trace.span("render"):
+                    answer_box.success(answer + medsafe_footer(language, medicines))
+                # Time from Send to the first text on screen (streamed or final)
+                if ttft is None:
+                    ttft = time.perf_counter() - send_started
+                st.session_state["last_ttft"] = ttft
+                trace.finish()
 
             except Exception as e:
-                st.error(f"{L['error']} \n\nDetails: {str(e)}")
+                # OpenAI down or slow: an expired cached answer beats an error
+                stale = None if use_memory else answer_cache.get_stale(user_question, language, explain_like_12)
+                if stale is not None:
+                    trace.finish("stale")
+                    if flight_leader:
+                        flight.finish((stale, "stale_answer"))
+                    st.warning(L["stale_answer"])
+                    answer_box.success(stale + medsafe_footer(language, medicines))
+                else:
+                    trace.finish("error")
+                    if flight_leader:
+                        flight.fail(e)
+                    answer_box.error(f"{L['error']} \n\nDetails: {str(e)}")
+            finally:
+                if flight_leader:
+                    if not flight.done:
+                        # A rerun or stop (BaseException) interrupted the leader: release the followers
+                        flight.fail(UpstreamError("The answer was cancelled before it finished."))
+                    in_flight.end(flight_key, flight)
+            metrics.record(trace)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -458,206 +543,16 @@ st.markdown(f"""
 with st.expander(L["privacy_title"]):
     st.markdown(L["privacy"])
 
-# FAQ content in multiple languages
-faq_sections = {
-    "English": """
-### ❓ Frequently Asked Questions (FAQ)
-
-#### 💊 About Pill-AI
-**What is Pill-AI?**  
-Pill-AI is a friendly chatbot that helps New Zealanders understand their medicines.  
-**Who is it for?**  
-Everyday Kiwis, especially those who:  
-– Struggle with medical language  
-– Are visually impaired  
-– Prefer simpler explanations  
-– Want quick answers on their phone  
-**Is it free?**  
-Yes.
-
-#### 📚 Where the Info Comes From
-**Where does Pill-AI get its answers?**  
-From Medsafe Consumer Medicine Information (CMI) leaflets.  
-**Can I trust it?**  
-Yes, but always check with a health professional too.
-
-#### 🗨️ Using Pill-AI
-**What can I ask?**  
-– "What is cetirizine for?"  
-– "Can I take ibuprofen with food?"  
-**Does it give medical advice?**  
-No. It only explains medicine info — it doesn’t diagnose or prescribe.  
-**Can I upload a prescription?**  
-Coming soon.
-
-#### 🌐 Languages
-**What languages are supported?**  
-English, Te Reo Māori, Samoan, Mandarin.  
-**Are the translations perfect?**  
-Not always — they use AI. Ask a health worker if unsure.
-
-#### 🔐 Privacy and Safety
-**Is my data private?**  
-Yes. Questions aren't stored.  
-**Is this an emergency service?**  
-No. Call 111 if it’s urgent.
-
-#### 🧪 Feedback and Credits
-**Can I help improve Pill-AI?**  
-Yes — especially if you speak Te Reo or Samoan.  
-**Who made this?**  
-It was developed in Aotearoa NZ using Medsafe info to make medicine info more accessible.
-""",
-    "Te Reo Māori": """
-### ❓ He Pātai Auau
-
-#### 💊 Mō Pill-AI
-**He aha a Pill-AI?**  
-He kaiawhina ā-ipurangi hei whakamārama i ngā rongoā.  
-**Mō wai tēnei?**  
-Mō ngā tāngata katoa — otirā te hunga:  
-– E uaua ana ki te mārama ki ngā kupu hauora  
-– Kua ngoikore te kite  
-– E hiahia ana i ngā whakamārama māmā  
-**He utu āwhina?**  
-Kāo – he kore utu.
-
-#### 📚 Nō hea ngā pārongo?
-**Kei hea e tiki ana a Pill-AI i ngā kōrero?**  
-Mai i ngā tuhinga CMI a Medsafe.  
-**Ka taea te whakawhirinaki?**  
-Āe – engari me ui tonu ki tō rata, ki te kaiwhakarato hauora hoki.
-
-#### 🗨️ Te whakamahi i a Pill-AI
-**He aha ngā pātai ka taea?**  
-– "He aha te mahi a cetirizine?"  
-– "Ka taea te kai me te ibuprofen?"  
-**Ka tuku tohutohu hauora?**  
-Kāo – he whakamārama anake, kāore e tuku tohutohu, āta wānanga rānei.  
-**Ka taea te tuku whakaahua o te rongoā?**  
-Ā tōna wā.
-
-#### 🌐 Ngā Reo
-**Ngā reo tautoko:**  
-Te Reo Māori, Ingarihi, Gagana Sāmoa, Mandarin.  
-**He tika ngā whakamāoritanga?**  
-Kāore i te tino tika i ngā wā katoa – whakamahia mā te āta whakaaro.
-
-#### 🔐 Te Tūmataiti me te Haumaru
-**Ka tiakina taku raraunga?**  
-Āe – kāore mātou e penapena i ngā pātai.  
-**He ratonga ohotata tēnei?**  
-Kāo – waea atu ki te 111 mēnā he ohotata.
-
-#### 🧪 Urupare
-**Ka taea te tuku urupare?**  
-Āe – āwhina mai mēnā e mōhio ana koe ki Te Reo.  
-**Nā wai i waihanga?**  
-Nā tētahi kairangahau i Aotearoa hei āwhina i te marea.
-""",
-    "Samoan": """
-### ❓ Fesili e masani ona fesiligia
-
-#### 💊 E uiga i Pill-AI
-**O le ā le Pill-AI?**  
-O se fesoasoani fa'akomepiuta e fesoasoani ia te oe e malamalama i fualaau.  
-**Mo ai?**  
-Mo tagata uma — aemaise i ē:  
-– E faigatā ona malamalama i le gagana fa'afoma'i  
-– E le lelei le vaai  
-– E mana'o i se fa'amatalaga faigofie  
-**E totogi?**  
-Leai – e fua fua.
-
-#### 📚 O fea mai ai fa'amatalaga?
-**O fea e maua mai ai fa'amatalaga a Pill-AI?**  
-Mai Medsafe – CMI pepa.  
-**E mafai ona fa'atuatuaina?**  
-Ioe – ae fesili pea i lau foma'i.
-
-#### 🗨️ Fa'aoga
-**O le ā e mafai ona ou fesili ai?**  
-– "O le ā le cetirizine?"  
-– "E mafai ona inu ibuprofen ma le taumafataga?"  
-**E foa'i fautuaga fa'afoma'i?**  
-Leai – e fa'amatala atu na'o le fa'amatalaga.  
-**E mafai ona ou lafoina se vaila'au pepa?**  
-O lo'o galue iai.
-
-#### 🌐 Gagana
-**O ā gagana e avanoa?**  
-Gagana Peretania, Te Reo Māori, Gagana Samoa, Mandarin.  
-**E atoatoa faaliliuga?**  
-E le atoatoa – fa'amalie atu.
-
-#### 🔐 Fa'alilolilo ma le Saogalemu
-**E fa'apefea ona puipuia a'u fa'amatalaga?**  
-E le teuina au fesili.  
-**O se auaunaga fa'afuase'i?**  
-Leai – vala'au le 111 pe a manaomia.
-
-#### 🧪 Fesoasoani
-**E mafai ona ou fesoasoani e fa'aleleia?**  
-Ioe – aemaise pe a mafai ona e fesoasoani i le gagana.  
-**O ai na faia?**  
-Na fausia i Niu Sila mo tagata Niu Sila.
-""",
-    "Mandarin": """
-### ❓ 常见问题 (FAQ)
-
-#### 💊 关于 Pill-AI
-**什么是 Pill-AI？**  
-Pill-AI 是一个帮助新西兰人了解药品信息的聊天机器人。  
-**适合谁使用？**  
-适合所有人，特别是：  
-– 难以理解医疗术语的人  
-– 视力不好的人  
-– 想要简明易懂解释的人  
-**是免费的吗？**  
-是的，完全免费。
-
-#### 📚 信息来源
-**Pill-AI 的信息来源是哪里？**  
-来自新西兰 Medsafe 的 CMI（药品说明书）。  
-**这些信息可靠吗？**  
-可靠，但建议同时咨询医生或药剂师。
-
-#### 🗨️ 如何使用 Pill-AI
-**我可以问什么？**  
-– “Cetirizine 有什么作用？”  
-– “饭前可以吃布洛芬吗？”  
-**会提供医疗建议吗？**  
-不会，它只解释药品信息，不提供诊断或处方。  
-**可以上传处方照片吗？**  
-即将推出。
-
-#### 🌐 支持的语言
-**支持哪些语言？**  
-英语、毛利语、萨摩亚语、中文。  
-**翻译准确吗？**  
-并非完全准确，重要问题请咨询专业人士。
-
-#### 🔐 隐私与安全
-**我的问题会被记录吗？**  
-不会，问题不会被存储。  
-**这是不是紧急服务？**  
-不是。如遇紧急情况，请拨打 111。
-
-#### 🧪 意见与反馈
-**我可以帮助改进吗？**  
-可以，尤其是懂双语的用户。  
-**这个工具是谁做的？**  
-由新西兰团队开发，目的是让药品信息更易懂。
-"""
-}
-
-# Add FAQ section using language-based selection
-faq_title = {
-    "English": "❓ FAQ – Click to expand",
-    "Te Reo Māori": "❓ He Pātai Auau – Pāwhiritia kia kite",
-    "Samoan": "❓ Fesili masani – Kiliki e faitau",
-    "Mandarin": "❓ 常见问题 – 点击展开"
-}.get(language, "❓ FAQ – Click to expand")
+# FAQ section using language-based selection
+faq_title = faq_titles.get(language, faq_titles["English"])
 
 with st.expander(faq_title):
     st.markdown(faq_sections.get(language, faq_sections["English"]))
+
+# Precompute answers to the common questions on a background thread (once per process)
+start_cache_warmer(api_key)
+
+# Rerun timing: cold start vs warm reruns, with Send clicks apart (add ?timings=1 to the URL to see them)
+rerun_stats.record(_run_started, send=send_clicked)
+if st.query_params.get("timings"):
+    st.caption(f"⏱️ {rerun_stats.report()}")
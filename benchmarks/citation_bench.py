@@ -0,0 +1,114 @@
+"""Cost of resolving the assistant's file citations while an answer streams.
+
+Streams an Assistants run from the fake OpenAI server. The answer cites
+``--citations`` random CMI leaflets, and its 【n:i†source】 markers are split
+across deltas. Each round consumes the stream once without a resolver and
+once with Citations collecting the annotations, then resolves them to
+leaflet links. Reports the stream time both ways, the time rendering waits
+for the links, and whether every cited leaflet was linked. A second pass
+leaves a third of the files out of the listing, so they are looked up one
+by one while the answer streams (each lookup takes 50 ms).
+
+    python benchmarks/citation_bench.py [--rounds 20] [--citations 12]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai  # noqa: E402
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from pillai.answer import clean_answer, stream_thread_run  # noqa: E402
+from pillai.citations import Citations, FileNames  # noqa: E402
+from pillai.medicines import get_medicine_index  # noqa: E402
+
+PARAGRAPH = ("Take it with food or milk to avoid an upset stomach, and do not take more than "
+             "the dose on the label")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(client, server, index, make_names, rounds):
+    plain_ms, cited_ms, wait_ms = [], [], []
+    complete = retrieved = 0
+    thread_id = client.beta.threads.create().id
+    expected = [index.from_filename(server.files[f]).url for f in dict.fromkeys(server.citations.values())]
+    for _ in range(rounds):
+        start = time.perf_counter()
+        text = "".join(stream_thread_run(client, thread_id, "asst_fake"))
+        plain_ms.append((time.perf_counter() - start) * 1000)
+
+        names = make_names()
+        citations = Citations(names, index)
+        start = time.perf_counter()
+        cited_text = "".join(stream_thread_run(client, thread_id, "asst_fake", citations=citations))
+        cited_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        urls = [m.url for m in citations.medicines()]
+        wait_ms.append((time.perf_counter() - start) * 1000)
+        complete += urls == expected and clean_answer(cited_text) == clean_answer(text)
+        retrieved += names.stats["retrieved"]
+    return {
+        "stream_ms": round(statistics.median(plain_ms), 2),
+        "stream_with_citations_ms": round(statistics.median(cited_ms), 2),
+        "render_wait_ms": {"p50": round(statistics.median(wait_ms), 3), "p99": round(percentile(wait_ms, 99), 3)},
+        "all_linked": f"{complete}/{rounds}",
+        "files_looked_up": retrieved,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--citations", type=int, default=12, help="leaflets cited per answer")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    warnings.filterwarnings("ignore", category=DeprecationWarning)  # the Assistants API
+
+    index = get_medicine_index()
+    leaflets = rng.sample(sorted({m.url.rsplit("/", 1)[-1] for m in index.medicines}), args.citations)
+    files = {f"file-{n}": name for n, name in enumerate(leaflets)}
+    citations = {f"【4:{n}†source】": file_id for n, file_id in enumerate(files)}
+    answer = "\n\n".join(f"{PARAGRAPH} {n}{marker}." for n, marker in enumerate(citations))
+    server = FakeOpenAI(answer=answer, first_token_delay=0, token_delay=0.002, citations=citations,
+                        files=files).start()
+    client = openai.OpenAI(api_key="x", base_url=server.base_url, max_retries=0)
+
+    def retrieve(file_id):
+        time.sleep(0.05)  # a files.retrieve round trip
+        return client.files.retrieve(file_id)
+
+    listed = FileNames(lambda: client.files.list(purpose="assistants"), retrieve).prefetch()
+    listed._listing.result()
+    results = {"answer_chars": len(answer), "deltas": len(server.tokens()),
+               "listed": run(client, server, index, lambda: listed, args.rounds)}
+
+    # Files uploaded after the listing: a fresh FileNames per round, so every
+    # round looks them up while its answer streams
+    hidden = set(list(files)[::3])
+
+    def late():
+        names = FileNames(lambda: [f for f in client.files.list(purpose="assistants") if f.id not in hidden],
+                          retrieve).prefetch()
+        names._listing.result()
+        return names
+
+    results["looked_up"] = run(client, server, index, late, args.rounds)
+    server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Offline end-to-end latency benchmark for app.py.
+
+Drives the real Streamlit script through ``AppTest`` against the local
+fake OpenAI server (benchmarks/fake_openai.py) and the fake translator, for
+every language x simplify x memory combination. For each scenario it
+reports p50/p95/p99 end-to-end latency of the Send click, time to first
+render (st.session_state["last_ttft"]), upstream API calls per answer and
+the process's peak RSS. Results are written as JSON so runs can be diffed
+between commits.
+
+    python benchmarks/e2e_bench.py --iterations 20 --out bench.json [--memory local|assistants]
+    python benchmarks/e2e_bench.py --compare old.json bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai import FakeOpenAI  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+LANGUAGES = ["English", "Te Reo Māori", "Samoan", "Mandarin"]
+QUESTIONS = [
+    "Can I take ibuprofen with Panadol?",
+    "What is metformin used for?",
+    "Can I take voltaren with food?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(values):
+    ms = [v * 1000 for v in values if v is not None]
+    return {
+        "p50": round(percentile(ms, 50), 1) if ms else None,
+        "p95": round(percentile(ms, 95), 1) if ms else None,
+        "p99": round(percentile(ms, 99), 1) if ms else None,
+        "mean": round(statistics.fmean(ms), 1) if ms else None,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ask(question, language, simplify, memory, timeout):
+    """Load the app, set the toggles, click Send; returns (seconds, ttft, error)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.secrets["OPENAI_API_KEY"] = "sk-fake"
+    at.run()
+    at.selectbox[0].set_value(language)
+    at.toggle(key="simplify_toggle").set_value(simplify)
+    at.toggle(key="memory_toggle").set_value(memory)
+    at.run()
+    at.text_input(key="question_input").set_value(question)
+    at.button[0].click()
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    error = at.error[0].value if len(at.error) else None
+    if at.exception:
+        error = at.exception[0].value
+    return elapsed, at.session_state["last_ttft"] if "last_ttft" in at.session_state else None, error
+
+
+def run(args):
+    server = FakeOpenAI(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["PILLAI_TRANSLATOR"] = f"fake:{args.translate_delay}"
+    os.environ["PILLAI_WARM"] = "0"  # warm-up answers would skew the cache and call counts
+    os.environ["PILLAI_STREAM"] = "0" if args.no_stream else "1"
+    os.environ["PILLAI_MEMORY"] = args.memory
+    cache_dir = tempfile.mkdtemp(prefix="pillai-bench-")
+    os.environ["PILLAI_CACHE_DB"] = os.path.join(cache_dir, "cache.sqlite3")
+    os.chdir(ROOT)
+
+    scenarios = []
+    counter = itertools.count()
+    try:
+        # One warm-up so cold-start costs don't land in the first scenario
+        ask("warm up", "English", False, False, args.timeout)
+        for language, simplify, memory in itertools.product(LANGUAGES, (False, True), (False, True)):
+            server.reset_counts()
+            latencies, ttfts, errors = [], [], 0
+            for i in range(args.iterations):
+                # A unique suffix keeps every request a cache miss
+                question = f"{QUESTIONS[i % len(QUESTIONS)]} (#{next(counter)})"
+                if args.cached:
+                    question = QUESTIONS[i % len(QUESTIONS)]
+                elapsed, ttft, error = ask(question, language, simplify, memory, args.timeout)
+                latencies.append(elapsed)
+                ttfts.append(ttft)
+                errors += error is not None
+            calls = dict(server.calls)
+            scenario = {
+                "language": language,
+                "simplify": simplify,
+                "memory": memory,
+                "iterations": args.iterations,
+                "errors": errors,
+                "e2e_ms": summarize(latencies),
+                "first_render_ms": summarize(ttfts),
+                "api_calls": calls,
+                "api_calls_per_answer": round(sum(calls.values()) / args.iterations, 2),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+            scenarios.append(scenario)
+            print(f"{language:13} simplify={simplify!s:5} memory={memory!s:5} "
+                  f"e2e p50={scenario['e2e_ms']['p50']}ms p95={scenario['e2e_ms']['p95']}ms "
+                  f"first render p50={scenario['first_render_ms']['p50']}ms "
+                  f"calls/answer={scenario['api_calls_per_answer']} errors={errors}", file=sys.stderr)
+    finally:
+        server.stop()
+
+    return {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "iterations": args.iterations,
+            "first_token_delay": args.first_token_delay,
+            "token_delay": args.token_delay,
+            "translate_delay": args.translate_delay,
+            "stream": not args.no_stream,
+            "memory_backend": args.memory,
+            "cached": args.cached,
+        },
+        "scenarios": scenarios,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(s["language"], s["simplify"], s["memory"]): s for s in json.load(f)["scenarios"]}
+    with open(new_path) as f:
+        new = json.load(f)["scenarios"]
+    for s in new:
+        before = old.get((s["language"], s["simplify"], s["memory"]))
+        if not before:
+            continue
+        a, b = before["e2e_ms"]["p50"], s["e2e_ms"]["p50"]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{s['language']:13} simplify={s['simplify']!s:5} memory={s['memory']!s:5} "
+              f"p50 {a} -> {b} ms ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pill-AI end-to-end latency benchmark")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--translate-delay", type=float, default=0.15)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--no-stream", action="store_true", help="benchmark the blocking paths")
+    parser.add_argument("--memory", choices=("local", "assistants"), default="assistants",
+                        help="where memory-mode scenarios keep the conversation (PILLAI_MEMORY)")
+    parser.add_argument("--cached", action="store_true", help="repeat questions so the cache can hit")
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = run(args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
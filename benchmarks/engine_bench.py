@@ -0,0 +1,147 @@
+"""Hundreds of concurrent sessions through the engine vs on their own threads.
+
+``--sessions`` threads (like Streamlit script threads) each stream one
+answer from the fake OpenAI server at the same moment. The server runs in
+its own process, so its threads don't count against this one. In the first run
+every thread makes its own blocking request through a shared synchronous
+client, like the app did before the engine. In the second they iterate
+``Engine.stream_chat``. Both runs report the wall time and the time to
+the first and the last token; the engine run also reports its limiters.
+
+A third run checks priorities. The engine's OpenAI limit is cut to
+``--limit``, ``--batch`` batch completions are queued, and then
+``--interactive`` interactive ones arrive. It reports how long each kind
+waited and the deepest queue.
+
+    python benchmarks/engine_bench.py [--sessions 300] [--batch 400] [--interactive 40] [--limit 32]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai  # noqa: E402
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from pillai.answer import stream_chat  # noqa: E402
+from pillai.engine import BATCH, INTERACTIVE, Engine  # noqa: E402
+from pillai.upstream import Upstream  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summary(values):
+    return {"p50": round(statistics.median(values), 3), "p99": round(percentile(values, 99), 3)}
+
+
+def sessions(count, make_deltas):
+    """``count`` threads each consume ``make_deltas()`` at once; timings in seconds."""
+    barrier = threading.Barrier(count + 1)
+    ttft, total, errors = [], [], []
+
+    def session():
+        barrier.wait()
+        start = time.perf_counter()
+        first = None
+        try:
+            for _ in make_deltas():
+                if first is None:
+                    first = time.perf_counter() - start
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return {
+        "wall_s": round(time.perf_counter() - started, 2),
+        "ttft_s": summary(ttft),
+        "total_s": summary(total),
+        "errors": len(errors),
+    }
+
+
+def serve(urls, **options):
+    server = FakeOpenAI(**options).start()
+    urls.put(server.base_url)
+    threading.Event().wait()
+
+
+def priorities(args):
+    engine = Engine("x", upstream_limits={"openai": args.limit, "translator": 1})
+    waits = {"batch": [], "interactive": []}
+
+    def timed(kind, priority):
+        start = time.perf_counter()
+        future = engine.complete_chat("What is ibuprofen for?", priority=priority)
+        future.add_done_callback(lambda _: waits[kind].append(time.perf_counter() - start))
+        return future
+
+    jobs = [timed("batch", BATCH) for _ in range(args.batch)]
+    time.sleep(0.5)  # the batch backlog has built up
+    queued = engine.report()["limits"][1]
+    jobs += [timed("interactive", INTERACTIVE) for _ in range(args.interactive)]
+    for job in jobs:
+        job.result()
+    report = engine.report()
+    engine.stop()
+    return {
+        "limit": args.limit,
+        "batch_s": summary(waits["batch"]),
+        "interactive_s": summary(waits["interactive"]),
+        "batch_queued_when_interactive_arrived": queued["queued_batch"],
+        "max_queue": report["limits"][1]["max_queue"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=40)
+    parser.add_argument("--limit", type=int, default=32, help="engine OpenAI limit for the priority run")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    urls = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(urls,),
+                                     kwargs={"first_token_delay": 0.3, "token_delay": 0.02, "chars_per_token": 16}, daemon=True)
+    server.start()
+    base_url = os.environ["OPENAI_BASE_URL"] = urls.get()
+    results = {"sessions": args.sessions}
+
+    client = openai.OpenAI(api_key="x", base_url=base_url, max_retries=0)
+    upstream = Upstream("openai", hedge=False)
+    results["threads"] = sessions(args.sessions, lambda: stream_chat(client, "What is ibuprofen for?",
+                                                                     upstream=upstream))
+
+    engine = Engine("x")
+    results["engine"] = sessions(args.sessions, lambda: engine.stream_chat("What is ibuprofen for?"))
+    results["engine"]["limits"] = engine.report()["limits"][:2]
+    engine.stop()
+
+    results["priorities"] = priorities(args)
+    server.terminate()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""A local stand-in for the Medsafe CMI leaflet server.
+
+Serves a small generated CMI-style PDF for any path, with ETag and Last-Modified
+headers, answers conditional requests with 304, and keeps connections
+alive. Paths can be made to 404 (``missing``) or to change content
+(``touch``), and every response can be delayed to mimic a remote server.
+
+    server = FakeMedsafe(latency=0.05).start()
+    python -m pillai.links verify --rewrite https://www.medsafe.govt.nz=<server.base_url>
+    server.stop()
+
+Run it standalone with ``python benchmarks/fake_medsafe.py --port 8766``.
+"""
+import argparse
+import email.utils
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+EPOCH = 1_700_000_000  # Last-Modified of unchanged leaflets
+
+
+def leaflet_text(name, version=0):
+    """CMI-style leaflet text for ``name``, with the usual section headings."""
+    return [
+        f"{name} Consumer Medicine Information (version {version})",
+        f"1. Why am I using {name}?",
+        f"{name} is used to treat pain, fever and inflammation.",
+        f"2. What should I know before I use {name}?",
+        f"Do not use {name} if you are allergic to it. Tell your doctor if you are pregnant.",
+        "3. What if I am taking other medicines?",
+        f"Some medicines may interfere with {name}, for example warfarin and lithium.",
+        f"4. How do I use {name}?",
+        "Take one tablet every four to six hours with food. Do not take more than four doses a day.",
+        "5. Are there any side effects?",
+        "Tell your doctor if you notice nausea, stomach pain, dizziness or a rash.",
+        "6. Product details",
+        f"{name} tablets are white and round.",
+    ]
+
+
+def leaflet_pdf(path, version=0, size=48 * 1024):
+    """A minimal valid PDF whose text depends on the path and version."""
+    seed = hashlib.sha256(f"{path}#{version}".encode()).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0] or "Leaflet"
+    lines = [line.replace("\\", "").replace("(", "").replace(")", "") for line in leaflet_text(name, version)]
+    stream = ("BT /F1 11 Tf 14 TL 72 760 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET").encode()
+    padding = (seed * (size // len(seed) + 1))[:size].encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    out += b"%" + padding + b"\n"  # a comment, to give leaflets a realistic size
+    return bytes(out)
+
+
+class FakeMedsafe:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, size=48 * 1024):
+        self.latency = latency
+        self.size = size
+        self.missing = set()
+        self.versions = Counter()  # path -> content version
+        self.calls = Counter()  # "200", "304", "404", "connections"
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def touch(self, path):
+        """Publish a new version of the leaflet at ``path``."""
+        with self._lock:
+            self.versions[path] += 1
+
+    def count(self, key):
+        with self._lock:
+            self.calls[key] += 1
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                fake.count("connections")
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if path in fake.missing:
+                    fake.count("404")
+                    body = b"Not found"
+                    self.send_response(404)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                version = fake.versions[path]
+                etag = '"%s"' % hashlib.sha1(f"{path}#{version}".encode()).hexdigest()[:16]
+                modified = email.utils.formatdate(EPOCH + version * 86400, usegmt=True)
+                if self.headers.get("If-None-Match") == etag:
+                    fake.count("304")
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                fake.count("200")
+                body = leaflet_pdf(path, version, fake.size)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Medsafe CMI server")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeMedsafe(port=args.port, latency=args.latency)
+    print(f"Fake Medsafe listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
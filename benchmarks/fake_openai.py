@@ -0,0 +1,392 @@
+"""A local stand-in for the OpenAI HTTP API.
+
+Implements just what Pill-AI calls: chat completions (plain and streamed),
+and the Assistants thread/message/run endpoints including streamed runs.
+Assistant messages carry a file_citation annotation for each citation
+marker in ``citations`` (marker -> file id), and the files endpoints list
+``files`` (file id -> file name).
+Latency, the answer text and the sequence of statuses a polled run goes
+through are configurable, and every request is counted per endpoint.
+
+    server = FakeOpenAI(first_token_delay=0.3, token_delay=0.01).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    ...
+    server.stop()
+
+Faults can be injected to exercise pillai.upstream: ``fail_next`` makes
+the next requests return an error status (optionally with Retry-After),
+``error_rate`` fails a random share of requests and ``slow_rate`` /
+``slow_delay`` stall some of them before answering (``slow_next`` stalls
+exactly the next ones).
+
+    server.fail_next(429, count=2, retry_after=0.1)
+    server.error_rate = 0.2
+
+Run it standalone with ``python benchmarks/fake_openai.py --port 8765``.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DEFAULT_ANSWER = (
+    "Ibuprofen is a non-steroidal anti-inflammatory medicine (NSAID) used to relieve pain, "
+    "fever and inflammation【4:0†source】.\n\n"
+    "**How to take it:**\n"
+    "- Take it with food or milk to avoid an upset stomach.\n"
+    "- Do not take more than the dose on the label.\n\n"
+    "Ibuprofen can usually be taken with paracetamol, but ask your pharmacist if you take "
+    "other medicines or have stomach, kidney or heart problems【4:1†source】."
+)
+
+DEFAULT_FILES = {"file-ibuprofen": "IbuprofenRelieve.pdf", "file-dolomed": "DolomedIbuprofenLiquicap.pdf"}
+DEFAULT_CITATIONS = {"【4:0†source】": "file-ibuprofen", "【4:1†source】": "file-dolomed"}
+
+
+class FakeOpenAI:
+    def __init__(self, host="127.0.0.1", port=0, answer=DEFAULT_ANSWER,
+                 first_token_delay=0.2, token_delay=0.01, chars_per_token=4,
+                 run_states=("queued", "in_progress", "completed"), run_poll_delay=0.0,
+                 error_rate=0.0, error_status=503, slow_rate=0.0, slow_delay=2.0,
+                 citations=None, files=None):
+        self.answer = answer
+        self.citations = DEFAULT_CITATIONS if citations is None else citations
+        self.files = DEFAULT_FILES if files is None else files
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.chars_per_token = chars_per_token
+        self.run_states = list(run_states)
+        self.run_poll_delay = run_poll_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self._faults = []  # (status, retry_after, endpoint or None) for upcoming requests
+        self._stalls = 0  # upcoming requests to stall for slow_delay
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._runs = {}  # run id -> number of times retrieved
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+
+    def fail_next(self, status=503, count=1, retry_after=None, endpoint=None):
+        """Answer the next ``count`` requests (to ``endpoint``, or any) with ``status``."""
+        with self._lock:
+            self._faults.extend([(status, retry_after, endpoint)] * count)
+
+    def slow_next(self, count=1):
+        """Stall the next ``count`` requests for ``slow_delay`` seconds."""
+        with self._lock:
+            self._stalls += count
+
+    def stall(self):
+        """Whether to stall this request."""
+        with self._lock:
+            if self._stalls:
+                self._stalls -= 1
+                return True
+        return bool(self.slow_rate) and random.random() < self.slow_rate
+
+    def fault(self, endpoint):
+        """The (status, retry_after) to fail this request with, or None."""
+        with self._lock:
+            for i, (status, retry_after, target) in enumerate(self._faults):
+                if target in (None, endpoint):
+                    del self._faults[i]
+                    self.calls["faults"] += 1
+                    return status, retry_after
+            if self.error_rate and random.random() < self.error_rate:
+                self.calls["faults"] += 1
+                return self.error_status, None
+        return None
+
+    def next_id(self, prefix):
+        return f"{prefix}_{next(self._ids)}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def tokens(self, text=None):
+        text = self.answer if text is None else text
+        step = self.chars_per_token
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    def annotations(self, text=None):
+        """file_citation annotations for the citation markers in ``text``."""
+        text = self.answer if text is None else text
+        found = []
+        for marker, file_id in self.citations.items():
+            for m in re.finditer(re.escape(marker), text):
+                found.append({"type": "file_citation", "text": marker, "start_index": m.start(),
+                              "end_index": m.end(), "file_citation": {"file_id": file_id}})
+        found.sort(key=lambda a: a["start_index"])
+        for i, annotation in enumerate(found):
+            annotation["index"] = i
+        return found
+
+    def run_status(self, run_id):
+        with self._lock:
+            polls = self._runs.get(run_id, 0)
+            self._runs[run_id] = polls + 1
+        return self.run_states[min(polls, len(self.run_states) - 1)]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+            def _json(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _inject(self, endpoint):
+                """Count the request and apply any injected fault; True if it was answered."""
+                fake.count(endpoint)
+                if fake.stall():
+                    time.sleep(fake.slow_delay)
+                fault = fake.fault(endpoint)
+                if fault is None:
+                    return False
+                status, retry_after = fault
+                data = json.dumps({"error": {"message": f"injected {status}", "type": "server_error"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", f"{retry_after:g}")
+                self.end_headers()
+                self.wfile.write(data)
+                return True
+
+            def _sse_start(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+            def _sse(self, data, event=None):
+                prefix = f"event: {event}\n" if event else ""
+                payload = data if isinstance(data, str) else json.dumps(data)
+                self.wfile.write(f"{prefix}data: {payload}\n\n".encode())
+                self.wfile.flush()
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                m = re.fullmatch(r"/v1/threads/([^/]+)/runs/([^/]+)", path)
+                if m:
+                    if self._inject("runs.retrieve"):
+                        return
+                    if fake.run_poll_delay:
+                        time.sleep(fake.run_poll_delay)
+                    return self._json(run_object(m.group(2), m.group(1), fake.run_status(m.group(2))))
+                if path == "/v1/files":
+                    if self._inject("files.list"):
+                        return
+                    return self._json({"object": "list", "has_more": False,
+                                       "data": [file_object(i, name) for i, name in fake.files.items()]})
+                m = re.fullmatch(r"/v1/files/([^/]+)", path)
+                if m:
+                    if self._inject("files.retrieve"):
+                        return
+                    if m.group(1) not in fake.files:
+                        return self._json({"error": {"message": "No such File object"}}, 404)
+                    return self._json(file_object(m.group(1), fake.files[m.group(1)]))
+                m = re.fullmatch(r"/v1/threads/([^/]+)/messages", path)
+                if m:
+                    if self._inject("messages.list"):
+                        return
+                    return self._json({
+                        "object": "list",
+                        "data": [message_object(fake.next_id("msg"), m.group(1), fake.answer,
+                                                annotations=fake.annotations())],
+                        "first_id": None, "last_id": None, "has_more": False,
+                    })
+                self._json({"error": {"message": f"no route for GET {path}"}}, 404)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                body = self._body()
+                if path == "/v1/chat/completions":
+                    if self._inject("chat.completions"):
+                        return
+                    return self._chat(body)
+                if path == "/v1/threads":
+                    if self._inject("threads.create"):
+                        return
+                    return self._json({"id": fake.next_id("thread"), "object": "thread",
+                                       "created_at": int(time.time()), "metadata": {}})
+                m = re.fullmatch(r"/v1/threads/([^/]+)/messages", path)
+                if m:
+                    if self._inject("messages.create"):
+                        return
+                    return self._json(message_object(fake.next_id("msg"), m.group(1),
+                                                     body.get("content", ""), role="user"))
+                m = re.fullmatch(r"/v1/threads/([^/]+)/runs/([^/]+)/cancel", path)
+                if m:
+                    if self._inject("runs.cancel"):
+                        return
+                    return self._json(run_object(m.group(2), m.group(1), "cancelling"))
+                m = re.fullmatch(r"/v1/threads/([^/]+)/runs", path)
+                if m:
+                    if self._inject("runs.create"):
+                        return
+                    run_id = fake.next_id("run")
+                    if body.get("stream"):
+                        return self._run_stream(m.group(1), run_id)
+                    return self._json(run_object(run_id, m.group(1), "queued"))
+                self._json({"error": {"message": f"no route for POST {path}"}}, 404)
+
+            def do_DELETE(self):
+                path = urlparse(self.path).path
+                m = re.fullmatch(r"/v1/threads/([^/]+)", path)
+                if m:
+                    if self._inject("threads.delete"):
+                        return
+                    return self._json({"id": m.group(1), "object": "thread.deleted", "deleted": True})
+                self._json({"error": {"message": f"no route for DELETE {path}"}}, 404)
+
+            def _chat(self, body):
+                model = body.get("model", "gpt-4")
+                completion_id = fake.next_id("chatcmpl")
+                time.sleep(fake.first_token_delay)
+                if not body.get("stream"):
+                    time.sleep(fake.token_delay * len(fake.tokens()))
+                    return self._json({
+                        "id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": fake.answer}}],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": len(fake.tokens()),
+                                  "total_tokens": 10 + len(fake.tokens())},
+                    })
+                self._sse_start()
+                for i, token in enumerate(fake.tokens()):
+                    if i:
+                        time.sleep(fake.token_delay)
+                    self._sse({
+                        "id": completion_id, "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    })
+                self._sse({
+                    "id": completion_id, "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                })
+                self._sse("[DONE]")
+
+            def _run_stream(self, thread_id, run_id):
+                msg_id = fake.next_id("msg")
+                self._sse_start()
+                self._sse(run_object(run_id, thread_id, "queued"), "thread.run.created")
+                self._sse(run_object(run_id, thread_id, "in_progress"), "thread.run.in_progress")
+                time.sleep(fake.first_token_delay)
+                self._sse(message_object(msg_id, thread_id, "", status="in_progress"),
+                          "thread.message.created")
+                annotations = fake.annotations()
+                pos = 0
+                for i, token in enumerate(fake.tokens()):
+                    if i:
+                        time.sleep(fake.token_delay)
+                    pos += len(token)
+                    # Each annotation goes out with the delta its marker ends in
+                    ended = [a for a in annotations if pos - len(token) < a["end_index"] <= pos]
+                    self._sse({"id": msg_id, "object": "thread.message.delta", "delta": {
+                        "content": [{"index": 0, "type": "text",
+                                     "text": {"value": token, "annotations": ended}}]}},
+                        "thread.message.delta")
+                self._sse(message_object(msg_id, thread_id, fake.answer, annotations=annotations),
+                          "thread.message.completed")
+                self._sse(run_object(run_id, thread_id, "completed"), "thread.run.completed")
+                self._sse("[DONE]", "done")
+
+        return Handler
+
+
+def run_object(run_id, thread_id, status):
+    return {
+        "id": run_id, "object": "thread.run", "created_at": int(time.time()),
+        "thread_id": thread_id, "assistant_id": "asst_fake", "status": status,
+        "model": "gpt-4", "instructions": "", "tools": [], "metadata": {},
+        "parallel_tool_calls": True, "last_error": None, "required_action": None,
+        "truncation_strategy": None, "incomplete_details": None, "usage": None,
+        "response_format": "auto", "tool_choice": "auto",
+    }
+
+
+def file_object(file_id, filename):
+    return {"id": file_id, "object": "file", "bytes": 0, "created_at": int(time.time()),
+            "filename": filename, "purpose": "assistants", "status": "processed"}
+
+
+def message_object(msg_id, thread_id, text, role="assistant", status="completed", annotations=()):
+    return {
+        "id": msg_id, "object": "thread.message", "created_at": int(time.time()),
+        "thread_id": thread_id, "role": role, "status": status, "assistant_id": None,
+        "run_id": None, "attachments": [], "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": list(annotations)}}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake OpenAI API for Pill-AI")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failed with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-delay")
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    args = parser.parse_args()
+    server = FakeOpenAI(port=args.port, first_token_delay=args.first_token_delay,
+                        token_delay=args.token_delay, error_rate=args.error_rate,
+                        slow_rate=args.slow_rate, slow_delay=args.slow_delay)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Fault drill for pillai.upstream against the local fake OpenAI server.
+
+Injects 429s with Retry-After, bursts of 503s, slow responses and a full
+outage, and checks that retries, hedging, the circuit breaker and the
+translator's English fallback behave as intended. Exits non-zero if any
+scenario misbehaves.
+
+    python benchmarks/fault_drill.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai  # noqa: E402
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from pillai.answer import complete_chat  # noqa: E402
+from pillai.translation import FakeBackend, TranslationPipeline, Translator  # noqa: E402
+from pillai.upstream import CircuitBreaker, CircuitOpen, DeadlineExceeded, Upstream  # noqa: E402
+
+
+def chat(client, upstream):
+    return complete_chat(client, "What is ibuprofen?", upstream=upstream)
+
+
+def retry_after_429(server, client):
+    upstream = Upstream("openai", backoff=5.0)
+    server.fail_next(429, count=2, retry_after=0.1, endpoint="chat.completions")
+    started = time.monotonic()
+    chat(client, upstream)
+    elapsed = time.monotonic() - started
+    # Retry-After (0.1s) is used instead of the 5s backoff
+    return upstream.stats["retries"] == 2 and elapsed < 2, f"{upstream.stats} in {elapsed:.2f}s"
+
+
+def burst_of_503s(server, client):
+    upstream = Upstream("openai", backoff=0.05)
+    server.fail_next(503, count=3, endpoint="chat.completions")
+    chat(client, upstream)
+    return upstream.stats["retries"] == 3 and upstream.breaker.state == "closed", str(upstream.stats)
+
+
+def no_retry_for_non_idempotent(server, client):
+    upstream = Upstream("openai", backoff=0.05)
+    server.fail_next(503, endpoint="threads.create")
+    try:
+        upstream.call(client.beta.threads.create, idempotent=False)
+    except openai.APIStatusError:
+        return upstream.stats["retries"] == 0, str(upstream.stats)
+    return False, "the 503 was retried or swallowed"
+
+
+def deadline(server, client):
+    upstream = Upstream("openai", deadline=0.5, retries=0)
+    server.slow_rate, server.slow_delay = 1.0, 2.0
+    started = time.monotonic()
+    try:
+        chat(client, upstream)
+        return False, "slow call did not time out"
+    except DeadlineExceeded:
+        elapsed = time.monotonic() - started
+        return elapsed < 1.0, f"gave up after {elapsed:.2f}s"
+    finally:
+        server.slow_rate = 0.0
+
+
+def hedging(server, client):
+    upstream = Upstream("openai", hedge=True, hedge_min_samples=5)
+    for _ in range(10):
+        chat(client, upstream)
+    server.slow_delay = 2.0
+    started = time.monotonic()
+    for _ in range(6):
+        server.slow_next()  # the first attempt stalls, its hedge doesn't
+        chat(client, upstream)
+    elapsed = time.monotonic() - started
+    # Without hedging each call would take 2s+
+    ok = upstream.stats["hedges"] == upstream.stats["hedge_wins"] == 6 and elapsed < server.slow_delay
+    return ok, f"{upstream.stats} in {elapsed:.2f}s"
+
+
+def breaker_opens(server, client):
+    upstream = Upstream("openai", retries=0, breaker=CircuitBreaker(threshold=3, cooldown=0.5))
+    server.error_rate = 1.0
+    for _ in range(3):
+        try:
+            chat(client, upstream)
+        except openai.APIStatusError:
+            pass
+    before = server.calls["chat.completions"]
+    try:
+        chat(client, upstream)
+        return False, "call went through an open breaker"
+    except CircuitOpen:
+        pass
+    finally:
+        server.error_rate = 0.0
+    if server.calls["chat.completions"] != before:
+        return False, "open breaker still sent a request"
+    time.sleep(0.6)
+    chat(client, upstream)  # half-open trial succeeds and closes it
+    return upstream.breaker.state == "closed", str(upstream.stats)
+
+
+def translator_outage(server, client):
+    class DownBackend(FakeBackend):
+        def translate(self, text, target):
+            raise ConnectionError("translator unreachable")
+
+    upstream = Upstream("translator", retries=1, backoff=0.01, breaker=CircuitBreaker(threshold=2))
+    pipeline = TranslationPipeline(Translator(DownBackend(), upstream=upstream), "mi")
+    pipeline.feed("First paragraph.\n\nSecond paragraph.\n\n")
+    pipeline.close()
+    text = pipeline.result()
+    # Falls back to the English text and the breaker stops further calls
+    ok = pipeline.failed and "First paragraph." in text and upstream.breaker.state == "open"
+    return ok, f"{upstream.stats}, failed={pipeline.failed}"
+
+
+SCENARIOS = [retry_after_429, burst_of_503s, no_retry_for_non_idempotent, deadline,
+             hedging, breaker_opens, translator_outage]
+
+
+def main():
+    server = FakeOpenAI(first_token_delay=0.02, token_delay=0.0).start()
+    client = openai.OpenAI(api_key="drill", base_url=server.base_url, max_retries=0)
+    failures = 0
+    try:
+        for scenario in SCENARIOS:
+            server.reset_counts()
+            try:
+                ok, detail = scenario(server, client)
+            except Exception as e:
+                ok, detail = False, f"{type(e).__name__}: {e}"
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {scenario.__name__:<28} {detail}")
+    finally:
+        server.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cost of detecting the question language, and the translator calls it saves.
+
+Times ``detect_language`` on sample questions in English, Te Reo Māori,
+Samoan and Mandarin and checks that each is detected correctly. Then runs
+a mixed stream of questions about random Medsafe brands through
+``InboundTranslator`` with the fake translator backend and counts its
+calls against translating every question.
+
+    python benchmarks/inbound_bench.py [--questions 5000] [--english 0.85]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pillai.inbound import InboundTranslator, detect_language  # noqa: E402
+from pillai.medicines import get_medicine_index  # noqa: E402
+from pillai.translation import FakeBackend, Translator  # noqa: E402
+
+# Question templates; {m} is a medicine name
+SAMPLES = {
+    None: [
+        "What is {m} used for?", "Can I take {m} with food?", "I take {m}, is ibuprofen ok?",
+        "how often can i take {m}", "{m}", "What's the dose of {m} for a child?",
+        "Is it safe to take {m} while pregnant?", "side effects of {m}",
+        "Can I drink alcohol with {m}?", "My mum takes {m}, can she have aspirin?",
+    ],
+    "mi": [
+        "He aha te {m}?", "Ka taea e au te tango i te {m} me te kai?",
+        "E hia ngā pire ka taea e au te tango ia rā?", "He aha ngā pānga kino o te {m}?",
+        "Me pēhea taku tango i te {m}?", "Ka pai te tango i te {m} i te wā e hapū ana ahau?",
+    ],
+    "sm": [
+        "O le ā le {m}?", "E mafai ona ou inu le {m} ma meaʻai?",
+        "E fia fuālaau e tatau ona ou inu i le aso?", "O ā ni aʻafiaga leaga o le {m}?",
+        "E faʻafefea ona ou inu le {m}?", "E saogalemu le {m} pe a ou maʻitaga?",
+    ],
+    "zh-CN": [
+        "扑热息痛是做什么用的？", "布洛芬可以和食物一起吃吗？", "二甲双胍有什么副作用？",
+        "怀孕期间可以服用扑热息痛吗？", "{m} 副作用",
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--english", type=float, default=0.85, help="share of English questions")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    brands = sorted({m.brand for m in get_medicine_index().medicines})
+    wrong = [(want, question) for want, questions in SAMPLES.items()
+             for question in questions if detect_language(question.format(m="panadol")) != want]
+    detect_us = []
+    for questions in SAMPLES.values():
+        for template in questions:
+            question = template.format(m=rng.choice(brands))
+            for _ in range(200):
+                start = time.perf_counter()
+                detect_language(question)
+                detect_us.append((time.perf_counter() - start) * 1e6)
+    detect_us.sort()
+
+    foreign = [(lang, q) for lang, qs in SAMPLES.items() if lang for q in qs]
+    stream = []
+    for _ in range(args.questions):
+        lang, template = (None, rng.choice(SAMPLES[None])) if rng.random() < args.english else rng.choice(foreign)
+        stream.append((lang, template.format(m=rng.choice(brands))))
+    backend = FakeBackend()
+    inbound = InboundTranslator(Translator(backend))
+    stream_wrong = 0
+    for lang, question in stream:
+        stream_wrong += inbound.to_english(question).source != lang
+    # Without detection every question goes to the translator (memoised the same way)
+    always = FakeBackend()
+    translator = Translator(always)
+    for _, question in stream:
+        translator.translate(question, "en")
+
+    print(json.dumps({
+        "misdetected": wrong,
+        "detect_us": {
+            "p50": round(statistics.median(detect_us), 2),
+            "p99": round(detect_us[int(0.99 * (len(detect_us) - 1))], 2),
+        },
+        "questions": len(stream),
+        "stream_misdetected": stream_wrong,
+        "translator_calls": backend.calls,
+        "translator_calls_translating_all": always.calls,
+        "stats": inbound.stats,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Leaflet ingestion over a synthetic download of every CMI PDF.
+
+Writes one generated CMI-style PDF per distinct leaflet URL (mirroring the
+URL paths, as benchmarks/fake_medsafe.py serves them), then times a cold
+ingest with one worker process and with ``--workers``, a re-run with no
+changes, and a re-run after some leaflets changed. Finally builds the
+retrieval index from the corpus and checks a section-specific query.
+
+    python benchmarks/ingest_bench.py [--workers 4] [--changed 25]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_medsafe import leaflet_pdf  # noqa: E402
+from pillai.ingest import Corpus, ingest, leaflet_aliases  # noqa: E402
+from pillai.retrieval import RetrievalIndex, build_index, read_corpus  # noqa: E402
+
+
+def write_pdf(pdf_dir, url, version=0):
+    path = os.path.join(pdf_dir, unquote(urlparse(url).path).lstrip("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(leaflet_pdf(urlparse(url).path, version))
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def timed(pdf_dir, corpus_dir, workers):
+    start = time.perf_counter()
+    counts = ingest(pdf_dir, corpus_dir, workers=workers)
+    return {"seconds": round(time.perf_counter() - start, 2), **counts, "corpus_bytes": dir_bytes(corpus_dir)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--changed", type=int, default=25, help="leaflets changed before the last run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    aliases = leaflet_aliases()
+    urls = list(aliases)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_dir = os.path.join(tmp, "pdfs")
+        for url in urls:
+            write_pdf(pdf_dir, url)
+        results = {
+            "leaflets": len(urls),
+            "product_keys": sum(len(keys) for keys in aliases.values()),
+            "cpus": os.cpu_count(),
+            "cold_1_worker": timed(pdf_dir, os.path.join(tmp, "corpus1"), 1),
+        }
+        corpus_dir = os.path.join(tmp, "corpus")
+        results[f"cold_{args.workers}_workers"] = timed(pdf_dir, corpus_dir, args.workers)
+        results["unchanged"] = timed(pdf_dir, corpus_dir, args.workers)
+        for url in rng.sample(urls, args.changed):
+            write_pdf(pdf_dir, url, version=1)
+        results["after_changes"] = timed(pdf_dir, corpus_dir, args.workers)
+
+        corpus = Corpus(corpus_dir)
+        url = urls[0]
+        start = time.perf_counter()
+        build_index(read_corpus(corpus_dir), os.path.join(tmp, "index"))
+        index_s = time.perf_counter() - start
+        name = os.path.splitext(os.path.basename(urlparse(url).path))[0]
+        top = RetrievalIndex(os.path.join(tmp, "index")).search(f"{name} side effects", k=1, urls=[url])
+        results["index_build_seconds"] = round(index_s, 2)
+        results["sample"] = {
+            "url": url,
+            "aliases": corpus.aliases(url),
+            "side_effects": corpus.section(url, "side_effects"),
+            "top_passage": top[0].text if top else None,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
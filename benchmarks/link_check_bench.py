@@ -0,0 +1,77 @@
+"""Link verifier runs against the local Medsafe stand-in.
+
+Checks every distinct leaflet URL three times against
+benchmarks/fake_medsafe.py (with per-request latency to mimic the real
+server): a cold run, an incremental re-run, and a re-run after some
+leaflets changed and some disappeared. Reports time, outcomes, bytes
+downloaded and TCP connections opened for each run, plus a sequential
+baseline for the cold run.
+
+    python benchmarks/link_check_bench.py [--latency 0.05] [--concurrency 16]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_medsafe import FakeMedsafe  # noqa: E402
+from pillai.links import leaflet_urls, load_index, save_index, verify  # noqa: E402
+
+MEDSAFE = "https://www.medsafe.govt.nz"
+
+
+def timed_run(server, urls, index_path, concurrency):
+    server.calls.clear()
+    index = load_index(index_path)
+    start = time.perf_counter()
+    counts = verify(urls, index, concurrency, (MEDSAFE, server.base_url))
+    seconds = time.perf_counter() - start
+    save_index(index, index_path)
+    return {
+        "seconds": round(seconds, 2),
+        **counts,
+        "downloads": server.calls["200"],
+        "not_modified": server.calls["304"],
+        "connections": server.calls["connections"],
+        "index_bytes": os.path.getsize(index_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--changed", type=int, default=25, help="leaflets changed before the last run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    urls = leaflet_urls()
+    server = FakeMedsafe(latency=args.latency).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "links.json")
+            results = {"urls": len(urls)}
+            sample = urls[:100]
+            results["sequential_100"] = timed_run(server, sample, os.path.join(tmp, "seq.json"), 1)
+            results["cold"] = timed_run(server, urls, index_path, args.concurrency)
+            results["incremental"] = timed_run(server, urls, index_path, args.concurrency)
+            for url in rng.sample(urls, args.changed):
+                server.touch(urlparse(url).path)
+            server.missing.update(urlparse(url).path for url in rng.sample(urls, 3))
+            results["after_changes"] = timed_run(server, urls, index_path, args.concurrency)
+    finally:
+        server.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Retrieval latency at the scale of the full CMI corpus.
+
+Builds a synthetic corpus with one leaflet per distinct URL in
+medsafe_source_links_cleaned.json (~1.4k), made by re-labelling and
+shuffling the fixture leaflets up to a realistic length, then times
+queries against the memory-mapped index.
+
+    python benchmarks/retrieval_bench.py [--words 2500] [--queries 2000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pillai.medicines import get_medicine_index  # noqa: E402
+from pillai.retrieval import RetrievalIndex, build_index, read_corpus  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, "fixtures", "cmi_sample.jsonl")
+
+QUESTIONS = [
+    "can I take {name} with food",
+    "what is {name} used for",
+    "side effects of {name}",
+    "can I take {name} with paracetamol",
+    "{name} overdose what should I do",
+    "is {name} safe in pregnancy",
+]
+
+
+def synthetic_corpus(words, rng):
+    paragraphs = []
+    for _, text in read_corpus(FIXTURE):
+        paragraphs.extend(p for p in text.split("\n\n")[1:] if p.strip())
+    index = get_medicine_index()
+    names = {}
+    for medicine in index.medicines:
+        names.setdefault(medicine.url, medicine.brand)
+    for url, name in names.items():
+        body = []
+        while sum(len(p.split()) for p in body) < words:
+            body.append(rng.choice(paragraphs))
+        yield url, f"{name}\n\n" + "\n\n".join(body).replace("ibuprofen", name)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=2500, help="words per synthetic leaflet")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        passages = build_index(synthetic_corpus(args.words, rng), out_dir)
+        build_s = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+
+        start = time.perf_counter()
+        index = RetrievalIndex(out_dir)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        brands = [m.brand for m in get_medicine_index().medicines]
+        latencies = []
+        for _ in range(args.queries):
+            query = rng.choice(QUESTIONS).format(name=rng.choice(brands))
+            start = time.perf_counter()
+            index.search(query, k=4)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        "leaflets": len(index.urls),
+        "passages": passages,
+        "index_bytes": size,
+        "build_s": round(build_s, 2),
+        "open_ms": round(open_ms, 2),
+        "query_ms": {
+            "p50": round(statistics.median(latencies), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Semantic cache lookup latency at 100k cached questions.
+
+Fills a SemanticIndex with synthetic questions (question templates x
+Medsafe brands x languages x simplify), then times lookups of paraphrases
+(should hit) and of questions about other medicines (guarded misses). A
+second run puts every row in one guard group to show the worst case,
+where a lookup scans the whole matrix.
+
+    python benchmarks/semantic_cache_bench.py [--entries 100000] [--lookups 2000]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pillai.cache import cache_key  # noqa: E402
+from pillai.medicines import get_medicine_index  # noqa: E402
+from pillai.semantic import SemanticIndex, guard_terms  # noqa: E402
+
+TEMPLATES = [
+    "What is {m} used for?",
+    "Can I take {m} with food?",
+    "What are the side effects of {m}?",
+    "How much {m} can I take?",
+    "How often can I take {m}?",
+    "Is {m} safe in pregnancy?",
+    "What should I do if I miss a dose of {m}?",
+    "How should I store {m}?",
+    "Can I drink alcohol while taking {m}?",
+    "How long does {m} take to work?",
+]
+PARAPHRASES = [
+    ("What is {m} used for?", "what's {m} used for"),
+    ("Can I take {m} with food?", "is it ok to take {m} with food"),
+    ("What are the side effects of {m}?", "{m} side effects"),
+    ("How often can I take {m}?", "how often should I take {m}"),
+]
+LANGUAGES = ["English", "Te Reo Māori", "Samoan", "Mandarin"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def timings(values):
+    return {
+        "p50": round(statistics.median(values), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def run(entries, lookups, rng, terms):
+    brands = sorted({m.brand for m in get_medicine_index().medicines})
+    index = SemanticIndex(max_entries=entries, terms=terms)
+    combos = itertools.product(brands, TEMPLATES, LANGUAGES, (False, True))
+    start = time.perf_counter()
+    added = 0
+    for brand, template, language, simplify in combos:
+        if added == entries:
+            break
+        index.add(template.format(m=brand), language, simplify)
+        added += 1
+    add_s = time.perf_counter() - start
+    indexed = brands[:added // (len(TEMPLATES) * len(LANGUAGES) * 2)]
+
+    hit_ms, miss_ms = [], []
+    hits = false_hits = 0
+    for _ in range(lookups):
+        brand = rng.choice(indexed)
+        original, paraphrase = rng.choice(PARAPHRASES)
+        start = time.perf_counter()
+        match = index.lookup(paraphrase.format(m=brand), "English", False)
+        hit_ms.append((time.perf_counter() - start) * 1000)
+        hits += match is not None and match[0] == cache_key(original.format(m=brand), "English", False)
+
+        # Same question about a medicine that isn't cached must not match
+        other = rng.choice(brands[len(indexed):] or ["loratadine"])
+        start = time.perf_counter()
+        match = index.lookup(original.format(m=other), "English", False)
+        miss_ms.append((time.perf_counter() - start) * 1000)
+        false_hits += match is not None
+    return {
+        "entries": len(index),
+        "matrix_mb": round(index._matrix.nbytes / 2**20, 1),
+        "add_us": round(add_s / added * 1e6, 1),
+        "paraphrase_hit_rate": round(hits / lookups, 3),
+        "false_hits": false_hits,
+        "hit_lookup_ms": timings(hit_ms),
+        "miss_lookup_ms": timings(miss_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    medicine_index = get_medicine_index()
+    print(json.dumps({
+        "guarded": run(args.entries, args.lookups, random.Random(args.seed),
+                       lambda q: guard_terms(q, medicine_index)),
+        # Worst case: no guard, every lookup scores all rows of its language
+        "single_group": run(args.entries, args.lookups // 4, random.Random(args.seed),
+                            lambda q: frozenset()),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""A simulated day of sessions against the session registry.
+
+Sessions arrive at ``--per-hour`` for ``--hours`` simulated hours. Each
+one asks a few questions a couple of minutes apart, half with a local
+Conversation and half with an Assistants thread on the fake OpenAI server.
+Then it goes quiet without closing, like a tab left open. The registry
+runs on a simulated clock and is swept every simulated minute. Every hour
+the live sessions, the registry's byte estimate and the traced Python
+heap are reported, so flat memory shows up as flat rows.
+
+    python benchmarks/session_soak.py [--hours 24] [--per-hour 300] [--idle 1800]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openai  # noqa: E402
+
+from fake_openai import DEFAULT_ANSWER, FakeOpenAI  # noqa: E402
+from pillai.conversation import Conversation  # noqa: E402
+from pillai.sessions import SESSION_KEYS, SessionRegistry, approx_bytes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--per-hour", type=int, default=300, help="new sessions per simulated hour")
+    parser.add_argument("--idle", type=float, default=1800, help="idle timeout, simulated seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    warnings.filterwarnings("ignore", category=DeprecationWarning)  # the Assistants API
+
+    server = FakeOpenAI(first_token_delay=0, token_delay=0).start()
+    client = openai.OpenAI(api_key="x", base_url=server.base_url, max_retries=0)
+    now = [0.0]
+    registry = SessionRegistry(lambda thread_id: client.beta.threads.delete(thread_id),
+                               idle_timeout=args.idle, clock=lambda: now[0])
+
+    # minute -> ids of the sessions asking a question then
+    schedule = {}
+    states = {}
+    for n in range(args.hours * args.per_hour):
+        start = rng.uniform(0, args.hours * 60)
+        questions = rng.randint(1, 6)
+        for q in range(questions):
+            schedule.setdefault(int(start + 2 * q), []).append(f"s{n}")
+        states[f"s{n}"] = {"assistants": n % 2 == 0}
+
+    tracemalloc.start()
+    hourly = []
+    # Run on until the last sessions have been idle long enough to go
+    for minute in range(args.hours * 60 + 12 + int(args.idle // 60) + 2):
+        now[0] = minute * 60.0
+        for session_id in schedule.pop(minute, ()):
+            state = states[session_id].setdefault("state", {})
+            registry.touch(session_id, state)
+            question = f"What is medicine {rng.randint(1, 5000)} used for?"
+            state["question_submitted"] = question
+            if states[session_id]["assistants"]:
+                if "thread_id" not in state:
+                    state["thread_id"] = client.beta.threads.create().id
+            else:
+                conversation = state.get("conversation")
+                if conversation is None:
+                    conversation = state["conversation"] = Conversation(client)
+                conversation.add(question, DEFAULT_ANSWER)
+        registry.sweep()
+        if minute % 60 == 59:
+            report = registry.report()
+            hourly.append({
+                "hour": minute // 60 + 1,
+                "sessions": report["sessions"],
+                "kb": round(report["bytes"] / 1024, 1),
+                "heap_mb": round(tracemalloc.get_traced_memory()[0] / 2**20, 2),
+            })
+
+    left = sum(approx_bytes(v) for s in states.values() for k, v in s.get("state", {}).items() if k in SESSION_KEYS)
+    registry._reaper.shutdown(wait=True)
+    server.stop()
+    print(json.dumps({
+        "sessions": len(states),
+        "hourly": hourly,
+        "final": registry.report(),
+        "threads_created": server.calls["threads.create"],
+        "threads_deleted": server.calls["threads.delete"],
+        "state_left_bytes": left,
+        "peak_heap_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2),
+    }, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Shared answer store under concurrent use by several processes.
+
+``--processes`` workers (8 by default, like replicas on one host) each
+answer a stream of questions drawn from one Zipf-distributed population:
+look the answer up in the store and, on a miss, "generate" it and write
+it back. Run once with every worker on one shared SQLite file and once
+with a file per worker (per-replica caches), and report the hit rate,
+lookup and write latency, and the time for a batched lookup of 16 keys
+against 16 single lookups.
+
+    python benchmarks/shared_cache_bench.py [--processes 8] [--requests 3000] [--questions 5000]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pillai.cache import SQLiteStore  # noqa: E402
+
+ANSWER = (
+    "Cetirizine is an antihistamine used to relieve the symptoms of hay fever and hives, such as "
+    "sneezing, a runny nose and itchy, watery eyes.\n\n**How to take it:**\n"
+    "- Adults usually take one 10 mg tablet once a day.\n- It can be taken with or without food.\n\n"
+    "It can make some people drowsy, so be careful driving or drinking alcohol. Ask your pharmacist "
+    "before taking it if you are pregnant, breastfeeding or have kidney problems. "
+) * 2
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def worker(index, path, args, barrier, results):
+    rng = random.Random(args.seed + index)
+    store = SQLiteStore(path, max_entries=args.questions * 2)
+    weights = [1 / (rank + 1) for rank in range(args.questions)]
+    population = [f"English|0|question {n}" for n in range(args.questions)]
+    stream = rng.choices(population, weights, k=args.requests)
+    get_ms, set_ms = [], []
+    hits = 0
+    barrier.wait()
+    for key in stream:
+        start = time.perf_counter()
+        value = store.get(key, 3600, time.time())
+        get_ms.append((time.perf_counter() - start) * 1000)
+        if value is not None:
+            hits += 1
+            continue
+        start = time.perf_counter()
+        store.set(key, f"{key}: {ANSWER}", time.time())
+        set_ms.append((time.perf_counter() - start) * 1000)
+
+    keys = [rng.choice(population) for _ in range(16)]
+    start = time.perf_counter()
+    for _ in range(50):
+        store.get_many(keys, None, time.time())
+    batched = (time.perf_counter() - start) / 50 * 1000
+    start = time.perf_counter()
+    for _ in range(50):
+        for key in keys:
+            store.get(key, None, time.time())
+    single = (time.perf_counter() - start) / 50 * 1000
+    results.put({"hits": hits, "get_ms": get_ms, "set_ms": set_ms, "batch16_ms": batched, "single16_ms": single})
+
+
+def run(args, shared):
+    with tempfile.TemporaryDirectory() as tmp:
+        barrier = multiprocessing.Barrier(args.processes)
+        results = multiprocessing.Queue()
+        procs = []
+        for i in range(args.processes):
+            path = os.path.join(tmp, "cache.sqlite3" if shared else f"cache{i}.sqlite3")
+            SQLiteStore(path)  # create the table before the workers race for it
+            procs.append(multiprocessing.Process(target=worker, args=(i, path, args, barrier, results)))
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        outs = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+        sizes = {name: os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)}
+    get_ms = [v for out in outs for v in out["get_ms"]]
+    set_ms = [v for out in outs for v in out["set_ms"]]
+    return {
+        "seconds": round(elapsed, 2),
+        "hit_rate": round(sum(out["hits"] for out in outs) / len(get_ms), 3),
+        "get_ms": {"p50": round(statistics.median(get_ms), 3), "p99": round(percentile(get_ms, 99), 3)},
+        "set_ms": {"p50": round(statistics.median(set_ms), 3), "p99": round(percentile(set_ms, 99), 3)},
+        "batch16_ms": round(statistics.mean(out["batch16_ms"] for out in outs), 3),
+        "single16_ms": round(statistics.mean(out["single16_ms"] for out in outs), 3),
+        "db_mb": round(sum(n for name, n in sizes.items() if name.endswith(".sqlite3")) / 2**20, 2),
+        "wal_mb": round(sum(n for name, n in sizes.items() if name.endswith("-wal")) / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=3000, help="questions per process")
+    parser.add_argument("--questions", type=int, default=5000, help="distinct questions")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps({
+        "processes": args.processes,
+        "answer_bytes": len(ANSWER.encode()),
+        "shared": run(args, shared=True),
+        "per_process": run(args, shared=False),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Typeahead latency for the question box.
+
+Simulates typing questions about every brand in
+medsafe_source_links_cleaned.json one keystroke at a time, with a share of
+the brands misspelled (a dropped, doubled or swapped letter), and times
+MedicineIndex.suggest for each keystroke.
+
+    python benchmarks/typeahead_bench.py [--brands 400] [--typo-rate 0.3]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pillai.medicines import MedicineIndex  # noqa: E402
+
+
+def misspell(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("drop", "double", "swap"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--brands", type=int, default=400, help="brands typed")
+    parser.add_argument("--typo-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    index = MedicineIndex.from_file()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    found = typed = 0
+    for brand in rng.sample(index.brands, min(args.brands, len(index.brands))):
+        word = brand.split()[0]
+        typo = rng.random() < args.typo_rate
+        text = "Can I take " + (misspell(word, rng) if typo else word)
+        for end in range(len("Can I take ") + 1, len(text) + 1):
+            start = time.perf_counter()
+            suggestions = index.suggest(text[:end])
+            latencies.append((time.perf_counter() - start) * 1000)
+        typed += 1
+        found += any(s.brand.lower() == brand for s in suggestions)
+
+    print(json.dumps({
+        "brands": len(index.brands),
+        "build_ms": round(build_ms, 1),
+        "keystrokes": len(latencies),
+        "brand_suggested_after_last_keystroke": round(found / typed, 3),
+        "suggest_ms": {
+            "p50": round(statistics.median(latencies), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Helpers behind the Pill-AI Streamlit app (app.py)."""
@@ -0,0 +1,86 @@
+"""Hidden admin page with the aggregated answer metrics.
+
+Shown instead of the normal page when the URL has ``?admin=<token>`` and
+the token matches PILLAI_ADMIN_TOKEN. Without that variable the page is
+disabled.
+"""
+import hmac
+import os
+
+import streamlit as st
+
+from pillai.citations import get_file_names
+from pillai.engine import get_engine
+from pillai.inbound import get_inbound_translator
+from pillai.metrics import metrics
+from pillai.router import get_router
+from pillai.sessions import get_session_registry
+from pillai.singleflight import in_flight
+from pillai.timing import rerun_stats
+from pillai.upstream import get_upstream
+from pillai.warmer import get_cache_warmer
+
+ADMIN_TOKEN = os.getenv("PILLAI_ADMIN_TOKEN")
+
+
+def is_admin_request():
+    token = st.query_params.get("admin")
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
+
+def render_admin_page(answer_cache=None, translator=None):
+    st.title("Pill-AI metrics")
+
+    st.subheader("Answer stages")
+    rows = metrics.summary()
+    if rows[0]["count"]:
+        st.table(rows)
+    else:
+        st.info("No questions answered in this process yet.")
+
+    st.subheader("Script reruns")
+    st.json(rerun_stats.report())
+
+    if answer_cache is not None:
+        st.subheader("Answer cache")
+        st.json({**answer_cache.stats, "hit_rate": round(answer_cache.hit_rate(), 3)})
+        if answer_cache.semantic is not None:
+            st.json({"semantic_entries": len(answer_cache.semantic), **answer_cache.semantic.stats})
+    warmer = get_cache_warmer()
+    if warmer is not None:
+        st.subheader("Cache warm-up")
+        st.json(warmer.stats)
+    sessions = get_session_registry()
+    if sessions is not None:
+        st.subheader("Sessions")
+        st.json(sessions.report())
+    file_names = get_file_names()
+    if file_names is not None:
+        st.subheader("Citations")
+        st.json(file_names.stats)
+    st.subheader("Coalesced questions")
+    st.json(in_flight.stats)
+
+    if translator is not None:
+        st.subheader("Translation")
+        st.json(translator.stats)
+        st.json({"inbound": get_inbound_translator().stats})
+
+    st.subheader("Model routing")
+    st.json(get_router().report())
+
+    engine = get_engine()
+    if engine is not None:
+        st.subheader("Engine")
+        report = engine.report()
+        st.table(report.pop("limits"))
+        st.json(report)
+
+    st.subheader("Upstreams")
+    for name in ("openai", "translator"):
+        upstream = get_upstream(name)
+        st.json({"name": name, "breaker": upstream.breaker.state, "p95": upstream.p95(),
+                 **upstream.stats})
+
+    with st.expander("Prometheus text"):
+        st.code(metrics.prometheus_text(), language="text")
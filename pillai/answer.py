@@ -0,0 +1,369 @@
+"""Building, generating and cleaning answers.
+
+Shared by both answer paths in app.py: the chat completion (with the local
+conversation history in memory mode) and the optional Assistants thread. Each path has a blocking and a streaming
+variant; the streaming ones yield text deltas as they arrive.
+
+``answer_question`` is the whole blocking chat pipeline (question to
+English, retrieval, routing, generation, cleaning, translation), used by
+app.py when answers aren't streamed and by pillai.batch. Its steps before
+and after generation (``prepare_question``, ``route_question``,
+``finish_answer``) are also used by the app's streaming paths.
+"""
+import contextlib
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+
+from pillai.runs import RunFailed, RunTimedOut, cancel_run
+
+log = logging.getLogger(__name__)
+
+CHAT_MODEL = "gpt-4"
+
+SIMPLIFY_SUFFIX = (
+    " Please explain this in simple language suitable for a 12-year-old"
+    " (I am not actually 12 though, don’t use slang or colloquialisms, be encouraging)."
+)
+
+CITATION_RE = re.compile(r'【[^】]*】')
+
+
+def adjust_question(question, simplify=False):
+    """The question as sent to the model, with the simplify request appended."""
+    return question + SIMPLIFY_SUFFIX if simplify else question
+
+
+def clean_answer(raw_answer):
+    """Drop the assistant's 【...】 citation markers."""
+    return CITATION_RE.sub('', raw_answer).strip()
+
+
+class CitationStripper:
+    """Incremental version of clean_answer for streamed text.
+
+    A marker can be split across deltas, so anything from an unmatched 【
+    onwards is held back until its closing 】 arrives (or the stream ends).
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        """Return the part of ``text`` that is safe to show now."""
+        buf = CITATION_RE.sub('', self._pending + text)
+        cut = buf.rfind('【')
+        if cut != -1 and '】' not in buf[cut:]:
+            buf, self._pending = buf[:cut], buf[cut:]
+        else:
+            self._pending = ""
+        return buf
+
+    def flush(self):
+        """Return whatever is still held back (an unterminated marker)."""
+        rest, self._pending = self._pending, ""
+        return rest
+
+
+GROUNDING_PROMPT = (
+    "You are Pill-AI, a medicines information assistant for New Zealanders. "
+    "Answer using the Medsafe Consumer Medicine Information (CMI) extracts below. "
+    "If they don't cover the question, say so and suggest asking a pharmacist or doctor. "
+    "Do not diagnose or prescribe.\n\n"
+)
+
+
+def build_messages(question, passages=(), history=()):
+    """Chat messages for a question, grounded in retrieved CMI passages if any.
+
+    ``history`` is earlier conversation (see pillai.conversation), sent
+    between the grounding prompt and the question.
+    """
+    messages = []
+    if passages:
+        extracts = "\n\n".join(f"[{p.url}]\n{p.text}" for p in passages)
+        messages.append({"role": "system", "content": GROUNDING_PROMPT + extracts})
+    messages.extend(history)
+    messages.append({"role": "user", "content": question})
+    return messages
+
+
+def medsafe_footer(language, medicines=()):
+    """Source footer: the CMI leaflets for detected medicines, else Medsafe's search page."""
+    from pillai.labels import MEDSAFE_SEARCH_URL, medsafe_sources
+    source = medsafe_sources.get(language, medsafe_sources["English"])
+    if not medicines:
+        return f"\n\n---\n{source} [{MEDSAFE_SEARCH_URL}]({MEDSAFE_SEARCH_URL})"
+    links = "\n".join(
+        f"- [{m.brand[:1].upper()}{m.brand[1:]} ({m.form})]({m.url})" for m in medicines
+    )
+    return f"\n\n---\n{source}\n{links}"
+
+
+def _call(upstream, fn, **kwargs):
+    return upstream.call(fn, **kwargs) if upstream is not None else fn(**kwargs)
+
+
+def complete_chat(client, question, model=CHAT_MODEL, passages=(), upstream=None, history=()):
+    """Blocking chat completion; returns the raw answer text.
+
+    With an ``upstream`` (pillai.upstream.Upstream) the request gets its
+    deadline, retries, hedging and circuit breaker.
+    """
+    response = _call(
+        upstream, client.chat.completions.create,
+        model=model,
+        messages=build_messages(question, passages, history),
+    )
+    return response.choices[0].message.content
+
+
+def stream_chat(client, question, model=CHAT_MODEL, passages=(), upstream=None, history=()):
+    """Yield answer text deltas from a streamed chat completion.
+
+    Only opening the stream is retried; a second stream is never hedged.
+    """
+    kwargs = {"model": model, "messages": build_messages(question, passages, history), "stream": True}
+    if upstream is not None:
+        stream = upstream.call(client.chat.completions.create, hedge=False, **kwargs)
+    else:
+        stream = client.chat.completions.create(**kwargs)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+def stream_thread_run(client, thread_id, assistant_id, max_wait=15, clock=time.monotonic,
+                      upstream=None, citations=None, **run_options):
+    """Run the assistant on a thread and yield answer text deltas.
+
+    The user message must already be on the thread. Raises RunTimedOut
+    (after cancelling the run) if it goes past ``max_wait`` seconds, and
+    RunFailed if it ends in any state other than completed. A run can't
+    safely be retried, so ``upstream`` only contributes its circuit breaker.
+    File citation annotations go to ``citations`` (pillai.citations.Citations)
+    as they stream in. ``run_options`` (e.g. ``truncation_strategy``) go to
+    the run as is.
+    """
+    guard = upstream.guard() if upstream is not None else contextlib.nullcontext()
+    deadline = clock() + max_wait
+    cancelled = threading.Event()
+
+    def cancel(stream):
+        # Once, by whichever sees the deadline first: the loop or the watchdog
+        run = stream.current_run
+        if run is not None and not cancelled.is_set():
+            cancelled.set()
+            cancel_run(client, thread_id, run.id)
+        return run
+
+    # The request times out when no event arrives for ``max_wait`` seconds
+    with guard, client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id,
+                                                timeout=max_wait, **run_options) as stream:
+        # The deadline is only checked when an event arrives, and a stalled
+        # run sends none: the watchdog cancels it on time, which makes the
+        # server end the stream (the request timeout covers one that doesn't)
+        watchdog = threading.Timer(max_wait, cancel, (stream,))
+        watchdog.daemon = True
+        watchdog.start()
+        run = None
+        try:
+            for event in stream:
+                if event.event == "thread.message.delta":
+                    for block in event.data.delta.content or ():
+                        text = getattr(block, "text", None)
+                        if text is None:
+                            continue
+                        if text.annotations and citations is not None:
+                            citations.add(text.annotations)
+                        if text.value:
+                            yield text.value
+                if clock() > deadline:
+                    break
+            else:
+                run = stream.get_final_run()
+        except Exception:
+            if not (cancelled.is_set() or clock() > deadline):
+                raise
+        finally:
+            watchdog.cancel()
+        if run is None or run.status != "completed" and (cancelled.is_set() or clock() > deadline):
+            run = cancel(stream) or run
+            raise RunTimedOut(f"Threaded memory response timed out after {max_wait}s.",
+                              status=getattr(run, "status", None))
+    if run.status != "completed":
+        raise RunFailed(f"Threaded memory response failed (run {run.status}).", status=run.status)
+
+
+Prepared = namedtuple("Prepared", "english adjusted medicines passages")
+Answered = namedtuple("Answered", "english raw_answer answer medicines translation_failed")
+
+
+def prepare_question(question, simplify, medicines, trace, retrieval_index=None):
+    """The steps before generation, shared by every answer path.
+
+    Questions typed in another language are translated to English
+    (pillai.inbound) and the medicines are detected again in the
+    translation. With a ``retrieval_index`` the CMI passages that ground a
+    chat answer are looked up. Each step is a span of ``trace``
+    (pillai.metrics.Trace).
+    """
+    from pillai.inbound import get_inbound_translator
+    from pillai.medicines import get_medicine_index
+
+    inbound = get_inbound_translator()
+    english = question
+    with trace.span("detect_language") as span:
+        source = inbound.detect(question)
+        span["outcome"] = source or "en"
+    if source:
+        with trace.span("translate_question") as span:
+            result = inbound.to_english(question, source)
+            span["api_calls"] = result.api_calls
+            if result.failed:
+                span["outcome"] = "untranslated"
+        english = result.english
+        if result.translated:
+            medicines = get_medicine_index().detect(english) or medicines
+    passages = ()
+    if retrieval_index is not None:
+        # Ground the chat answer in the detected medicines' leaflets
+        with trace.span("retrieval"):
+            passages = retrieval_index.search(english, urls=[m.url for m in medicines])
+    return Prepared(english, adjust_question(english, simplify), medicines, passages)
+
+
+def route_question(english, trace):
+    """The model for a chat answer: fast for simple lookups, strong for the rest."""
+    from pillai.medicines import get_medicine_index
+    from pillai.router import get_router
+
+    with trace.span("route") as span:
+        route = get_router().route(english, get_medicine_index().match_tokens(english))
+        span["outcome"] = route.kind + ("_spilled" if route.spilled else "")
+    trace.fields["model"] = route.model
+    return route
+
+
+def finish_answer(raw_answer, language, trace, english_fallback=True, priority=None):
+    """Clean a generated answer and translate it; returns ``(answer, translation_failed)``.
+
+    With ``english_fallback`` a failed translation gives the English answer
+    and ``translation_failed``; otherwise the error is raised.
+    """
+    from pillai.labels import lang_codes
+    from pillai.translation import get_translator
+
+    with trace.span("clean"):
+        answer = clean_answer(raw_answer)
+    target = lang_codes.get(language) if language != "English" else None
+    if not target:
+        return answer, False
+    # Paragraphs/list items translated in parallel and memoised
+    with trace.span("translate") as span:
+        try:
+            translated, span["api_calls"] = get_translator().translate_counted(answer, target,
+                                                                               **_priority(priority))
+        except Exception as e:
+            if not english_fallback:
+                raise
+            log.warning("Translation failed, answering in English: %s", e)
+            span["outcome"] = "untranslated"
+            return answer, True
+    return translated, False
+
+
+def answer_question(client, question, language="English", simplify=False, medicines=(), history=(),
+                    trace=None, engine=None, priority=None, english_fallback=True):
+    """The blocking chat answer pipeline; returns Answered.
+
+    ``medicines`` are those detected in the question as asked, and
+    ``history`` the local conversation in memory mode. With an ``engine``
+    (pillai.engine) the completion runs there at ``priority``. Looking up
+    and storing the answer in the cache is left to the caller.
+    """
+    from pillai.metrics import Trace
+    from pillai.retrieval import get_retrieval_index
+    from pillai.router import get_router
+    from pillai.upstream import get_upstream
+
+    trace = Trace() if trace is None else trace
+    prepared = prepare_question(question, simplify, medicines, trace, get_retrieval_index())
+    route = route_question(prepared.english, trace)
+    with trace.span("generate", api_calls=1), get_router().timed(route.model):
+        if engine is not None:
+            raw_answer = engine.complete_chat(prepared.adjusted, model=route.model, passages=prepared.passages,
+                                              history=history, **_priority(priority)).result()
+        else:
+            raw_answer = complete_chat(client, prepared.adjusted, model=route.model, passages=prepared.passages,
+                                       upstream=get_upstream("openai"), history=history)
+    answer, translation_failed = finish_answer(raw_answer, language, trace, english_fallback, priority)
+    return Answered(prepared.english, raw_answer, answer, prepared.medicines, translation_failed)
+
+
+def _priority(priority):
+    # pillai.engine's default (interactive) unless one is given
+    return {} if priority is None else {"priority": priority}
+
+
+def write_stream(placeholder, deltas, cursor="▌", start=None):
+    """Render deltas into a Streamlit placeholder as they arrive.
+
+    Returns ``(raw_answer, ttft)`` where ttft is the seconds from ``start``
+    (default: now) until the first visible text, or None if nothing was shown.
+    """
+    stripper = CitationStripper()
+    start = time.perf_counter() if start is None else start
+    ttft = None
+    raw_parts = []
+    shown = ""
+    for delta in deltas:
+        raw_parts.append(delta)
+        visible = stripper.feed(delta)
+        if not visible:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        shown += visible
+        placeholder.markdown(shown + cursor)
+    return "".join(raw_parts), ttft
+
+
+def write_translated_stream(placeholder, deltas, pipeline, cursor="▌", poll=0.05, start=None):
+    """Like write_stream, but shows the translation as it is produced.
+
+    Closed paragraphs/sentences go to the TranslationPipeline while the
+    model is still generating; the placeholder shows the translated prefix
+    that is ready so far. Returns ``(raw_answer, translated, ttft)``.
+    """
+    stripper = CitationStripper()
+    start = time.perf_counter() if start is None else start
+    ttft = None
+    raw_parts = []
+    shown = ""
+
+    def refresh():
+        nonlocal shown, ttft
+        ready = pipeline.ready_text()
+        if ready != shown:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            shown = ready
+            placeholder.markdown(shown + cursor)
+
+    for delta in deltas:
+        raw_parts.append(delta)
+        pipeline.feed(stripper.feed(delta))
+        refresh()
+    pipeline.feed(stripper.flush())
+    pipeline.close()
+    while pipeline.pending():
+        refresh()
+        time.sleep(poll)
+    refresh()
+    return "".join(raw_parts), pipeline.result().strip(), ttft
@@ -0,0 +1,215 @@
+"""Answer a JSONL file of questions without the UI.
+
+Each input line is a JSON object with ``question`` and optionally
+``language`` (one of the app's languages, default English), ``simplify``
+(default false) and ``id``. Answers go through the same pipeline as a Send
+click in app.py (pillai.answer.answer_question: question translation,
+medicine detection, CMI retrieval, routing, chat completion, citation
+cleanup, translation), get its Medsafe footer and share its answer cache, so pre-generated answers are served to users afterwards.
+
+Results are appended to the output JSONL as they complete, one line per
+record. Records already answered in the output are skipped, so an
+interrupted run picks up where it stopped; records that failed are
+retried on the next run.
+
+With the engine on (PILLAI_ENGINE=1), model and translator requests go
+through it at batch priority, so they queue behind interactive ones.
+
+    python -m pillai.batch questions.jsonl answers.jsonl --concurrency 8 --rate 2
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pillai.answer import answer_question, medsafe_footer
+from pillai.cache import cache_key, get_answer_cache
+from pillai.engine import BATCH, get_engine
+from pillai.labels import lang_codes
+from pillai.medicines import get_medicine_index
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads: ``rate`` starts per second."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            self.sleep(wait_for)
+
+
+def record_id(record):
+    """The record's ``id``, or its cache key (duplicates share an answer anyway)."""
+    if record.get("id") is not None:
+        return str(record["id"])
+    return cache_key(record["question"], record.get("language", "English"), record.get("simplify", False))
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                log.warning("%s:%d: skipping invalid JSON (%s)", path, number, e)
+                continue
+            if not isinstance(record, dict) or not record.get("question"):
+                log.warning("%s:%d: skipping record without a question", path, number)
+                continue
+            yield record
+
+
+def finished_ids(path):
+    """Ids answered in an earlier run (a line cut short by a crash is ignored)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "answer" in result:
+                done.add(result["id"])
+    return done
+
+
+class BatchAnswerer:
+    """The app's non-streaming, no-memory answer path, callable from threads."""
+
+    def __init__(self, client, use_cache=True, engine=None, priority=BATCH):
+        self.client = client
+        # With an engine (pillai.engine) requests run there at ``priority``
+        self.engine = engine
+        self.priority = priority
+        self.answer_cache = get_answer_cache() if use_cache else None
+        self.medicine_index = get_medicine_index()
+
+    def answer(self, question, language="English", simplify=False, limiter=None):
+        """Returns (answer with footer, detected medicines, whether it was cached)."""
+        if language != "English" and language not in lang_codes:
+            raise ValueError(f"Unknown language {language!r}")
+        medicines = self.medicine_index.detect(question)
+        answer = None
+        if self.answer_cache is not None:
+            answer = self.answer_cache.get(question, language, simplify)
+        cached = answer is not None
+        if answer is None:
+            if limiter is not None:
+                limiter.acquire()
+            # Unlike the app there is no English fallback: a failed
+            # translation is an error, so the record is retried next run
+            answered = answer_question(self.client, question, language, simplify, medicines,
+                                       engine=self.engine, priority=self.priority, english_fallback=False)
+            answer, medicines = answered.answer, answered.medicines
+            if self.answer_cache is not None:
+                self.answer_cache.set(question, language, simplify, answer)
+        return answer + medsafe_footer(language, medicines), medicines, cached
+
+
+def run(answerer, records, out_path, concurrency=4, rate=None):
+    """Answer ``records`` into ``out_path``; returns counts of each outcome."""
+    done = finished_ids(out_path)
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    counts = {"answered": 0, "cached": 0, "failed": 0, "skipped": 0}
+    write_lock = threading.Lock()
+    started = time.monotonic()
+
+    with open(out_path, "a+", encoding="utf-8") as out:
+        # A crash can leave a partial last line; start on a fresh one
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+
+        def process(record, rid):
+            language = record.get("language", "English")
+            simplify = bool(record.get("simplify", False))
+            result = {"id": rid, "question": record["question"], "language": language,
+                      "simplify": simplify}
+            began = time.monotonic()
+            try:
+                answer, medicines, cached = answerer.answer(record["question"], language, simplify, limiter)
+                result.update(answer=answer, medicines=[m.url for m in medicines], cached=cached)
+                outcome = "cached" if cached else "answered"
+            except Exception as e:
+                log.warning("Record %s failed: %s", rid, e)
+                result["error"] = f"{type(e).__name__}: {e}"
+                outcome = "failed"
+            result["elapsed"] = round(time.monotonic() - began, 3)
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[outcome] += 1
+                finished = counts["answered"] + counts["cached"] + counts["failed"]
+                if finished % 100 == 0:
+                    log.info("%d records in %.0fs (%d failed)", finished, time.monotonic() - started,
+                             counts["failed"])
+
+        # Submit lazily so a huge input isn't all queued in memory at once
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+            pending = set()
+            for record in records:
+                rid = record_id(record)
+                if rid in done:
+                    counts["skipped"] += 1
+                    continue
+                done.add(rid)
+                if len(pending) >= concurrency * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(pool.submit(process, record, rid))
+            wait(pending)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with Pill-AI")
+    parser.add_argument("input", help="JSONL with question, language, simplify (and optional id)")
+    parser.add_argument("output", help="JSONL the answers are appended to; reruns resume from it")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions answered at once")
+    parser.add_argument("--rate", type=float, default=None, help="max OpenAI requests started per second")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor fill the answer cache")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per request otherwise
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("OPENAI_API_KEY is not set", file=sys.stderr)
+        return 2
+    import openai
+    client = openai.OpenAI(api_key=api_key, max_retries=0)
+    answerer = BatchAnswerer(client, use_cache=not args.no_cache, engine=get_engine(api_key))
+    counts = run(answerer, read_records(args.input), args.output,
+                 concurrency=args.concurrency, rate=args.rate)
+    print(json.dumps(counts))
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""Answer cache shared by every session in the process.
+
+Two tiers: an in-memory LRU with a TTL in front of a shared store, so
+answers survive Streamlit restarts and an answer generated by one
+replica is a hit on the others. The store is a SQLite file in WAL mode
+that every process on the host uses (PILLAI_CACHE_DB), or Redis when
+PILLAI_CACHE_URL is set; translation chunks are kept in it too. Entries
+are keyed on a SHA-256 hash of the normalised question, the simplify flag
+and the answer language, so the store holds answers but not the questions
+that were asked. Memory-mode answers depend on the thread history and must
+not go through here.
+
+With a SemanticIndex (pillai.semantic) attached, a question that misses
+both tiers can still be answered from a cached paraphrase of it. Its rows
+(vectors, no question text) are kept in their own table of the store, so
+a new process can rebuild the index for the answers already cached.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+DEFAULT_DB_PATH = os.getenv("PILLAI_CACHE_DB", ".pillai_cache.sqlite3")
+DEFAULT_TTL = int(os.getenv("PILLAI_CACHE_TTL", 7 * 24 * 3600))  # seconds
+# Expired answers stay on disk this many TTLs longer, as a fallback for
+# when OpenAI is down (see AnswerCache.get_stale)
+STALE_TTLS = 4
+SEMANTIC_ENABLED = os.getenv("PILLAI_SEMANTIC", "1") != "0"
+# e.g. redis://localhost:6379/0 to share the cache between hosts
+CACHE_URL = os.getenv("PILLAI_CACHE_URL")
+MAX_BYTES = int(float(os.getenv("PILLAI_CACHE_MAX_MB", 256)) * 2**20)  # per table
+# Shorter values aren't worth compressing
+COMPRESS_MIN_BYTES = 256
+
+_SPACE_RE = re.compile(r"\s+")
+_TRAILING_RE = re.compile(r"[\s?？!.。]+$")
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def normalize_question(question):
+    """Fold case, collapse whitespace and drop trailing punctuation."""
+    question = _SPACE_RE.sub(" ", question.strip().casefold())
+    return _TRAILING_RE.sub("", question)
+
+
+def cache_key(question, language, simplify):
+    """Store key for an answer; the question itself is only kept as a hash."""
+    digest = hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+    return f"{language}|{int(bool(simplify))}|{digest}"
+
+
+def pack(value):
+    """Stored form of a text value: zlib-compressed when that makes it smaller."""
+    raw = value.encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"r" + raw
+
+
+def unpack(data):
+    if isinstance(data, str):
+        # Rows written before values were packed
+        return data
+    data = bytes(data)
+    return (zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]).decode("utf-8")
+
+
+class SQLiteStore:
+    """Shared on-disk tier: one table per namespace in a SQLite file.
+
+    Every worker process on the host opens the same file. WAL mode lets
+    readers run alongside the one writer, and the busy timeout queues
+    writers instead of failing them. Rows older than ``retention`` seconds
+    are deleted, and the oldest rows go once the table is over
+    ``max_entries`` rows or ``max_bytes``. Both checks run every
+    ``maintain_every`` writes, not on each one.
+
+    Stores share this interface (``get``/``get_many``, ``set``/``set_many``,
+    ``delete_many``, ``keys``, ``clear``), so RedisStore can stand in for it.
+    """
+
+    def __init__(self, path, table="answers", max_entries=50_000, max_bytes=MAX_BYTES, retention=None,
+                 maintain_every=200):
+        if not re.fullmatch(r"[a-z_]+", table):
+            raise ValueError(f"Bad table name {table!r}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.retention = retention
+        self.maintain_every = maintain_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # The WAL grows while readers keep it from being checkpointed; shrink it back afterwards
+        self._conn.execute("PRAGMA journal_size_limit=16777216")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL,"
+            " size INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        if "size" not in columns:
+            # Files from before the size cap
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created)")
+
+    def get(self, key, ttl, now):
+        """The stored value if younger than ``ttl`` seconds (any age if None)."""
+        return self.get_many([key], ttl, now).get(key)
+
+    def get_many(self, keys, ttl, now):
+        """``{key: value}`` for the keys that are stored and fresh."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value, created FROM {self.table}"
+                    f" WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, value, created in rows:
+                    if ttl is None or now - created <= ttl:
+                        found[key] = value
+        return {key: unpack(value) for key, value in found.items()}
+
+    def set(self, key, value, now):
+        self.set_many([(key, value)], now)
+
+    def set_many(self, items, now):
+        rows = []
+        for key, value in items:
+            packed = pack(value)
+            rows.append((key, packed, now, len(packed)))
+        with self._lock:
+            # Take the write lock up front; waits up to the busy timeout behind other processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created, size) VALUES (?, ?, ?, ?)", rows
+                )
+                self._writes += len(rows)
+                if self._writes >= self.maintain_every:
+                    self._writes = 0
+                    self._maintain(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _maintain(self, now):
+        if self.retention is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.retention,))
+        count, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        if count > self.max_entries or size > self.max_bytes:
+            # Keep the newest rows that fit under both caps
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key, ROW_NUMBER() OVER w AS n, SUM(size) OVER w AS total"
+                f"  FROM {self.table} WINDOW w AS (ORDER BY created DESC))"
+                " WHERE n > ? OR total > ?)",
+                (self.max_entries, self.max_bytes),
+            )
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key IN ({','.join('?' * len(batch))})", batch)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def keys(self, since):
+        """Keys of the rows created at or after ``since``, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key FROM {self.table} WHERE created >= ? ORDER BY created DESC", (since,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class RedisStore:
+    """SQLiteStore's interface over Redis, or any server that speaks its protocol.
+
+    Keys are prefixed with the namespace, and values carry their creation
+    time so reads can apply a ``ttl`` as SQLiteStore does. Redis expires
+    keys after ``retention`` seconds. The size cap is the server's
+    maxmemory policy. Needs the ``redis`` package.
+    """
+
+    def __init__(self, url, table="answers", retention=None):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = f"pillai:{table}:"
+        self.retention = retention
+
+    def get(self, key, ttl, now):
+        return self.get_many([key], ttl, now).get(key)
+
+    def get_many(self, keys, ttl, now):
+        keys = list(keys)
+        if not keys:
+            return {}
+        found = {}
+        for key, data in zip(keys, self._redis.mget([self.prefix + key for key in keys])):
+            if data is None:
+                continue
+            (created,) = struct.unpack("<d", data[:8])
+            if ttl is None or now - created <= ttl:
+                found[key] = unpack(data[8:])
+        return found
+
+    def set(self, key, value, now):
+        self.set_many([(key, value)], now)
+
+    def set_many(self, items, now):
+        pipe = self._redis.pipeline(transaction=False)
+        expire = int(self.retention) if self.retention else None
+        for key, value in items:
+            pipe.set(self.prefix + key, struct.pack("<d", now) + pack(value), ex=expire)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            self._redis.delete(*[self.prefix + key for key in keys[i:i + 500]])
+
+    def clear(self):
+        for name in self._redis.scan_iter(match=self.prefix + "*", count=1000):
+            self._redis.delete(name)
+
+    def keys(self, since):
+        names = list(self._redis.scan_iter(match=self.prefix + "*", count=1000))
+        created = []
+        for i in range(0, len(names), 500):
+            for name, data in zip(names[i:i + 500], self._redis.mget(names[i:i + 500])):
+                if data is not None:
+                    when = struct.unpack("<d", data[:8])[0]
+                    if when >= since:
+                        created.append((when, name.decode("utf-8")[len(self.prefix):]))
+        return [key for _, key in sorted(created, reverse=True)]
+
+
+def open_store(table, retention=None):
+    """The shared store for ``table``: Redis if PILLAI_CACHE_URL is set, else the SQLite file."""
+    if CACHE_URL:
+        return RedisStore(CACHE_URL, table, retention)
+    return SQLiteStore(DEFAULT_DB_PATH, table, retention=retention)
+
+
+class AnswerCache:
+    """In-memory LRU/TTL tier over an optional shared store."""
+
+    def __init__(self, store=None, max_entries=1024, ttl=DEFAULT_TTL, clock=time.time, semantic=None,
+                 vectors=None):
+        self.store = store
+        # Optional store for the semantic index's rows, by answer key
+        self.vectors = vectors
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.semantic = semantic
+        self._entries = OrderedDict()  # key -> (value, created)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def get(self, question, language, simplify):
+        return self.find(question, language, simplify)[0]
+
+    def find(self, question, language, simplify):
+        """``(answer, outcome)``; outcome is "memory", "disk", "semantic" or "miss"."""
+        key = cache_key(question, language, simplify)
+        value, outcome = self._get(key)
+        if value is None and self.semantic is not None:
+            match = self.semantic.lookup(question, language, simplify)
+            if match is not None:
+                value, _ = self._get(match[0])
+                if value is None:
+                    # Its answer has expired since it was indexed
+                    self.semantic.discard(match[0])
+                else:
+                    outcome = "semantic"
+        with self._lock:
+            self.stats[f"{outcome}_hits" if value is not None else "misses"] += 1
+        return value, outcome if value is not None else "miss"
+
+    def _get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[0], "memory"
+                del self._entries[key]
+
+        value = self.store.get(key, self.ttl, now) if self.store else None
+        if value is not None:
+            with self._lock:
+                self._remember(key, value, now)
+        return value, "disk"
+
+    def set(self, question, language, simplify, answer):
+        key = cache_key(question, language, simplify)
+        now = self.clock()
+        with self._lock:
+            self._remember(key, answer, now)
+        if self.store:
+            self.store.set(key, answer, now)
+        if self.semantic is not None:
+            row = self.semantic.add(question, language, simplify)
+            if self.vectors is not None:
+                self.vectors.set(key, row, now)
+
+    def forget_plaintext(self):
+        """Delete stored answers keyed by question text (from before keys were hashed)."""
+        if self.store is None:
+            return 0
+        keys = [key for key in self.store.keys(0) if not _DIGEST_RE.fullmatch(key.rsplit("|", 1)[-1])]
+        if keys:
+            self.store.delete_many(keys)
+        return len(keys)
+
+    def index_stored(self):
+        """Add the fresh answers on disk to the semantic index, from their stored rows."""
+        if self.vectors is None or self.semantic is None:
+            return 0
+        now = self.clock()
+        keys = self.vectors.keys(now - self.ttl)[:self.semantic.max_entries]
+        rows = self.vectors.get_many(keys, self.ttl, now)
+        # Oldest first, so the newest are the last to be evicted
+        return sum(self.semantic.restore(key, rows[key]) for key in reversed(keys) if key in rows)
+
+    def get_stale(self, question, language, simplify):
+        """Any stored answer, however old. Only for when we can't generate one."""
+        key = cache_key(question, language, simplify)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry[0]
+        return self.store.get(key, None, self.clock()) if self.store else None
+
+    def _remember(self, key, value, now):
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store:
+            self.store.clear()
+        if self.vectors:
+            self.vectors.clear()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def _load_stored(cache):
+    cache.forget_plaintext()
+    # Answers cached by earlier runs become findable by paraphrase too
+    cache.index_stored()
+
+
+def get_answer_cache():
+    """The process-wide cache (created on first use)."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            semantic = None
+            if SEMANTIC_ENABLED:
+                from pillai.medicines import get_medicine_index
+                from pillai.semantic import SemanticIndex, guard_terms
+
+                medicine_index = get_medicine_index()
+                semantic = SemanticIndex(terms=lambda q: guard_terms(q, medicine_index))
+            # Expired answers are kept for a while as a fallback (see get_stale)
+            store = open_store("answers", retention=DEFAULT_TTL * (1 + STALE_TTLS))
+            vectors = open_store("semantic", retention=DEFAULT_TTL) if semantic is not None else None
+            _answer_cache = AnswerCache(store, semantic=semantic, vectors=vectors)
+            threading.Thread(target=_load_stored, args=(_answer_cache,), name="cache-load", daemon=True).start()
+        return _answer_cache
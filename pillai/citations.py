@@ -0,0 +1,177 @@
+"""The CMI leaflets an Assistants answer actually cited.
+
+The assistant's text carries 【4:0†source】 markers, and its message
+carries a ``file_citation`` annotation for each one with the id of the
+vector-store file the passage came from. The markers are still stripped
+from the text (pillai.answer.CitationStripper), but the sources come from
+the annotations: file id -> uploaded file name -> product in the Medsafe
+link map (MedicineIndex.from_filename), so the footer links the leaflet
+that was cited rather than a generic search page.
+
+File names are listed once per process in the background
+(``files.list``), from the first question sent in memory mode, so
+resolving a citation is normally a dict lookup. A file
+missing from the listing is looked up on its own as soon as its annotation
+streams in, while the rest of the answer is still being generated.
+Streamed annotations can arrive in pieces over several deltas; they are
+merged by their index in the message.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+log = logging.getLogger(__name__)
+
+# How long rendering waits for file names still being looked up
+CITATION_WAIT = float(os.getenv("PILLAI_CITATION_WAIT", 0.5))
+
+
+class FileNames:
+    """Vector-store file id -> file name, listed once and looked up on a miss."""
+
+    def __init__(self, list_files, retrieve_file, max_workers=2):
+        # list_files() -> iterable of objects with .id and .filename;
+        # retrieve_file(file_id) -> one such object
+        self.list_files = list_files
+        self.retrieve_file = retrieve_file
+        self._names = {}
+        self._pending = {}  # file id -> Future for its name
+        self._listing = None
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="citations")
+        self.stats = {"listed": 0, "lookups": 0, "retrieved": 0, "failures": 0}
+
+    def prefetch(self):
+        """List every file in the background (once)."""
+        with self._lock:
+            if self._listing is None:
+                self._listing = self._pool.submit(self._list)
+        return self
+
+    def _list(self):
+        try:
+            names = {f.id: f.filename for f in self.list_files()}
+        except Exception as e:
+            log.warning("Could not list assistant files: %s", e)
+            with self._lock:
+                self.stats["failures"] += 1
+            return
+        with self._lock:
+            self._names.update(names)
+            self.stats["listed"] = len(names)
+
+    def request(self, file_id):
+        """Start resolving ``file_id`` if its name isn't known yet."""
+        with self._lock:
+            self.stats["lookups"] += 1
+            if file_id in self._names or file_id in self._pending:
+                return
+            self._pending[file_id] = self._pool.submit(self._retrieve, file_id)
+
+    def _retrieve(self, file_id):
+        listing = self._listing
+        if listing is not None:
+            listing.result()
+        with self._lock:
+            if file_id in self._names:
+                return self._names[file_id]
+        try:
+            name = self.retrieve_file(file_id).filename
+            key = "retrieved"
+        except Exception as e:
+            log.warning("Could not look up cited file %s: %s", file_id, e)
+            name, key = None, "failures"
+        with self._lock:
+            self.stats[key] += 1
+            if name is not None:
+                self._names[file_id] = name
+            self._pending.pop(file_id, None)
+        return name
+
+    def name(self, file_id, timeout=None):
+        """The file name of ``file_id``, waiting up to ``timeout`` seconds for a lookup."""
+        with self._lock:
+            name = self._names.get(file_id)
+            pending = self._pending.get(file_id)
+        if name is not None or pending is None:
+            return name
+        try:
+            return pending.result(timeout)
+        except FutureTimeout:
+            return None
+
+
+class Citations:
+    """The files one answer cites, collected from its annotations."""
+
+    def __init__(self, names, medicine_index):
+        self.names = names
+        self.medicine_index = medicine_index
+        self._file_ids = {}  # annotation index (or arrival order) -> file id
+        self.file_ids = []  # distinct, in order of first citation
+
+    def add(self, annotations):
+        """Record the ``file_citation`` annotations of a message or message delta."""
+        for annotation in annotations or ():
+            if getattr(annotation, "type", None) != "file_citation":
+                continue
+            citation = getattr(annotation, "file_citation", None)
+            file_id = getattr(citation, "file_id", None)
+            index = getattr(annotation, "index", None)
+            if index is None:
+                index = ("whole", len(self._file_ids))
+            if not file_id or self._file_ids.get(index) == file_id:
+                continue  # a later delta of an annotation already seen
+            self._file_ids[index] = file_id
+            if file_id not in self.file_ids:
+                self.file_ids.append(file_id)
+                self.names.request(file_id)
+
+    def medicines(self, timeout=CITATION_WAIT):
+        """The cited products, one per leaflet, in citation order.
+
+        Files whose name is still unknown after ``timeout`` seconds, or
+        that are not in the Medsafe link map, are left out.
+        """
+        deadline = time.monotonic() + timeout
+        cited = []
+        for file_id in self.file_ids:
+            name = self.names.name(file_id, max(0.0, deadline - time.monotonic()))
+            medicine = self.medicine_index.from_filename(name)
+            if medicine is not None and all(m.url != medicine.url for m in cited):
+                cited.append(medicine)
+        return cited
+
+
+def with_cited(cited, medicines):
+    """Cited leaflets first, then the detected ones not already cited."""
+    urls = {m.url for m in cited}
+    return list(cited) + [m for m in medicines if m.url not in urls]
+
+
+_names = None
+_names_lock = threading.Lock()
+
+
+def get_file_names(api_key=None):
+    """The process-wide FileNames; the first call (with ``api_key``) starts the listing."""
+    global _names
+    with _names_lock:
+        if _names is None and api_key:
+            import openai
+
+            from pillai.upstream import get_upstream
+            client = openai.OpenAI(api_key=api_key, max_retries=0)
+            upstream = get_upstream("openai")
+
+            def list_files():
+                return upstream.call(client.files.list, purpose="assistants", limit=10000)
+
+            def retrieve_file(file_id):
+                return upstream.call(client.files.retrieve, file_id)
+
+            _names = FileNames(list_files, retrieve_file).prefetch()
+        return _names
@@ -0,0 +1,137 @@
+"""Conversation memory kept in the session instead of an Assistants thread.
+
+An Assistants thread resends every earlier turn with each question, so
+follow-ups get slower and dearer as a conversation grows. A Conversation
+keeps the most recent turns verbatim and folds older ones into a rolling
+summary, keeping the history sent with each question under
+PILLAI_MEMORY_TOKENS and at most PILLAI_SESSION_MAX_TURNS verbatim turns.
+Compaction runs on a background thread after an answer is shown; the next
+question waits for it only if it is still going.
+"""
+import logging
+import os
+import sys
+import threading
+
+from pillai.answer import _call
+from pillai.sessions import SESSION_MAX_TURNS
+
+log = logging.getLogger(__name__)
+
+MEMORY_TOKENS = int(os.getenv("PILLAI_MEMORY_TOKENS", 1500))
+SUMMARY_MODEL = os.getenv("PILLAI_SUMMARY_MODEL", "gpt-4o-mini")
+# Turns always kept verbatim, however long they are
+MIN_RECENT_TURNS = 1
+
+SUMMARY_PROMPT = (
+    "Summarise this conversation between a user and Pill-AI, a medicines information "
+    "assistant, in at most {words} words. Keep the medicines, doses, conditions and "
+    "anything the user said about themselves; drop pleasantries.\n\n"
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def _turn_tokens(turn):
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1]) + 8
+
+
+class Conversation:
+    """Recent turns verbatim plus a summary of the older ones, within ``budget`` tokens."""
+
+    def __init__(self, client, budget=MEMORY_TOKENS, model=SUMMARY_MODEL, upstream=None,
+                 max_turns=SESSION_MAX_TURNS):
+        self.client = client
+        self.budget = budget
+        self.max_turns = max(max_turns, MIN_RECENT_TURNS)
+        self.model = model
+        self.upstream = upstream
+        self.summary = ""
+        self.turns = []  # (question, answer) in English, oldest first
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._compacting = None
+
+    def history(self, timeout=10.0):
+        """Chat messages to send before the next question."""
+        compacting = self._compacting
+        if compacting is not None:
+            compacting.join(timeout)
+        with self._lock:
+            messages = []
+            if self.summary:
+                messages.append({"role": "system",
+                                 "content": f"Summary of the earlier conversation:\n{self.summary}"})
+            for question, answer in self.turns:
+                messages.append({"role": "user", "content": question})
+                messages.append({"role": "assistant", "content": answer})
+            return messages
+
+    def tokens(self):
+        with self._lock:
+            return estimate_tokens(self.summary) + sum(_turn_tokens(t) for t in self.turns)
+
+    def footprint(self):
+        """Approximate bytes held, for the session registry."""
+        with self._lock:
+            return sys.getsizeof(self.summary) + sum(sys.getsizeof(q) + sys.getsizeof(a) for q, a in self.turns)
+
+    def add(self, question, answer):
+        """Record a finished turn and compact in the background if over budget."""
+        with self._lock:
+            self.turns.append((question, answer))
+            over = self._over_budget()
+        if over and self._compacting is None:
+            self._compacting = threading.Thread(target=self._compact, name="conversation-compact",
+                                                daemon=True)
+            self._compacting.start()
+
+    def _over_budget(self):
+        if len(self.turns) > self.max_turns:
+            return True
+        total = estimate_tokens(self.summary) + sum(_turn_tokens(t) for t in self.turns)
+        return total > self.budget and len(self.turns) > MIN_RECENT_TURNS
+
+    def _compact(self):
+        try:
+            with self._lock:
+                # Fold the oldest turns until the recent ones fit in half the budget and turn cap
+                recent = list(self.turns)
+                old = []
+                while len(recent) > MIN_RECENT_TURNS and (len(recent) > self.max_turns // 2 or
+                                                          sum(_turn_tokens(t) for t in recent) > self.budget // 2):
+                    old.append(recent.pop(0))
+                summary = self.summary
+            if not old:
+                return
+            new_summary = self._summarise(summary, old)
+            with self._lock:
+                self.summary = new_summary
+                del self.turns[:len(old)]
+                self.compactions += 1
+        except Exception as e:
+            # Keep going without the summary rather than failing the next question
+            log.warning("Conversation compaction failed: %s", e)
+            with self._lock:
+                while self._over_budget():
+                    self.turns.pop(0)
+        finally:
+            self._compacting = None
+
+    def _summarise(self, summary, turns):
+        words = max(30, self.budget // 6)
+        transcript = "\n\n".join(f"User: {q}\nPill-AI: {a}" for q, a in turns)
+        if summary:
+            transcript = f"Earlier summary: {summary}\n\n{transcript}"
+        response = _call(
+            self.upstream, self.client.chat.completions.create,
+            model=self.model,
+            messages=[{"role": "user", "content": SUMMARY_PROMPT.format(words=words) + transcript}],
+        )
+        text = response.choices[0].message.content.strip()
+        # The model doesn't always respect the length; never let the summary eat the budget
+        limit = (self.budget // 2) * 4
+        return text[:limit]
@@ -0,0 +1,305 @@
+"""A process-wide asyncio engine for upstream requests.
+
+Streamlit runs every session's script on its own thread, and each of those
+threads used to block on its own OpenAI or translator call. The engine runs
+one event loop on a background thread. Model requests go through a single
+``openai.AsyncOpenAI`` client, and so share one tuned httpx connection
+pool (PILLAI_ENGINE_CONNECTIONS). Session threads submit jobs and get back
+a concurrent Future, or an iterator of chunks for streams, so hundreds of
+waiting sessions cost the loop nothing but a queue entry.
+
+Every job holds a slot of its upstream's limiter (PILLAI_OPENAI_CONCURRENCY,
+PILLAI_TRANSLATOR_CONCURRENCY) and of the global one (PILLAI_ENGINE_LIMIT)
+while it runs. Jobs waiting for a slot are let in by priority: interactive
+(a Send click) before batch answers before cache warm-up, then in arrival
+order. Queue depth, time spent queued and in-flight counts are kept per
+limiter for the admin page.
+
+Blocking work without an async client (the translator backends, the
+shared cache store) runs on the engine's thread pool under the same
+limits, via ``run_sync``. Retries, deadlines, hedging and the circuit
+breaker still come from pillai.upstream (``Upstream.acall``, and
+``Upstream.aguard`` for streams that fail part way).
+
+The engine is off unless PILLAI_ENGINE=1. On a single CPU
+benchmarks/engine_bench.py measured a slower first token through the
+engine than on the session threads, so until it pays off requests are
+made on the calling threads as before.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from pillai.answer import CHAT_MODEL, build_messages
+from pillai.upstream import get_upstream
+
+log = logging.getLogger(__name__)
+
+# Job priorities, lowest first
+INTERACTIVE = 0
+BATCH = 1
+WARM = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", WARM: "warm"}
+
+ENGINE_LIMIT = int(os.getenv("PILLAI_ENGINE_LIMIT", 256))  # jobs in flight at once, all upstreams
+CONNECTIONS = int(os.getenv("PILLAI_ENGINE_CONNECTIONS", 128))  # pooled HTTP connections to OpenAI
+ENGINE_ENABLED = os.getenv("PILLAI_ENGINE", "0") == "1"
+UPSTREAM_LIMITS = {
+    "openai": int(os.getenv("PILLAI_OPENAI_CONCURRENCY", 128)),
+    "translator": int(os.getenv("PILLAI_TRANSLATOR_CONCURRENCY", 16)),
+}
+
+
+class _End:
+    """Marks the end of a stream on the chunk queue, with its error if it failed."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class PriorityLimiter:
+    """At most ``limit`` holders; waiters get in by priority, then arrival order.
+
+    Only used from the engine's event loop, so it needs no lock.
+    """
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self._waiters = []  # heap of (priority, arrival, future)
+        self._arrivals = itertools.count()
+        self._waits = deque(maxlen=1000)  # seconds spent queued, recent jobs
+        self.stats = {"acquired": 0, "queued": 0, "max_queue": 0}
+
+    async def acquire(self, priority=INTERACTIVE):
+        started = time.monotonic()
+        self.stats["acquired"] += 1
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._waits.append(0.0)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), waiter))
+        self.stats["queued"] += 1
+        self.stats["max_queue"] = max(self.stats["max_queue"], self.queue_depth())
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over as we were cancelled
+            raise
+        self._waits.append(time.monotonic() - started)
+
+    def release(self):
+        # Hand the slot straight to the first live waiter, if any
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def queue_depth(self, priority=None):
+        return sum(1 for p, _, w in self._waiters if not w.done() and (priority is None or p == priority))
+
+    def report(self):
+        waits = sorted(self._waits)
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "in_flight": self.active,
+            **{f"queued_{name}": self.queue_depth(p) for p, name in PRIORITY_NAMES.items()},
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else None,
+            **self.stats,
+        }
+
+
+class Engine:
+    """An event loop on a background thread, with limits and a shared OpenAI client."""
+
+    def __init__(self, api_key=None, limit=ENGINE_LIMIT, upstream_limits=None, connections=CONNECTIONS):
+        self.api_key = api_key
+        self.connections = connections
+        self.loop = asyncio.new_event_loop()
+        self.limiter = PriorityLimiter("all", limit)
+        self.limiters = {name: PriorityLimiter(name, n) for name, n in (upstream_limits or UPSTREAM_LIMITS).items()}
+        # Blocking jobs (run_sync); never more than the limits let through
+        self._threads = ThreadPoolExecutor(max_workers=max(self.limiters["translator"].limit, 1),
+                                           thread_name_prefix="engine-sync")
+        self._client = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        self._thread = threading.Thread(target=self._run_loop, name="engine-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        # Let async generators left open (e.g. inside the HTTP client) close on the loop
+        asyncio.run_coroutine_threadsafe(self.loop.shutdown_asyncgens(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._threads.shutdown(wait=False)
+
+    @property
+    def client(self):
+        """The shared AsyncOpenAI client (created on first use, on the loop)."""
+        if self._client is None:
+            import openai
+
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key or os.getenv("OPENAI_API_KEY"), max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(limits=_pool_limits(self.connections)),
+            )
+        return self._client
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    @asynccontextmanager
+    async def _slot(self, upstream, priority):
+        limiter = self.limiters[upstream]
+        await limiter.acquire(priority)
+        try:
+            await self.limiter.acquire(priority)
+        except BaseException:
+            limiter.release()
+            raise
+        try:
+            yield
+        finally:
+            self.limiter.release()
+            limiter.release()
+
+    async def _job(self, make_coro, upstream, priority):
+        try:
+            async with self._slot(upstream, priority):
+                result = await make_coro()
+        except asyncio.CancelledError:
+            self._count("cancelled")
+            raise
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("completed")
+        return result
+
+    def submit(self, make_coro, upstream="openai", priority=INTERACTIVE):
+        """Run ``make_coro()`` on the loop once a slot is free; returns a concurrent Future."""
+        self._count("submitted")
+        return asyncio.run_coroutine_threadsafe(self._job(make_coro, upstream, priority), self.loop)
+
+    def run_sync(self, fn, *args, upstream="translator", priority=INTERACTIVE):
+        """Run blocking ``fn(*args)`` on the engine's threads under the limits; returns a Future."""
+        return self.submit(lambda: self.loop.run_in_executor(self._threads, fn, *args), upstream, priority)
+
+    def stream(self, make_aiter, upstream="openai", priority=INTERACTIVE):
+        """Iterate, on the calling thread, over the async iterator ``make_aiter()`` returns.
+
+        The slot is held until the iterator is exhausted. Closing the
+        returned generator early cancels the job.
+        """
+        chunks = queue.SimpleQueue()
+
+        async def pump():
+            error = None
+            try:
+                async for chunk in make_aiter():
+                    chunks.put(chunk)
+            except Exception as e:
+                error = e
+            finally:
+                chunks.put(_End(error))
+            if error is not None:
+                raise error
+
+        future = self.submit(pump, upstream, priority)
+        try:
+            while True:
+                chunk = chunks.get()
+                if isinstance(chunk, _End):
+                    if chunk.error is not None:
+                        raise chunk.error
+                    return
+                yield chunk
+        finally:
+            future.cancel()
+
+    def complete_chat(self, question, model=CHAT_MODEL, passages=(), history=(), priority=INTERACTIVE):
+        """``pillai.answer.complete_chat`` on the engine; a Future for the raw answer text."""
+        upstream = get_upstream("openai")
+
+        async def complete():
+            response = await upstream.acall(self.client.chat.completions.create, model=model,
+                                            messages=build_messages(question, passages, history))
+            return response.choices[0].message.content
+
+        return self.submit(complete, "openai", priority)
+
+    def stream_chat(self, question, model=CHAT_MODEL, passages=(), history=(), priority=INTERACTIVE):
+        """``pillai.answer.stream_chat`` on the engine: yields answer text deltas.
+
+        Only opening the stream is retried; a second stream is never hedged.
+        A stream that breaks part way counts as a failure for the breaker.
+        """
+        upstream = get_upstream("openai")
+
+        async def deltas():
+            stream = await upstream.acall(self.client.chat.completions.create, hedge=False, stream=True,
+                                          model=model, messages=build_messages(question, passages, history))
+            try:
+                async with upstream.aguard(admitted=True):
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
+        return self.stream(deltas, "openai", priority)
+
+    def report(self):
+        """Job counts and, per limiter, in-flight and queued jobs and time spent queued."""
+        async def snapshot():
+            return [self.limiter.report()] + [limiter.report() for limiter in self.limiters.values()]
+
+        limits = asyncio.run_coroutine_threadsafe(snapshot(), self.loop).result(5)
+        with self._lock:
+            return {"connections": self.connections, **self.stats, "limits": limits}
+
+
+def _pool_limits(connections):
+    import httpx
+
+    # Keep every pooled connection alive between requests, so bursts don't reconnect
+    return httpx.Limits(max_connections=connections, max_keepalive_connections=connections,
+                        keepalive_expiry=60.0)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(api_key=None):
+    """The process-wide Engine (started on first use), or None unless PILLAI_ENGINE=1."""
+    global _engine
+    if not ENGINE_ENABLED:
+        return None
+    with _engine_lock:
+        if _engine is None:
+            _engine = Engine(api_key)
+        elif api_key and _engine.api_key is None and _engine._client is None:
+            _engine.api_key = api_key
+        return _engine
@@ -0,0 +1,153 @@
+"""Questions typed in Te Reo Māori, Samoan or Mandarin, in English for the model.
+
+The language selector only picks the answer language, and people often
+ask in their own language too. Sending those questions to the model as
+is gives slower and worse answers, so they are translated to English
+first. Most questions are English, though, and must not pay for a
+translator call, so the language is detected locally:
+
+- Mandarin by CJK ideographs (Unicode ranges, no lexicon needed),
+- Te Reo Māori and Samoan by short lexicons of common words that English
+  doesn't use, helped by macrons (both), the ʻokina (Samoan) and "wh"
+  words (Māori).
+
+Detection is a regex pass and a few set lookups, a few microseconds per
+question. Detected questions are translated once through the shared
+Translator, whose memo keeps the English text for repeats.
+"""
+import logging
+import re
+import threading
+import unicodedata
+
+from pillai.translation import get_translator
+
+log = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_WORD_RE = re.compile(r"[^\W\d_]+(?:['ʻ‘’`][^\W\d_]+)*")
+_MACRON_RE = re.compile(r"[āēīōūĀĒĪŌŪ]")
+_OKINA_RE = re.compile(r"[ʻ‘`']")
+# A Māori word starting with wh: open syllables in the Māori alphabet only,
+# so English what, when, why and which don't count
+_MAORI_WH_RE = re.compile(r"wh[aeiou](?:(?:wh|ng|[hkmnprtw])?[aeiou])*")
+
+# Common words of each language, without macrons or ʻokina. English words
+# (he, me, i, a, to, ...) are left out so they can't tip the balance.
+MAORI_WORDS = frozenset("""
+    te o e nga ka ki ko kei aha pehea tenei enei taku toku tona oku ahau koe kia kaore
+    hei mo ra wa hia tango tangohia taea rongoa pire rata kai pai tino ranei nei
+    ana mate mauiui hapu haputanga panga kino whakamahi whai mahi inu kua kore
+    anake mehemea mena hoki rawa ake atu ai tetahi
+""".split())
+SAMOAN_WORDS = frozenset("""
+    le o e ou ua lea faafefea lou se lenei mai fia vailaau fomai au ai pe ina
+    fai ao aai tatau mafai fea ea poo aoga maitaga ave mea latou ona ni
+    aso leaga aafiaga saogalemu meaai fualaau uma ia lava foi nei
+""".split())
+ENGLISH_WORDS = frozenset("""
+    a an and are as at be can could do does for from has have he her his how i if
+    in is it its me my no not of on or she should so take taking that the this to
+    use was what when where which while who why will with you your much many often
+    long side effects dose safe pregnant medicine tablet pill
+""".split())
+
+
+def _fold(word):
+    """Lowercase without macrons or ʻokina, as the lexicons are written."""
+    word = _OKINA_RE.sub("", word.lower())
+    return "".join(c for c in unicodedata.normalize("NFD", word) if not unicodedata.combining(c))
+
+
+def detect_language(text):
+    """A translator language code for non-English ``text``, else None."""
+    cjk = len(_CJK_RE.findall(text))
+    if cjk >= 2 or cjk and cjk * 2 >= len(text.strip()):
+        return "zh-CN"
+    words = [_fold(w) for w in _WORD_RE.findall(text)]
+    if not words:
+        return None
+    english = sum(w in ENGLISH_WORDS for w in words)
+    maori = sum(w in MAORI_WORDS or w not in ENGLISH_WORDS and bool(_MAORI_WH_RE.fullmatch(w))
+                for w in words)
+    samoan = sum(w in SAMOAN_WORDS for w in words) + len(_OKINA_RE.findall(text.replace("'", "")))
+    macrons = min(len(_MACRON_RE.findall(text)), 2)
+    maori += macrons
+    samoan += macrons
+    best, score = ("mi", maori) if maori >= samoan else ("sm", samoan)
+    # Two cues at least, and more than the English ones ("panadol te", say, stays English)
+    if score >= 2 and score > english:
+        return best
+    return None
+
+
+class Inbound:
+    """A question as asked, and the English text the pipeline should use."""
+
+    def __init__(self, question, english, source=None, api_calls=0, failed=False):
+        self.question = question
+        self.english = english
+        self.source = source
+        self.api_calls = api_calls
+        self.failed = failed
+
+    @property
+    def translated(self):
+        return self.english != self.question
+
+
+class InboundTranslator:
+    """Detect the question language; translate non-English questions to English."""
+
+    def __init__(self, translator=None):
+        self._translator = translator
+        self._lock = threading.Lock()
+        # "english" questions skipped the translator; "memo_hits" were translated before
+        self.stats = {"questions": 0, "english": 0, "translated": 0, "translator_calls": 0,
+                      "memo_hits": 0, "failed": 0}
+
+    @property
+    def translator(self):
+        return self._translator or get_translator()
+
+    def detect(self, question):
+        """The question's language code, or None for English."""
+        source = detect_language(question)
+        with self._lock:
+            self.stats["questions"] += 1
+            if source is None:
+                self.stats["english"] += 1
+        return source
+
+    def to_english(self, question, source=None):
+        """The question in English; ``source`` is a code from ``detect``, if already known."""
+        source = source or self.detect(question)
+        if source is None:
+            return Inbound(question, question)
+        try:
+            # Questions stay out of the shared store (pillai.cache)
+            english, calls = self.translator.translate_counted(question, "en", shared=False)
+        except Exception as e:
+            # The model still copes with the original; a slower answer beats none
+            log.warning("Could not translate the %s question, using it as asked: %s", source, e)
+            with self._lock:
+                self.stats["failed"] += 1
+            return Inbound(question, question, source, failed=True)
+        with self._lock:
+            self.stats["translated"] += 1
+            self.stats["translator_calls"] += calls
+            self.stats["memo_hits"] += not calls
+        return Inbound(question, english, source, api_calls=calls)
+
+
+_inbound = None
+_inbound_lock = threading.Lock()
+
+
+def get_inbound_translator():
+    """The process-wide InboundTranslator (created on first use)."""
+    global _inbound
+    with _inbound_lock:
+        if _inbound is None:
+            _inbound = InboundTranslator()
+        return _inbound
@@ -0,0 +1,288 @@
+"""Turn downloaded CMI leaflet PDFs into a sectioned text corpus.
+
+Reads the PDFs referenced by medsafe_source_links_cleaned.json from a
+local directory (either mirroring the URL paths, e.g.
+``Consumers/CMI/i/IbuprofenRelieve.pdf``, or flat by file name) and
+extracts their text in a process pool. Each leaflet is split into
+sections (uses, dosage, side effects, interactions, everything else) by
+its headings.
+
+Many product keys share one PDF, so work is done per distinct URL and,
+within a run, per distinct file content. The aliases (product keys) of
+each URL are stored with it. Runs are incremental: a leaflet whose
+SHA-256 matches the previous corpus is reused without re-extracting,
+and files whose size and mtime have not changed are not even re-hashed.
+
+The corpus is a directory, memory-mapped by ``Corpus``:
+
+    meta.json     sections, and per leaflet: url, aliases, sha256, size, mtime
+    offsets.npy   int64 (n_leaflets * n_sections + 1) offsets into text.bin
+    text.bin      UTF-8 section text, concatenated
+
+    python -m pillai.ingest PDF_DIR [--corpus .pillai_corpus] [--workers N]
+    python -m pillai.retrieval build .pillai_corpus .pillai_index
+
+Text extraction needs ``pypdf``.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+
+from pillai.medicines import DATA_PATH
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_DIR = os.getenv("PILLAI_CORPUS", ".pillai_corpus")
+SECTIONS = ("uses", "dosage", "side_effects", "interactions", "other")
+
+# Checked in order; the first match names the section a heading starts
+_SECTION_PATTERNS = [
+    ("side_effects", re.compile(r"side effects|unwanted effects|adverse")),
+    ("interactions", re.compile(r"other medicines|interact|taking other")),
+    ("uses", re.compile(r"used for|used to|why am i (?:using|taking|being given)|what (?:it|\w+) does")),
+    ("other", re.compile(r"^before |while you|after (?:using|taking)|\bstor(?:e|age)\b|product (?:details|description)"
+                         r"|things (?:you|to)|ingredients|supplier|sponsor")),
+    ("dosage", re.compile(r"how (?:do i|to|should i|much|often|long)\b|\bdos(?:e|es|age|ing)\b|overdose|too much")),
+]
+_NUMBERED_RE = re.compile(r"^\d{1,2}[.)]\s+\S")
+HEADING_MAX_WORDS = 14
+
+
+def heading_section(line):
+    """The section a heading line starts, or None if it isn't a heading.
+
+    Headings are short lines that are numbered ("4. How do I use X?"),
+    end in a question mark, or name a known section ("Side effects").
+    Unrecognised headings start an "other" section.
+    """
+    words = line.split()
+    if not words or len(words) > HEADING_MAX_WORDS:
+        return None
+    lower = line.lower()
+    numbered = bool(_NUMBERED_RE.match(line))
+    # A known section name as a short line of its own, or any numbered or question heading
+    if not (numbered or line.endswith("?") or len(words) <= 6 and not line.endswith(".")):
+        return None
+    for section, pattern in _SECTION_PATTERNS:
+        if pattern.search(lower):
+            return section
+    return "other" if numbered or line.endswith("?") else None
+
+
+def split_sections(text):
+    """Split leaflet text into ``{section: text}`` for every name in SECTIONS.
+
+    Text before the first heading, and under headings that aren't one of
+    the known sections, goes to "other". Each heading starts a new
+    paragraph, so the result splits into passages at headings.
+    """
+    parts = {section: [] for section in SECTIONS}
+    current = "other"
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        section = heading_section(line)
+        if section is not None:
+            current = section
+            parts[current].append("\n\n" + line + "\n")
+        else:
+            parts[current].append(line + "\n")
+    return {section: "".join(lines).strip() for section, lines in parts.items()}
+
+
+def extract_file(path):
+    """Sections of the PDF at ``path`` (runs in a worker process)."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    return split_sections(text)
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def leaflet_aliases(path=DATA_PATH):
+    """``{url: [product keys]}`` in file order."""
+    with open(path, encoding="utf-8") as f:
+        links = json.load(f)
+    aliases = {}
+    for key, url in links.items():
+        aliases.setdefault(url, []).append(key)
+    return aliases
+
+
+def local_path(pdf_dir, url):
+    """Where ``url`` was downloaded under ``pdf_dir``, or None."""
+    url_path = unquote(urlparse(url).path).lstrip("/")
+    for candidate in (os.path.join(pdf_dir, url_path), os.path.join(pdf_dir, os.path.basename(url_path))):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class Corpus:
+    """An ingested corpus, memory-mapped from ``corpus_dir``."""
+
+    def __init__(self, corpus_dir):
+        with open(os.path.join(corpus_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.sections = meta["sections"]
+        self.leaflets = meta["leaflets"]
+        self.urls = [leaflet["url"] for leaflet in self.leaflets]
+        self.offsets = np.load(os.path.join(corpus_dir, "offsets.npy"), mmap_mode="r")
+        self.text = np.memmap(os.path.join(corpus_dir, "text.bin"), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self._ids = {url: i for i, url in enumerate(self.urls)}
+
+    def __len__(self):
+        return len(self.leaflets)
+
+    def __contains__(self, url):
+        return url in self._ids
+
+    def section(self, url, name):
+        i = self._ids[url] * len(self.sections) + self.sections.index(name)
+        return self.text[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def sections_of(self, url):
+        return {name: self.section(url, name) for name in self.sections}
+
+    def aliases(self, url):
+        return self.leaflets[self._ids[url]]["aliases"]
+
+    def docs(self):
+        """Yield ``(url, text)`` per leaflet, as ``retrieval.build_index`` takes."""
+        for url in self.urls:
+            parts = [text for text in self.sections_of(url).values() if text]
+            yield url, "\n\n".join(parts)
+
+
+def write_corpus(leaflets, sections, out_dir):
+    """Write leaflet metadata and matching ``{section: text}`` dicts to ``out_dir``, replacing it whole."""
+    chunks = []
+    offsets = np.zeros(len(leaflets) * len(SECTIONS) + 1, dtype=np.int64)
+    position = 0
+    for i, parts in enumerate(sections):
+        for j, name in enumerate(SECTIONS):
+            encoded = parts.get(name, "").encode("utf-8")
+            chunks.append(encoded)
+            position += len(encoded)
+            offsets[i * len(SECTIONS) + j + 1] = position
+
+    # Built next to the target and swapped in, so readers never see a half-written corpus
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".pillai-corpus-")
+    try:
+        np.save(os.path.join(tmp, "offsets.npy"), offsets)
+        with open(os.path.join(tmp, "text.bin"), "wb") as f:
+            f.write(b"".join(chunks))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"sections": SECTIONS, "leaflets": leaflets}, f, separators=(",", ":"))
+        old = None
+        if os.path.exists(out_dir):
+            old = tmp + ".old"
+            os.replace(out_dir, old)
+        os.replace(tmp, out_dir)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def ingest(pdf_dir, out_dir=DEFAULT_CORPUS_DIR, links=DATA_PATH, workers=None):
+    """Build or update the corpus at ``out_dir``. Returns counts of what was done."""
+    previous = Corpus(out_dir) if os.path.exists(os.path.join(out_dir, "meta.json")) else None
+    by_url = {leaflet["url"]: leaflet for leaflet in previous.leaflets} if previous else {}
+    by_sha = {}
+    if previous:
+        for leaflet in previous.leaflets:
+            by_sha.setdefault(leaflet["sha256"], leaflet["url"])
+
+    counts = Counter()
+    found = []  # (url, aliases, path, stat, sha256)
+    for url, aliases in leaflet_aliases(links).items():
+        path = local_path(pdf_dir, url)
+        if path is None:
+            counts["missing"] += 1
+            continue
+        stat = os.stat(path)
+        old = by_url.get(url)
+        if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+            sha = old["sha256"]
+        else:
+            sha = file_sha256(path)
+        found.append((url, aliases, path, stat, sha))
+
+    # One extraction per distinct content not already in the corpus
+    todo = {}
+    for url, _, path, _, sha in found:
+        if sha not in by_sha:
+            todo.setdefault(sha, path)
+    extracted = {}
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {sha: pool.submit(extract_file, path) for sha, path in todo.items()}
+            for sha, future in futures.items():
+                try:
+                    extracted[sha] = future.result()
+                except Exception as e:
+                    log.warning("Could not extract %s: %s: %s", todo[sha], type(e).__name__, e)
+                    counts["failed"] += 1
+
+    leaflets, sections = [], []
+    for url, aliases, path, stat, sha in found:
+        if sha in extracted:
+            parts = extracted[sha]
+            counts["extracted" if todo.get(sha) == path else "shared"] += 1
+        elif sha in by_sha:
+            parts = previous.sections_of(by_sha[sha])
+            counts["reused"] += 1
+        elif url in by_url:
+            # Extraction failed: keep the last good text (and its file stat, so it is retried)
+            leaflets.append({**by_url[url], "aliases": aliases})
+            sections.append(previous.sections_of(url))
+            continue
+        else:
+            continue
+        leaflets.append({"url": url, "aliases": aliases, "sha256": sha,
+                         "size": stat.st_size, "mtime": stat.st_mtime_ns})
+        sections.append(parts)
+    write_corpus(leaflets, sections, out_dir)
+    counts["leaflets"] = len(leaflets)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract CMI leaflet PDFs into a sectioned corpus")
+    parser.add_argument("pdf_dir", help="directory of downloaded leaflet PDFs")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="corpus directory to build or update")
+    parser.add_argument("--links", default=DATA_PATH, help="the key -> URL map of leaflets")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    start = time.perf_counter()
+    counts = ingest(args.pdf_dir, args.corpus, args.links, args.workers)
+    print(json.dumps({**counts, "seconds": round(time.perf_counter() - start, 2)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
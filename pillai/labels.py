@@ -0,0 +1,361 @@
+"""Static UI text for every supported language.
+
+Kept out of app.py so Streamlit reruns don't rebuild these tables; the app
+loads them once per process through st.cache_resource.
+"""
+
+lang_codes = {"Te Reo Māori": "mi", "Samoan": "sm", "Mandarin": "zh-CN"}
+
+labels = {
+    "English": {
+        #"prompt": "Ask a medicine question:",
+        "placeholder": "💡 Ask a medication related question",
+        "send": "Send",
+        "thinking": "Thinking...",
+       # "tagline": "Helping Kiwis understand medicines, safely.",
+        "empty": "Please enter a question.",
+        "error": "The assistant failed to complete the request.",
+        "translation_unavailable": "Translation is unavailable right now, so this answer is shown in English.",
+        "stale_answer": "The assistant is unavailable right now. This is an earlier answer to the same question.",
+        "medicine_suggestions": "Medicine names",
+        "disclaimer": "⚠️ Pill-AI is not a substitute for professional advice from your pharmacist or doctor. Please contact them or Healthline (0800 611 116) if you have any questions or concerns.",
+        "privacy_title": "🔐 Privacy Policy – Click to expand",
+        "privacy": """### 🛡️ Pill-AI Privacy Policy (Prototype Version)
+
+Welcome to Pill-AI — your trusted medicines advisor. This is a prototype to test if a tool like this can help people learn about their medicines using trusted Medsafe resources.
+
+**📌 What we collect**  
+– The questions you type into the chat box  
+
+**🔁 Who else is involved**  
+– OpenAI (for generating answers)  
+– Streamlit (to host the app)  
+– Google (for hosting and analytics)
+
+**👶 Users under 16**  
+We don’t ask for names, emails, or any personal information.
+
+**🗑️ Temporary data**  
+All data will be deleted after testing. This is a prototype.
+
+**📬 Questions?**  
+Contact us: pillai.nz.contact@gmail.com
+
+*Pill-AI is not a substitute for professional medical advice.*"""
+    },
+    "Te Reo Māori": {
+      #  "prompt": "Pātaihia tētahi pātai e pā ana ki te rongoā:",
+        "placeholder": "💡 Hei tauira: Ka pai rānei te tango i te ibuprofen me te Panadol?",
+        "send": "Tukua",
+        "thinking": "E whakaaro ana...",
+      #  "tagline": "Āwhinatia ngā Kiwi kia mārama ki ā rātou rongoā mā ngā kōrero mai i a Medsafe.",
+        "empty": "Tēnā koa, tuhia he pātai.",
+        "error": "I rahua te kaiawhina ki te whakaoti i te tono.",
+        "translation_unavailable": "Kāore e wātea ana te whakamāoritanga i tēnei wā, nō reira kei te reo Pākehā tēnei whakautu.",
+        "stale_answer": "Kāore e wātea ana te kaiawhina i tēnei wā. He whakautu o mua tēnei ki taua pātai anō.",
+        "medicine_suggestions": "Ngā ingoa rongoā",
+        "disclaimer": "⚠️ Ehara a Pill-AI i te kaiārahi hauora tōtika. Me toro atu ki te rata, te kai rongoā rānei.",
+        "privacy_title": "🔐 Kaupapahere Tūmataiti – Pāwhiritia kia kite",
+        "privacy": """### 🛡️ Kaupapahere Tūmataiti o Pill-AI (Putanga Whakamātau)
+
+Nau mai ki a Pill-AI — tō kaiāwhina rongoā pono. He putanga whakamātau tēnei hei āwhina i te iwi kia mārama ki ā rātou rongoā mā ngā rauemi Medsafe.
+
+**📌 Ka kohia**  
+– Ngā pātai ka tuhia e koe  
+
+**🔁 Ko wai anō e uru ana**  
+– OpenAI (hei hanga whakautu)  
+– Streamlit (hei tuku i te pae tukutuku)  
+– Google (hei manaaki me te aromātai)
+
+**👶 Tamariki i raro i te 16**  
+Kāore mātou e tono mō ō ingoa, īmēra, rānei.
+
+**🗑️ Raraunga poto noa**  
+Ka mukua katoatia ngā raraunga i muri i te wā whakamātau. He putanga whakamātau tēnei.
+
+**📬 Pātai?**  
+Whakapā mai: pillai.nz.contact@gmail.com
+
+*Ehara a Pill-AI i te whakakapi mō ngā tohutohu hauora.*"""
+    },
+    "Samoan": {
+     #   "prompt": "Fesili i se fesili e uiga i fualaau:",
+        "placeholder": "💡 Fa'ata'ita'iga: E mafai ona ou inuina le ibuprofen ma le Panadol?",
+        "send": "Auina atu",
+        "thinking": "O mafaufau...",
+      #  "tagline": "Fesoasoani i tagata Niu Sila ia malamalama i a latou fualaau e ala i fa'amatalaga fa'atuatuaina mai le Medsafe.",
+        "empty": "Fa'amolemole tusia se fesili.",
+        "error": "Le mafai e le fesoasoani ona tali atu.",
+        "translation_unavailable": "E le o avanoa le faaliliuga i le taimi nei, o lea ua faaali atu ai lenei tali i le gagana Peretania.",
+        "stale_answer": "E le o avanoa le fesoasoani i le taimi nei. O se tali muamua lenei i le fesili lava e tasi.",
+        "medicine_suggestions": "Igoa o vailaau",
+        "disclaimer": "⚠️ E le suitulaga Pill-AI i se foma'i moni. Fa'amolemole fa'afeso'ota'i se foma'i po'o se fomai fai fualaau.",
+        "privacy_title": "🔐 Faiga Fa'alilolilo – Kiliki e faitau",
+        "privacy": """### 🛡️ Faiga Fa'alilolilo a Pill-AI (Fa'ata'ita'iga)
+
+Afio mai i Pill-AI — lau fesoasoani i fualaau. O se fa'ata'ita'iga lenei e fesoasoani i tagata ia malamalama i fualaau e fa'aaogaina ai fa'amatalaga mai Medsafe.
+
+**📌 Mea matou te pueina**  
+– Fesili e te tusia i le pusa fesili  
+
+**🔁 O ai e fesoasoani**  
+– OpenAI (mo tali atamai)  
+– Streamlit (mo le upega tafa'ilagi)  
+– Google (mo le talimalo ma le iloiloga)
+
+**👶 I lalo o le 16 tausaga**  
+Matou te le aoina ni igoa, imeli, po'o fa'amatalaga patino.
+
+**🗑️ Fa'amatalaga le tumau**  
+O fa'amatalaga uma o le a tapea pe a uma le vaitaimi o le fa'ata'ita'iga.
+
+**📬 Fesili?**  
+Imeli: pillai.nz.contact@gmail.com
+
+*Pill-AI e le suitulaga i fautuaga fa'apolofesa tau soifua mālōlōina.*"""
+    },
+    "Mandarin": {
+  #      "prompt": "请提出一个与药物有关的问题：",
+        "placeholder": "💡 例如：布洛芬和扑热息痛可以一起吃吗？",
+        "send": "发送",
+        "thinking": "思考中...",
+   #     "tagline": "通过 Medsafe 的可靠信息帮助新西兰人了解他们的药物。",
+        "empty": "请输入一个问题。",
+        "error": "助手未能完成请求。",
+        "translation_unavailable": "翻译服务暂时不可用，因此此回答以英文显示。",
+        "stale_answer": "助手暂时不可用。以下是之前对同一问题的回答。",
+        "medicine_suggestions": "药品名称",
+        "disclaimer": "⚠️ Pill-AI 不能替代专业医疗建议。请咨询医生或药剂师。",
+        "privacy_title": "🔐 隐私政策 – 点击展开",
+        "privacy": """### 🛡️ Pill-AI 隐私政策（测试版）
+
+欢迎使用 Pill-AI —— 您值得信赖的用药助手。本工具为测试版本，帮助用户通过 Medsafe 学习药品信息。
+
+**📌 我们收集的信息**  
+– 您在对话框中输入的问题  
+
+**🔁 涉及的平台**  
+– OpenAI（用于生成回答）  
+– Streamlit（用于网站托管）  
+– Google（托管和分析）
+
+**👶 16岁以下用户**  
+我们不会索取您的姓名、电邮或其他个人信息。
+
+**🗑️ 数据处理**  
+这是一个测试版本。所有数据将在测试结束后删除。
+
+**📬 联系方式**  
+邮箱：pillai.nz.contact@gmail.com
+
+*Pill-AI 并不能替代专业医疗建议。*"""
+    }
+}
+
+MEDSAFE_SEARCH_URL = "https://www.medsafe.govt.nz/medicines/infoSearch.asp"
+medsafe_sources = {
+    "English": "_This information has been sourced from Medsafe NZ._",
+    "Te Reo Māori": "_I ahu mai tēnei pārongo i Medsafe Aotearoa._",
+    "Samoan": "_O lenei fa'amatalaga e sau mai Medsafe Niu Sila._",
+    "Mandarin": "_本信息来自新西兰 Medsafe。_"
+}
+
+faq_sections = {
+    "English": """
+### ❓ Frequently Asked Questions (FAQ)
+
+#### 💊 About Pill-AI
+**What is Pill-AI?**  
+Pill-AI is a friendly chatbot that helps New Zealanders understand their medicines.  
+**Who is it for?**  
+Everyday Kiwis, especially those who:  
+– Struggle with medical language  
+– Are visually impaired  
+– Prefer simpler explanations  
+– Want quick answers on their phone  
+**Is it free?**  
+Yes.
+
+#### 📚 Where the Info Comes From
+**Where does Pill-AI get its answers?**  
+From Medsafe Consumer Medicine Information (CMI) leaflets.  
+**Can I trust it?**  
+Yes, but always check with a health professional too.
+
+#### 🗨️ Using Pill-AI
+**What can I ask?**  
+– "What is cetirizine for?"  
+– "Can I take ibuprofen with food?"  
+**Does it give medical advice?**  
+No. It only explains medicine info — it doesn’t diagnose or prescribe.  
+**Can I upload a prescription?**  
+Coming soon.
+
+#### 🌐 Languages
+**What languages are supported?**  
+English, Te Reo Māori, Samoan, Mandarin.  
+**Are the translations perfect?**  
+Not always — they use AI. Ask a health worker if unsure.
+
+#### 🔐 Privacy and Safety
+**Is my data private?**  
+Yes. Questions aren't stored.  
+**Is this an emergency service?**  
+No. Call 111 if it’s urgent.
+
+#### 🧪 Feedback and Credits
+**Can I help improve Pill-AI?**  
+Yes — especially if you speak Te Reo or Samoan.  
+**Who made this?**  
+It was developed in Aotearoa NZ using Medsafe info to make medicine info more accessible.
+""",
+    "Te Reo Māori": """
+### ❓ He Pātai Auau
+
+#### 💊 Mō Pill-AI
+**He aha a Pill-AI?**  
+He kaiawhina ā-ipurangi hei whakamārama i ngā rongoā.  
+**Mō wai tēnei?**  
+Mō ngā tāngata katoa — otirā te hunga:  
+– E uaua ana ki te mārama ki ngā kupu hauora  
+– Kua ngoikore te kite  
+– E hiahia ana i ngā whakamārama māmā  
+**He utu āwhina?**  
+Kāo – he kore utu.
+
+#### 📚 Nō hea ngā pārongo?
+**Kei hea e tiki ana a Pill-AI i ngā kōrero?**  
+Mai i ngā tuhinga CMI a Medsafe.  
+**Ka taea te whakawhirinaki?**  
+Āe – engari me ui tonu ki tō rata, ki te kaiwhakarato hauora hoki.
+
+#### 🗨️ Te whakamahi i a Pill-AI
+**He aha ngā pātai ka taea?**  
+– "He aha te mahi a cetirizine?"  
+– "Ka taea te kai me te ibuprofen?"  
+**Ka tuku tohutohu hauora?**  
+Kāo – he whakamārama anake, kāore e tuku tohutohu, āta wānanga rānei.  
+**Ka taea te tuku whakaahua o te rongoā?**  
+Ā tōna wā.
+
+#### 🌐 Ngā Reo
+**Ngā reo tautoko:**  
+Te Reo Māori, Ingarihi, Gagana Sāmoa, Mandarin.  
+**He tika ngā whakamāoritanga?**  
+Kāore i te tino tika i ngā wā katoa – whakamahia mā te āta whakaaro.
+
+#### 🔐 Te Tūmataiti me te Haumaru
+**Ka tiakina taku raraunga?**  
+Āe – kāore mātou e penapena i ngā pātai.  
+**He ratonga ohotata tēnei?**  
+Kāo – waea atu ki te 111 mēnā he ohotata.
+
+#### 🧪 Urupare
+**Ka taea te tuku urupare?**  
+Āe – āwhina mai mēnā e mōhio ana koe ki Te Reo.  
+**Nā wai i waihanga?**  
+Nā tētahi kairangahau i Aotearoa hei āwhina i te marea.
+""",
+    "Samoan": """
+### ❓ Fesili e masani ona fesiligia
+
+#### 💊 E uiga i Pill-AI
+**O le ā le Pill-AI?**  
+O se fesoasoani fa'akomepiuta e fesoasoani ia te oe e malamalama i fualaau.  
+**Mo ai?**  
+Mo tagata uma — aemaise i ē:  
+– E faigatā ona malamalama i le gagana fa'afoma'i  
+– E le lelei le vaai  
+– E mana'o i se fa'amatalaga faigofie  
+**E totogi?**  
+Leai – e fua fua.
+
+#### 📚 O fea mai ai fa'amatalaga?
+**O fea e maua mai ai fa'amatalaga a Pill-AI?**  
+Mai Medsafe – CMI pepa.  
+**E mafai ona fa'atuatuaina?**  
+Ioe – ae fesili pea i lau foma'i.
+
+#### 🗨️ Fa'aoga
+**O le ā e mafai ona ou fesili ai?**  
+– "O le ā le cetirizine?"  
+– "E mafai ona inu ibuprofen ma le taumafataga?"  
+**E foa'i fautuaga fa'afoma'i?**  
+Leai – e fa'amatala atu na'o le fa'amatalaga.  
+**E mafai ona ou lafoina se vaila'au pepa?**  
+O lo'o galue iai.
+
+#### 🌐 Gagana
+**O ā gagana e avanoa?**  
+Gagana Peretania, Te Reo Māori, Gagana Samoa, Mandarin.  
+**E atoatoa faaliliuga?**  
+E le atoatoa – fa'amalie atu.
+
+#### 🔐 Fa'alilolilo ma le Saogalemu
+**E fa'apefea ona puipuia a'u fa'amatalaga?**  
+E le teuina au fesili.  
+**O se auaunaga fa'afuase'i?**  
+Leai – vala'au le 111 pe a manaomia.
+
+#### 🧪 Fesoasoani
+**E mafai ona ou fesoasoani e fa'aleleia?**  
+Ioe – aemaise pe a mafai ona e fesoasoani i le gagana.  
+**O ai na faia?**  
+Na fausia i Niu Sila mo tagata Niu Sila.
+""",
+    "Mandarin": """
+### ❓ 常见问题 (FAQ)
+
+#### 💊 关于 Pill-AI
+**什么是 Pill-AI？**  
+Pill-AI 是一个帮助新西兰人了解药品信息的聊天机器人。  
+**适合谁使用？**  
+适合所有人，特别是：  
+– 难以理解医疗术语的人  
+– 视力不好的人  
+– 想要简明易懂解释的人  
+**是免费的吗？**  
+是的，完全免费。
+
+#### 📚 信息来源
+**Pill-AI 的信息来源是哪里？**  
+来自新西兰 Medsafe 的 CMI（药品说明书）。  
+**这些信息可靠吗？**  
+可靠，但建议同时咨询医生或药剂师。
+
+#### 🗨️ 如何使用 Pill-AI
+**我可以问什么？**  
+– “Cetirizine 有什么作用？”  
+– “饭前可以吃布洛芬吗？”  
+**会提供医疗建议吗？**  
+不会，它只解释药品信息，不提供诊断或处方。  
+**可以上传处方照片吗？**  
+即将推出。
+
+#### 🌐 支持的语言
+**支持哪些语言？**  
+英语、毛利语、萨摩亚语、中文。  
+**翻译准确吗？**  
+并非完全准确，重要问题请咨询专业人士。
+
+#### 🔐 隐私与安全
+**我的问题会被记录吗？**  
+不会，问题不会被存储。  
+**这是不是紧急服务？**  
+不是。如遇紧急情况，请拨打 111。
+
+#### 🧪 意见与反馈
+**我可以帮助改进吗？**  
+可以，尤其是懂双语的用户。  
+**这个工具是谁做的？**  
+由新西兰团队开发，目的是让药品信息更易懂。
+"""
+}
+
+faq_titles = {
+    "English": "❓ FAQ – Click to expand",
+    "Te Reo Māori": "❓ He Pātai Auau – Pāwhiritia kia kite",
+    "Samoan": "❓ Fesili masani – Kiliki e faitau",
+    "Mandarin": "❓ 常见问题 – 点击展开"
+}
@@ -0,0 +1,171 @@
+"""Check the CMI leaflet links in medsafe_source_links_cleaned.json.
+
+The map has ~1.6k keys but only ~1.4k distinct PDF URLs. Each distinct URL
+is fetched once, concurrently, over a pooled keep-alive session. The
+result is kept in a small JSON index (status, size, Last-Modified, ETag
+and a SHA-256 of the body per URL). Later runs send If-None-Match /
+If-Modified-Since from the index, so unchanged leaflets come back as 304
+and are not downloaded again.
+
+    python -m pillai.links verify [--index .pillai_links.json] [--concurrency 16]
+    python -m pillai.links report [--index .pillai_links.json]
+
+``--rewrite https://www.medsafe.govt.nz=http://127.0.0.1:8766`` points
+the checks at a local stand-in (see benchmarks/fake_medsafe.py).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from pillai.medicines import DATA_PATH
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.getenv("PILLAI_LINKS_INDEX", ".pillai_links.json")
+# One row per URL, in this order, to keep the index small
+FIELDS = ("status", "size", "last_modified", "etag", "sha256", "checked", "error")
+USER_AGENT = "Pill-AI link checker"
+
+
+def leaflet_urls(path=DATA_PATH):
+    """Distinct leaflet URLs, in file order."""
+    with open(path, encoding="utf-8") as f:
+        return list(dict.fromkeys(json.load(f).values()))
+
+
+def load_index(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {url: dict(zip(data["fields"], row)) for url, row in data["urls"].items()}
+
+
+def save_index(index, path):
+    """Atomically write the index."""
+    data = {"fields": FIELDS, "urls": {url: [entry.get(f) for f in FIELDS] for url, entry in index.items()}}
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".pillai-links-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def make_session(concurrency):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    # One keep-alive connection per worker thread to the (single) host
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def check(session, url, previous=None, fetch_url=None, timeout=20):
+    """Fetch ``url`` (conditionally, if ``previous`` has validators).
+
+    Returns ``(entry, outcome)``; outcome is "unchanged", "changed", "new"
+    or "broken".
+    """
+    headers = {}
+    if previous and previous.get("status") == 200:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+    entry = {"checked": int(time.time())}
+    try:
+        with session.get(fetch_url or url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code != 200:
+                # Read the (empty or short) body so the connection goes back to the pool
+                response.content
+            if response.status_code == 304 and previous:
+                return {**previous, **entry}, "unchanged"
+            entry.update(status=response.status_code,
+                         last_modified=response.headers.get("Last-Modified"),
+                         etag=response.headers.get("ETag"))
+            if response.status_code != 200:
+                entry["error"] = response.reason
+                return entry, "broken"
+            digest = hashlib.sha256()
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                digest.update(chunk)
+                size += len(chunk)
+            entry.update(size=size, sha256=digest.hexdigest())
+    except Exception as e:
+        entry.update(status=None, error=f"{type(e).__name__}: {e}")
+        return entry, "broken"
+    if not previous or previous.get("status") != 200:
+        return entry, "new"
+    return entry, "unchanged" if entry["sha256"] == previous.get("sha256") else "changed"
+
+
+def verify(urls, index, concurrency=16, rewrite=None, session=None):
+    """Check every URL into ``index`` (updated in place); returns outcome counts."""
+    session = session or make_session(concurrency)
+    counts = Counter()
+    lock = threading.Lock()
+
+    def run(url):
+        fetch_url = url
+        if rewrite and url.startswith(rewrite[0]):
+            fetch_url = rewrite[1] + url[len(rewrite[0]):]
+        entry, outcome = check(session, url, index.get(url), fetch_url)
+        with lock:
+            index[url] = entry
+            counts[outcome] += 1
+        if outcome == "broken":
+            log.warning("Broken leaflet link %s: %s %s", url, entry.get("status"), entry.get("error"))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="links") as pool:
+        list(pool.map(run, urls))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the Medsafe CMI leaflet links")
+    parser.add_argument("command", choices=("verify", "report"))
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="JSON index of earlier results")
+    parser.add_argument("--links", default=DATA_PATH, help="the key -> URL map to check")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rewrite", help="PREFIX=REPLACEMENT applied to URLs before fetching")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    index = load_index(args.index)
+    if args.command == "verify":
+        urls = leaflet_urls(args.links)
+        rewrite = tuple(args.rewrite.split("=", 1)) if args.rewrite else None
+        start = time.perf_counter()
+        counts = verify(urls, index, args.concurrency, rewrite)
+        save_index(index, args.index)
+        print(json.dumps({"urls": len(urls), **counts, "seconds": round(time.perf_counter() - start, 2)}))
+        return 1 if counts["broken"] else 0
+
+    broken = {url: e for url, e in index.items() if e.get("status") != 200}
+    for url, entry in sorted(broken.items()):
+        print(f"{entry.get('status')}\t{url}\t{entry.get('error') or ''}")
+    print(json.dumps({"urls": len(index), "broken": len(broken),
+                      "bytes": sum(e.get("size") or 0 for e in index.values())}))
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Medicine lookup over medsafe_source_links_cleaned.json.
+
+Each key looks like ``source_<brand>,_<dosage form>`` and maps to a
+Medsafe CMI leaflet URL. The index splits keys into brand and form, interns
+the (heavily duplicated) URLs and builds a token -> products map so we can
+spot which medicines a question mentions: an exact token lookup first, then
+a rapidfuzz ``cdist`` pass over the vocabulary to catch misspellings.
+
+Leaflets can also be looked up by file name (``from_filename``), which is
+how the assistant's file citations are mapped back to their CMI links.
+
+It also backs the question box's typeahead: a sorted array of brand names
+(and each later word of a brand) searched with bisect, with the same
+fuzzy pass over word beginnings when the prefix itself is misspelled.
+
+Build it once per process with get_medicine_index().
+"""
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+from urllib.parse import unquote
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "medsafe_source_links_cleaned.json")
+
+Medicine = namedtuple("Medicine", "key brand form url")
+Suggestion = namedtuple("Suggestion", "brand forms")
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-]+")
+# The word (or two) being typed at the end of the question box
+_TYPED_RE = re.compile(r"(?:([a-z0-9][a-z0-9\-]*) )?([a-z0-9][a-z0-9\-]*)$")
+
+# Words that show up in product names but say nothing about which
+# medicine a question is about (forms, routes, release, packs, salts,
+# marketing words, symptoms, English). "What is the usual dose" must not
+# link Lasix High Dose, nor "sore throat" a throat gargle.
+STOPWORDS = frozenset("""
+    the and with without for can take taking what who how when why does should about
+    tablet tablets tab tabs capsule capsules injection injections oral solution liquid
+    syrup cream drops eye ear patch vaccine dental powder spray gel lotion ointment
+    shampoo wash gargle elixir inhaler sachets film coated crushable sprinkle odt
+    liquicaps sleepgels infatabs nasal otic topical rectal sublingual transdermal
+    intravenous intrathecal intraocular spinal depot pen kit pack tubes system
+    modified release extended controlled retard slow continus conc concentrated
+    micro micrograms mmol application combination treatment prevention initiation
+    continuation
+    sodium potassium chloride hydrochloride hcl acid calcium phosphate sulfate
+    sulphate succinate fumarate maleate besilate bromide carbonate nitrate oxide
+    lactate water
+    relief forte plus max extra strength free junior original children child
+    adult infant paediatric day night time cold flu pain rapid fast once daily
+    plain care sugar alcohol dose high low heavy dry sore throat allergy hayfever
+    heartburn reflux sinus chesty soothe sensitive active health medical one duo
+    tri quad tetra hexa lite ever years month blue orange yellow dog bee wasp
+    link paper jacket
+""".split())
+
+# Tokens in more products than this are mostly manufacturer names
+# (viatris, sandoz, arrow...). They're only indexed if they're a whole brand.
+MAX_TOKEN_PRODUCTS = 8
+
+FUZZY_CUTOFF = 88
+FUZZY_MIN_LENGTH = 5
+
+# Typeahead: prefixes this long or longer also get fuzzy suggestions
+SUGGEST_FUZZY_CUTOFF = 80
+SUGGEST_FUZZY_MIN_LENGTH = 4
+SUGGEST_MAX_PREFIX = 12
+
+# Extensions a leaflet may have been uploaded to the assistant's vector store with
+_LEAFLET_EXTENSIONS = frozenset(("pdf", "txt", "md", "json"))
+
+
+def parse_key(key):
+    """Split ``source_<brand>,_<form>`` into readable brand and form strings."""
+    name = key[len("source_"):] if key.startswith("source_") else key
+    brand, _, form = name.partition(",_")
+    brand = re.sub(r"_{3}", " - ", brand)
+    brand = brand.replace("_", " ").strip()
+    form = form.replace("_", " ").strip()
+    return brand, form
+
+
+def leaflet_name(name):
+    """Normalise a leaflet file name or product key for ``from_filename``."""
+    name = unquote(name).strip().lower()
+    stem, dot, ext = name.rpartition(".")
+    return stem if dot and ext in _LEAFLET_EXTENSIONS else name
+
+
+def tokenize(text):
+    """Lower-case word tokens, ignoring bare numbers (strengths, counts)."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if not t.isdigit()]
+
+
+class MedicineIndex:
+    """Products from the Medsafe URL map plus a token index over brand names."""
+
+    def __init__(self, links):
+        self.medicines = []
+        urls = {}
+        for key, url in links.items():
+            url = urls.setdefault(url, sys.intern(url))
+            brand, form = parse_key(key)
+            self.medicines.append(Medicine(key, brand, form, url))
+        self.by_key = {m.key: m for m in self.medicines}
+        self.urls = list(urls)
+        # Leaflet file name (from the URL) or product key -> first product with that leaflet
+        self._by_filename = {}
+        for m in self.medicines:
+            self._by_filename.setdefault(leaflet_name(m.url.rsplit("/", 1)[-1]), m)
+        for m in self.medicines:
+            self._by_filename.setdefault(leaflet_name(m.key), m)
+
+        self._brand_tokens = [frozenset(tokenize(m.brand)) - STOPWORDS for m in self.medicines]
+        postings = {}
+        for i, tokens in enumerate(self._brand_tokens):
+            for token in tokens:
+                if len(token) >= 3:
+                    postings.setdefault(token, []).append(i)
+        whole_brands = {m.brand.lower() for m in self.medicines}
+        self.tokens = {
+            token: tuple(ids) for token, ids in postings.items()
+            if len(ids) <= MAX_TOKEN_PRODUCTS or token in whole_brands
+        }
+        self.vocabulary = sorted(self.tokens)
+
+        # Typeahead: every brand once, with its forms, and a sorted array of
+        # (text from each word of the brand onwards, brand number) for bisect
+        forms = {}
+        for m in self.medicines:
+            forms.setdefault(m.brand.lower(), []).append(m.form)
+        self.brands = sorted(forms)
+        self.brand_forms = [tuple(dict.fromkeys(forms[b])) for b in self.brands]
+        brand_ids = {b: i for i, b in enumerate(self.brands)}
+        pairs = []
+        for brand, i in brand_ids.items():
+            for match in _TOKEN_RE.finditer(brand):
+                pairs.append((brand[match.start():], i))
+        pairs.sort()
+        self._prefix_keys = [key for key, _ in pairs]
+        self._prefix_brands = [i for _, i in pairs]
+        # Each vocabulary word cut to n letters, for fuzzy matching a prefix of length n
+        self._vocab_brands = [
+            sorted({brand_ids[self.medicines[i].brand.lower()] for i in self.tokens[t]},
+                   key=lambda b, t=t: (not self.brands[b].startswith(t), len(self.brands[b])))
+            for t in self.vocabulary
+        ]
+        self._vocab_heads = {
+            n: [t[:n] for t in self.vocabulary] for n in range(SUGGEST_FUZZY_MIN_LENGTH, SUGGEST_MAX_PREFIX + 2)
+        }
+
+        # Warm rapidfuzz/numpy up now so the first question doesn't pay for it
+        self._fuzzy(["warmup"])
+
+    @classmethod
+    def from_file(cls, path=DATA_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def from_filename(self, filename):
+        """The product whose leaflet was uploaded as ``filename``, or None.
+
+        Matches the PDF's name in its Medsafe URL (``IbuprofenRelieve.pdf``)
+        or the product key, ignoring case and the extension.
+        """
+        return self._by_filename.get(leaflet_name(filename)) if filename else None
+
+    def match_tokens(self, question):
+        """Map question tokens to index tokens: exact first, fuzzy for the rest."""
+        words = [w for w in dict.fromkeys(tokenize(question)) if w not in STOPWORDS]
+        found = [w for w in words if w in self.tokens]
+        unknown = [w for w in words if w not in self.tokens and len(w) >= FUZZY_MIN_LENGTH]
+        if unknown:
+            found.extend(self._fuzzy(unknown))
+        return found
+
+    def _fuzzy(self, words):
+        from rapidfuzz import fuzz, process
+
+        scores = process.cdist(words, self.vocabulary, scorer=fuzz.ratio,
+                               score_cutoff=FUZZY_CUTOFF, dtype="uint8")
+        best = scores.argmax(axis=1)
+        return [self.vocabulary[j] for i, j in enumerate(best) if scores[i, j]]
+
+    def suggest(self, text, limit=6):
+        """Brands completing the word being typed at the end of ``text``.
+
+        Brands starting with the prefix come first, then brands with a later
+        word starting with it ("ibu" -> "Dolomed Ibuprofen Liquicaps"), then
+        fuzzy matches for misspelled prefixes. Returns Suggestion tuples.
+        """
+        match = _TYPED_RE.search(text.lower())
+        if not match:
+            return []
+        previous, word = match.groups()
+        found = {}  # brand number -> sort key
+        # "abilify ma" should narrow to Abilify Maintena before trying "ma" alone
+        for phase, prefix in enumerate(([f"{previous} {word}"] if previous else []) + [word]):
+            self._complete(prefix, phase, found, limit)
+            if len(found) >= limit:
+                break
+        if len(found) < limit and len(word) >= SUGGEST_FUZZY_MIN_LENGTH:
+            for position, i in enumerate(self._fuzzy_prefix(word)):
+                found.setdefault(i, (2, 3, position))
+                if len(found) >= limit:
+                    break
+        ranked = sorted(found, key=found.get)
+        return [Suggestion(self.brands[i][:1].upper() + self.brands[i][1:], self.brand_forms[i])
+                for i in ranked[:limit]]
+
+    def _complete(self, prefix, phase, found, limit, scan=200):
+        start = bisect.bisect_left(self._prefix_keys, prefix)
+        candidates = {}
+        for j in range(start, min(start + scan, len(self._prefix_keys))):
+            key = self._prefix_keys[j]
+            if not key.startswith(prefix):
+                break
+            i = self._prefix_brands[j]
+            # 1: the brand itself starts with the prefix, 2: a later word does
+            rank = 1 if self.brands[i] == key else 2
+            candidates[i] = min(rank, candidates.get(i, rank))
+        for i in sorted(candidates, key=lambda i: (candidates[i], len(self.brands[i]))):
+            if i not in found:
+                found[i] = (phase, candidates[i], len(self.brands[i]))
+            if len(found) >= limit:
+                break
+
+    def _fuzzy_prefix(self, word):
+        """Brand numbers whose words start with something close to ``word``."""
+        from rapidfuzz import fuzz, process
+
+        n = min(len(word), SUGGEST_MAX_PREFIX)
+        # Compare with word starts of the same length and one longer (a missed letter)
+        scores = process.cdist([word[:n]], self._vocab_heads[n], scorer=fuzz.ratio, dtype="uint8")[0]
+        scores = scores.clip(min=process.cdist([word[:n]], self._vocab_heads[n + 1],
+                                                scorer=fuzz.ratio, dtype="uint8")[0])
+        best = scores.argsort()[::-1]
+        brands = []
+        for j in best[:10]:
+            if scores[j] < SUGGEST_FUZZY_CUTOFF:
+                break
+            brands.extend(b for b in self._vocab_brands[j] if b not in brands)
+        return brands
+
+    def detect(self, question, per_medicine=3, limit=6):
+        """Medicines the question mentions, one entry per distinct leaflet.
+
+        For each matched token only the products whose brand is best covered
+        by the question's tokens are kept, so "ibuprofen" picks the plain
+        Ibuprofen leaflet over "Dolomed Ibuprofen Liquicaps".
+        """
+        matched = self.match_tokens(question)
+        if not matched:
+            return []
+        asked = set(matched)
+        results = []
+        seen_urls = set()
+        for token in matched:
+            coverage = {
+                i: len(self._brand_tokens[i] & asked) / len(self._brand_tokens[i])
+                for i in self.tokens[token]
+            }
+            best = max(coverage.values())
+            taken = 0
+            for i in sorted(i for i, c in coverage.items() if c == best):
+                medicine = self.medicines[i]
+                if medicine.url in seen_urls:
+                    continue
+                seen_urls.add(medicine.url)
+                results.append(medicine)
+                taken += 1
+                if taken >= per_medicine or len(results) >= limit:
+                    break
+            if len(results) >= limit:
+                break
+        return results
+
+
+def complete_question(text, brand):
+    """``text`` with the word being typed replaced by a suggested brand."""
+    match = _TYPED_RE.search(text.lower())
+    if not match:
+        return text + brand + " "
+    previous, word = match.groups()
+    start = match.start(2)
+    if previous and brand.lower().startswith(f"{previous} {word}"):
+        start = match.start(1)
+    return text[:start] + brand + " "
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_medicine_index():
+    """The process-wide MedicineIndex (loaded on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MedicineIndex.from_file()
+        return _index
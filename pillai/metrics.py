@@ -0,0 +1,198 @@
+"""Per-stage timings for answers, aggregated for dashboards and scraping.
+
+Each Send builds a Trace; every stage of the handler runs inside
+``trace.span(stage)``, which records its duration, how many upstream API
+calls it made and (for caches) whether it hit. A finished trace is:
+
+- logged as one JSON line on the ``pillai.metrics`` logger,
+- folded into process-wide histograms (Prometheus-style cumulative buckets
+  plus a window of recent samples for exact percentiles),
+- exported in Prometheus text format to PILLAI_METRICS_FILE (if set),
+  rewritten at most every PILLAI_METRICS_INTERVAL seconds, e.g. for
+  node_exporter's textfile collector.
+
+A span costs two perf_counter calls and a list append.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRICS_FILE = os.getenv("PILLAI_METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("PILLAI_METRICS_INTERVAL", 10))
+
+
+class Trace:
+    """The stages of one answer."""
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.spans = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @contextmanager
+    def span(self, stage, api_calls=0, outcome=None):
+        """Time a stage. The yielded dict can be updated with
+        ``api_calls`` and ``outcome`` once they are known."""
+        record = {"stage": stage, "api_calls": api_calls, "outcome": outcome}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["outcome"] = "error"
+            raise
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self.spans.append(record)
+
+    def finish(self, outcome="ok"):
+        self.finished = time.perf_counter()
+        self.fields["outcome"] = outcome
+        return self
+
+    @property
+    def seconds(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def as_dict(self):
+        return {
+            **self.fields,
+            "seconds": round(self.seconds, 6),
+            "api_calls": sum(s["api_calls"] for s in self.spans),
+            "spans": [
+                {k: (round(v, 6) if k == "seconds" else v) for k, v in s.items() if v is not None}
+                for s in self.spans
+            ],
+        }
+
+
+class Histogram:
+    def __init__(self, window=1000):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        values = sorted(self.recent)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+class MetricsRegistry:
+    def __init__(self, metrics_file=METRICS_FILE, interval=METRICS_INTERVAL):
+        self._lock = threading.Lock()
+        self.stages = {}  # stage -> Histogram
+        self.requests = Histogram()
+        self.api_calls = Counter()  # stage -> calls
+        self.outcomes = Counter()  # (stage, outcome) -> count
+        self.metrics_file = metrics_file
+        self.interval = interval
+        self._last_export = 0.0
+
+    def record(self, trace):
+        """Fold a finished trace into the aggregates, log it and maybe export."""
+        with self._lock:
+            self.requests.observe(trace.seconds)
+            self.outcomes[("request", trace.fields.get("outcome", "ok"))] += 1
+            for span in trace.spans:
+                stage = span["stage"]
+                self.stages.setdefault(stage, Histogram()).observe(span["seconds"])
+                if span["api_calls"]:
+                    self.api_calls[stage] += span["api_calls"]
+                if span["outcome"]:
+                    self.outcomes[(stage, span["outcome"])] += 1
+        log.info(json.dumps(trace.as_dict(), ensure_ascii=False))
+        if self.metrics_file and time.monotonic() - self._last_export >= self.interval:
+            self._last_export = time.monotonic()
+            self.export(self.metrics_file)
+
+    def summary(self):
+        """Per-stage rows for the admin page."""
+        with self._lock:
+            rows = []
+            for stage, hist in [("request", self.requests)] + sorted(self.stages.items()):
+                rows.append({
+                    "stage": stage,
+                    "count": hist.count,
+                    "p50_ms": _ms(hist.percentile(50)),
+                    "p95_ms": _ms(hist.percentile(95)),
+                    "p99_ms": _ms(hist.percentile(99)),
+                    "mean_ms": _ms(hist.total / hist.count if hist.count else None),
+                    "api_calls": sum(self.api_calls.values()) if stage == "request" else self.api_calls[stage],
+                    "outcomes": ", ".join(
+                        f"{o}={n}" for (s, o), n in sorted(self.outcomes.items()) if s == stage
+                    ),
+                })
+            return rows
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP pillai_stage_seconds Time spent in each stage of answering a question.",
+            "# TYPE pillai_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, hist in [("request", self.requests)] + sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    lines.append(f'pillai_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'pillai_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'pillai_stage_seconds_sum{{stage="{stage}"}} {hist.total:.6f}')
+                lines.append(f'pillai_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+            lines += [
+                "# HELP pillai_api_calls_total Upstream API calls made, by stage.",
+                "# TYPE pillai_api_calls_total counter",
+            ]
+            lines += [f'pillai_api_calls_total{{stage="{s}"}} {n}' for s, n in sorted(self.api_calls.items())]
+            lines += [
+                "# HELP pillai_stage_outcomes_total Stage outcomes (cache hit/miss, errors).",
+                "# TYPE pillai_stage_outcomes_total counter",
+            ]
+            lines += [
+                f'pillai_stage_outcomes_total{{stage="{s}",outcome="{o}"}} {n}'
+                for (s, o), n in sorted(self.outcomes.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Atomically write the Prometheus text to ``path``."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".pillai-metrics-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", path, e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+metrics = MetricsRegistry()
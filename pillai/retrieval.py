@@ -0,0 +1,246 @@
+"""Local BM25 retrieval over CMI leaflet text.
+
+Leaflets are split into passages and indexed once with ``build_index``;
+the result is a directory of .npy arrays plus a small meta.json:
+
+    offsets.npy   int64  postings start per term (n_terms + 1)
+    chunks.npy    int32  passage id for each posting
+    weights.npy   float32 precomputed BM25 impact for each posting
+    chunk_doc.npy int32  leaflet (URL) id per passage
+    text_offsets.npy int64, text.bin  UTF-8 passage text, concatenated
+
+``RetrievalIndex`` memory-maps those files, so opening the index is cheap
+and the OS page cache is shared by every process serving the app. A query
+is a handful of slice-and-add operations over the postings of its terms.
+
+Build from a JSONL corpus of {"url": ..., "text": ...} records, or from a
+corpus directory written by ``python -m pillai.ingest``:
+
+    python -m pillai.retrieval build fixtures/cmi_sample.jsonl .pillai_index
+    python -m pillai.retrieval build .pillai_corpus .pillai_index
+    python -m pillai.retrieval search .pillai_index "ibuprofen with food"
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.getenv("PILLAI_RETRIEVAL_INDEX", ".pillai_index")
+
+K1 = 1.2
+B = 0.75
+PASSAGE_WORDS = 120
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be been but by can do does for from has have how i if in
+    is it its me my of on or so that the this to was what when which who will
+    with you your
+""".split())
+
+
+def terms(text):
+    return [t for t in _WORD_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_passages(text, size=PASSAGE_WORDS):
+    """Group paragraphs into passages of roughly ``size`` words."""
+    passages = []
+    current = []
+    count = 0
+    for para in re.split(r"\n\s*\n", text):
+        words = para.split()
+        if not words:
+            continue
+        # Very long paragraphs are cut into size-word windows
+        while len(words) > size:
+            if current:
+                passages.append(" ".join(current))
+                current, count = [], 0
+            passages.append(" ".join(words[:size]))
+            words = words[size:]
+        if count + len(words) > size and current:
+            passages.append(" ".join(current))
+            current, count = [], 0
+        current.extend(words)
+        count += len(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def build_index(docs, out_dir):
+    """Index ``(url, text)`` pairs into ``out_dir``. Returns the passage count."""
+    urls = []
+    passages = []
+    chunk_doc = []
+    for url, text in docs:
+        doc_id = len(urls)
+        urls.append(url)
+        for passage in split_passages(text):
+            passages.append(passage)
+            chunk_doc.append(doc_id)
+
+    vocab = {}
+    rows = []  # (term id, passage id, tf)
+    lengths = np.zeros(len(passages), dtype=np.float32)
+    for pid, passage in enumerate(passages):
+        counts = {}
+        for term in terms(passage):
+            counts[term] = counts.get(term, 0) + 1
+        lengths[pid] = sum(counts.values())
+        for term, tf in counts.items():
+            rows.append((vocab.setdefault(term, len(vocab)), pid, tf))
+
+    rows.sort()
+    term_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    chunks = np.array([r[1] for r in rows], dtype=np.int32)
+    tf = np.array([r[2] for r in rows], dtype=np.float32)
+
+    n = max(len(passages), 1)
+    df = np.bincount(term_ids, minlength=len(vocab)).astype(np.float32)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    avgdl = float(lengths.mean()) if len(passages) else 1.0
+    norm = K1 * (1 - B + B * lengths[chunks] / avgdl)
+    weights = (idf[term_ids] * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+
+    encoded = [p.encode("utf-8") for p in passages]
+    text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=text_offsets[1:])
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(out_dir, "chunks.npy"), chunks)
+    np.save(os.path.join(out_dir, "weights.npy"), weights)
+    np.save(os.path.join(out_dir, "chunk_doc.npy"), np.array(chunk_doc, dtype=np.int32))
+    np.save(os.path.join(out_dir, "text_offsets.npy"), text_offsets)
+    with open(os.path.join(out_dir, "text.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"urls": urls, "vocab": vocab, "k1": K1, "b": B}, f)
+    return len(passages)
+
+
+class Passage:
+    def __init__(self, url, text, score):
+        self.url = url
+        self.text = text
+        self.score = score
+
+    def __repr__(self):
+        return f"Passage({self.url!r}, score={self.score:.2f})"
+
+
+class RetrievalIndex:
+    """A built index, memory-mapped from ``index_dir``."""
+
+    def __init__(self, index_dir):
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.urls = meta["urls"]
+        self.vocab = meta["vocab"]
+        self.offsets = load("offsets.npy")
+        self.chunks = load("chunks.npy")
+        self.weights = load("weights.npy")
+        self.chunk_doc = load("chunk_doc.npy")
+        self.text_offsets = load("text_offsets.npy")
+        self.text = np.memmap(os.path.join(index_dir, "text.bin"), dtype=np.uint8, mode="r") \
+            if self.text_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self._url_ids = {url: i for i, url in enumerate(self.urls)}
+
+    def __len__(self):
+        return len(self.chunk_doc)
+
+    def passage_text(self, pid):
+        start, end = self.text_offsets[pid], self.text_offsets[pid + 1]
+        return self.text[start:end].tobytes().decode("utf-8")
+
+    def search(self, query, k=4, urls=None):
+        """Top ``k`` passages for ``query``.
+
+        With ``urls`` (e.g. the CMI links of medicines detected in the
+        question) only passages from those leaflets are considered, unless
+        none of them are in the index.
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(terms(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            # A passage appears at most once per term, so fancy-index add is safe
+            scores[self.chunks[lo:hi]] += self.weights[lo:hi]
+
+        if urls:
+            doc_ids = [self._url_ids[u] for u in urls if u in self._url_ids]
+            if doc_ids:
+                scores[~np.isin(self.chunk_doc, doc_ids)] = 0
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Passage(self.urls[self.chunk_doc[pid]], self.passage_text(pid), float(scores[pid]))
+            for pid in top if scores[pid] > 0
+        ]
+
+
+def read_corpus(path):
+    """Yield ``(url, text)`` from a JSONL corpus file or an ingested corpus directory."""
+    if os.path.isdir(path):
+        from pillai.ingest import Corpus
+
+        yield from Corpus(path).docs()
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["url"], record["text"]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index(index_dir=DEFAULT_INDEX_DIR):
+    """The process-wide index, or None if none has been built at ``index_dir``."""
+    global _index
+    with _index_lock:
+        if _index is None and os.path.exists(os.path.join(index_dir, "meta.json")):
+            _index = RetrievalIndex(index_dir)
+        return _index
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == "build":
+        count = build_index(read_corpus(argv[1]), argv[2])
+        print(f"Indexed {count} passages into {argv[2]}")
+    elif len(argv) >= 3 and argv[0] == "search":
+        index = RetrievalIndex(argv[1])
+        start = time.perf_counter()
+        passages = index.search(" ".join(argv[2:]))
+        elapsed = time.perf_counter() - start
+        for passage in passages:
+            print(f"{passage.score:6.2f}  {passage.url}\n        {passage.text[:160]}")
+        print(f"({elapsed * 1000:.2f} ms)")
+    else:
+        print("usage: python -m pillai.retrieval build CORPUS.jsonl|CORPUS_DIR INDEX_DIR | search INDEX_DIR QUERY...")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Choosing the chat model for a question.
+
+Simple questions (at most one known medicine, no interaction or risk
+words, short) go to a fast model; everything else goes to the strong model. Both are
+configurable (PILLAI_FAST_MODEL, PILLAI_STRONG_MODEL).
+
+The router also keeps a window of each model's recent answer times. When
+a model's p95 goes over PILLAI_ROUTER_SLA seconds while the other model
+is within it, a growing share of that model's questions is sent to the
+other one. The share shrinks again once the model is back within the SLA.
+At most MAX_SPILL of the complex questions are ever sent to the fast model,
+and never one with a risk word (pregnancy, overdose, allergy...).
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pillai.answer import CHAT_MODEL
+from pillai.metrics import Histogram
+
+FAST_MODEL = os.getenv("PILLAI_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("PILLAI_STRONG_MODEL", CHAT_MODEL)
+ROUTER_SLA = float(os.getenv("PILLAI_ROUTER_SLA", 10))  # seconds, p95 of a whole answer
+
+SIMPLE_MAX_WORDS = 14
+# Risk words: these questions stay on the strong model even when it is
+# over the SLA
+SAFETY_WORDS = frozenset("""
+    alcohol drink drinking pregnant pregnancy breastfeeding breastfeed baby child children
+    overdose overdosed missed double kidney liver heart allergic allergy reaction
+""".split())
+# Words that make a question about more than looking one medicine up
+COMPLEX_WORDS = SAFETY_WORDS | frozenset("""
+    with together interact interacts interaction interactions mix mixing combine
+    instead switch stop stopping compare versus vs between
+""".split())
+_WORD_RE = re.compile(r"[a-z']+")
+
+MIN_SAMPLES = 10
+SPILL_STEP = 0.1
+# Share of a route's questions that may move; never all of them, so the
+# slow model keeps getting samples and can recover
+MAX_SPILL = {"fast": 0.8, "strong": 0.5}
+
+Route = namedtuple("Route", "model kind spilled")
+
+
+def classify(question, known_medicines):
+    """"simple" or "complex" from cheap local features.
+
+    ``known_medicines`` are the question's tokens that matched the Medsafe
+    list (MedicineIndex.match_tokens).
+    """
+    words = _WORD_RE.findall(question.lower())
+    if len(set(known_medicines)) > 1:
+        return "complex"
+    if len(words) > SIMPLE_MAX_WORDS or COMPLEX_WORDS.intersection(words):
+        return "complex"
+    return "simple"
+
+
+def is_safety_critical(question):
+    """Whether the question has a risk word, so it must never be spilled to the fast model."""
+    return not SAFETY_WORDS.isdisjoint(_WORD_RE.findall(question.lower()))
+
+
+class ModelRouter:
+    def __init__(self, fast=FAST_MODEL, strong=STRONG_MODEL, sla=ROUTER_SLA, window=200,
+                 rng=random.random):
+        self.models = {"fast": fast, "strong": strong}
+        self.sla = sla
+        self.rng = rng
+        self.latency = {"fast": Histogram(window), "strong": Histogram(window)}
+        self.spill = {"fast": 0.0, "strong": 0.0}
+        self.stats = {"simple": 0, "complex": 0, "spilled": 0}
+        self._lock = threading.Lock()
+
+    def route(self, question, known_medicines):
+        kind = classify(question, known_medicines)
+        tier = "fast" if kind == "simple" else "strong"
+        pinned = tier == "strong" and is_safety_critical(question)
+        with self._lock:
+            self.stats[kind] += 1
+            spilled = not pinned and self.rng() < self.spill[tier]
+            if spilled:
+                self.stats["spilled"] += 1
+                tier = _other(tier)
+        return Route(self.models[tier], kind, spilled)
+
+    def record(self, model, seconds):
+        """Feed back how long ``model`` took to answer."""
+        tier = next((t for t, m in self.models.items() if m == model), None)
+        if tier is None:
+            return
+        with self._lock:
+            self.latency[tier].observe(seconds)
+            mine, other = self._p95(tier), self._p95(_other(tier))
+            if mine is None:
+                return
+            if mine > self.sla and (other is None or other <= self.sla):
+                self.spill[tier] = min(MAX_SPILL[tier], self.spill[tier] + SPILL_STEP)
+            elif mine <= self.sla:
+                self.spill[tier] = max(0.0, self.spill[tier] - SPILL_STEP)
+
+    def _p95(self, tier):
+        hist = self.latency[tier]
+        return hist.percentile(95) if len(hist.recent) >= MIN_SAMPLES else None
+
+    @contextmanager
+    def timed(self, model):
+        """Record the time taken by the block if it finishes without error."""
+        start = time.perf_counter()
+        yield
+        self.record(model, time.perf_counter() - start)
+
+    def timed_stream(self, model, deltas):
+        """Pass ``deltas`` through, recording the time until the stream ends."""
+        start = time.perf_counter()
+        yield from deltas
+        self.record(model, time.perf_counter() - start)
+
+    def report(self):
+        with self._lock:
+            return {
+                **self.stats,
+                **{f"{tier}_model": model for tier, model in self.models.items()},
+                **{f"{tier}_p95_s": _round(self._p95(tier)) for tier in self.models},
+                **{f"{tier}_spill": round(share, 2) for tier, share in self.spill.items()},
+                "sla_s": self.sla,
+            }
+
+
+def _other(tier):
+    return "strong" if tier == "fast" else "fast"
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """The process-wide ModelRouter."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
@@ -0,0 +1,101 @@
+"""Waiting on Assistants runs without spinning on the API.
+
+Memory mode creates a run on the session's thread and has to wait for it
+to finish. Instead of calling ``runs.retrieve`` in a tight loop we poll
+with exponential backoff plus jitter, stop at a hard deadline, and cancel
+runs we give up on so the thread is free for the next question.
+"""
+import logging
+import random
+import time
+
+log = logging.getLogger(__name__)
+
+# Statuses a run can settle in. Anything else (queued, in_progress,
+# cancelling) means keep waiting.
+TERMINAL_STATES = {"completed", "failed", "cancelled", "expired", "incomplete", "requires_action"}
+
+
+class RunFailed(RuntimeError):
+    """The run ended in a state we can't turn into an answer."""
+
+    def __init__(self, message, status=None, polls=0):
+        super().__init__(message)
+        self.status = status
+        self.polls = polls
+
+
+class RunTimedOut(RunFailed):
+    """The run was still going when the deadline passed (and was cancelled)."""
+
+
+class RunResult:
+    """A completed run plus how much waiting it took."""
+
+    def __init__(self, run, polls, elapsed):
+        self.run = run
+        self.polls = polls
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"RunResult(status={self.run.status!r}, polls={self.polls}, elapsed={self.elapsed:.2f}s)"
+
+
+def backoff_delays(initial=0.3, factor=1.6, cap=2.0, jitter=0.25, rng=random):
+    """Yield sleep times: exponential growth up to ``cap``, each +/- ``jitter``."""
+    delay = initial
+    while True:
+        spread = delay * jitter
+        yield max(0.0, delay + rng.uniform(-spread, spread))
+        delay = min(cap, delay * factor)
+
+
+def cancel_run(client, thread_id, run_id):
+    """Best-effort cancel; the run may already have finished on its own."""
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except Exception as e:
+        log.warning("Could not cancel run %s: %s", run_id, e)
+
+
+def wait_for_run(client, thread_id, run_id, max_wait=15, delays=None,
+                 sleep=time.sleep, clock=time.monotonic):
+    """Poll a run until it completes, fails or ``max_wait`` seconds pass.
+
+    Returns a RunResult for completed runs. Raises RunTimedOut if the
+    deadline passes and RunFailed for every other terminal state. Runs that
+    time out or stop at ``requires_action`` (our assistant has no tools we
+    can answer) are cancelled so the thread doesn't stay locked.
+    """
+    delays = delays if delays is not None else backoff_delays()
+    start = clock()
+    deadline = start + max_wait
+    polls = 0
+
+    while True:
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        polls += 1
+        status = run.status
+
+        if status == "completed":
+            elapsed = clock() - start
+            log.info("Run %s completed after %d polls in %.2fs", run_id, polls, elapsed)
+            return RunResult(run, polls, elapsed)
+
+        if status in TERMINAL_STATES:
+            if status == "requires_action":
+                cancel_run(client, thread_id, run_id)
+            detail = getattr(getattr(run, "last_error", None), "message", None)
+            message = f"Threaded memory response failed (run {status})."
+            if detail:
+                message += f" {detail}"
+            raise RunFailed(message, status=status, polls=polls)
+
+        remaining = deadline - clock()
+        if remaining <= 0:
+            cancel_run(client, thread_id, run_id)
+            raise RunTimedOut(
+                f"Threaded memory response timed out after {max_wait}s.",
+                status=status, polls=polls,
+            )
+        sleep(min(next(delays), remaining))
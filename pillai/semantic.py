@@ -0,0 +1,217 @@
+"""Near-duplicate question lookup for the answer cache.
+
+Exact keys miss paraphrases ("what's cetirizine used for" vs "What is
+cetirizine for?"). Each cached question is turned into a hashed bag of
+character trigrams and words (signed feature hashing, no model download),
+L2-normalised and kept as a row of a float32 NumPy matrix, so a lookup is
+one matrix-vector product.
+
+Paraphrases of different questions can still score high ("side effects
+of voltaren" vs "side effects of metformin"), so rows are only compared
+with questions that have the same guard terms: the Medsafe medicines the
+question mentions and every other word that isn't on a short list of
+function words, so "take 8 panadol" never gets the "take 2 panadol"
+answer, "can I not take" never gets the "can I take" one and "my cat"
+never gets the "my dog" one. The matrix holds at most
+PILLAI_SEMANTIC_MAX_ENTRIES rows; the least recently used one is replaced
+when it is full.
+
+No question text is kept: a row is the cached answer's key (which holds a
+hash of the question, see pillai.cache.cache_key), its vector and a hash
+of its guard terms. ``add`` returns that row as a string for the shared
+store, and ``restore`` indexes it again in another process.
+"""
+import base64
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from pillai.cache import cache_key, normalize_question
+
+SEMANTIC_THRESHOLD = float(os.getenv("PILLAI_SEMANTIC_THRESHOLD", 0.65))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("PILLAI_SEMANTIC_MAX_ENTRIES", 20_000))
+DIM = 512
+
+_CONTRACTIONS = {
+    "what's": "what is", "it's": "it is", "can't": "cannot", "don't": "do not",
+    "doesn't": "does not", "i'm": "i am", "isn't": "is not", "shouldn't": "should not",
+    "how's": "how is", "whats": "what is",
+}
+_CONTRACTION_RE = re.compile(r"\b(" + "|".join(re.escape(c) for c in _CONTRACTIONS) + r")\b")
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+# Words that say how a question is asked, not what it is about. Every
+# other word, whatever its length, is a guard term and must match exactly:
+# "my cat" must not get the "my dog" answer, nor "with gin" the "with tea"
+# one. Words that change what is asked (how, why, much, often, with, not,
+# before, she...) and every number and unit are deliberately missing.
+FUNCTION_WORDS = frozenset("""
+    a an the i me my we us our you your it its
+    this that these those there here someone something
+    is am are was were be been being do does did doing done have has had having
+    can could may might must shall should will would
+    of to in on at by for from into onto about as than then and or but if so
+    what which who whom whose when where while
+    ok okay fine alright please just also still again ever really
+    take takes taking taken took use uses used using tell know need want like
+    medicine medicines medication medications drug drugs pill pills
+    usual usually normal normally kind type same
+""".split())
+
+
+def _normalize(question):
+    text = _CONTRACTION_RE.sub(lambda m: _CONTRACTIONS[m.group()], normalize_question(question))
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def vectorize(question, dim=DIM):
+    """Unit float32 vector of hashed character trigrams and words."""
+    text = _normalize(question)
+    padded = f" {text} "
+    features = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    features += ["w:" + word for word in text.split()]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def guard_terms(question, medicine_index=None):
+    """Medicines and every other word but function words, which a cached question must share."""
+    terms = set(_normalize(question).split()) - FUNCTION_WORDS
+    if medicine_index is not None:
+        terms.update(medicine_index.match_tokens(question))
+    return frozenset(terms)
+
+
+def terms_digest(terms):
+    """A stand-in for a set of guard terms that only compares equal."""
+    return hashlib.sha256("\n".join(sorted(terms)).encode("utf-8")).hexdigest()[:32]
+
+
+class SemanticIndex:
+    """Question vectors grouped by (language, simplify, guard terms), by cache key."""
+
+    def __init__(self, max_entries=SEMANTIC_MAX_ENTRIES, threshold=SEMANTIC_THRESHOLD, dim=DIM,
+                 terms=guard_terms, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self.terms = terms
+        self.clock = clock
+        # Grown by doubling up to max_entries, so a small cache stays small
+        self._matrix = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self._used = np.zeros(len(self._matrix), dtype=np.float64)
+        self._keys = []  # row -> cache key of the answer
+        self._groups = []  # row -> group key
+        self._rows = {}  # group key -> set of rows
+        self._by_key = {}  # cache key -> row
+        self._free = []  # rows of discarded questions
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def _group(self, question, language, simplify):
+        return (language, bool(simplify), terms_digest(self.terms(question)))
+
+    def add(self, question, language, simplify):
+        """Index a question whose answer has just been cached; returns its stored form."""
+        key = cache_key(question, language, simplify)
+        group = self._group(question, language, simplify)
+        vector = vectorize(question, self.dim)
+        self._put(key, group, vector)
+        language, simplify, digest = group
+        # float16 halves the stored size and is plenty for a cosine threshold
+        encoded = base64.b64encode(vector.astype(np.float16).tobytes()).decode("ascii")
+        return f"{language}|{int(simplify)}|{digest}|{encoded}"
+
+    def restore(self, key, data):
+        """Index the row ``add`` returned for the answer cached under ``key``."""
+        language, simplify, digest, encoded = data.split("|", 3)
+        vector = np.frombuffer(base64.b64decode(encoded), dtype=np.float16).astype(np.float32)
+        if len(vector) != self.dim:
+            return False
+        self._put(key, (language, simplify == "1", digest), vector)
+        return True
+
+    def _put(self, key, group, vector):
+        with self._lock:
+            row = self._by_key.get(key)
+            if row is None:
+                row = self._free_row()
+                self._by_key[key] = row
+            else:
+                self._rows[self._groups[row]].discard(row)
+                if not self._rows[self._groups[row]]:
+                    del self._rows[self._groups[row]]
+            self._matrix[row] = vector
+            self._used[row] = self.clock()
+            self._keys[row] = key
+            self._groups[row] = group
+            self._rows.setdefault(group, set()).add(row)
+
+    def _free_row(self):
+        if self._free:
+            return self._free.pop()
+        count = len(self._keys)
+        if count < self.max_entries:
+            if count == len(self._matrix):
+                size = min(self.max_entries, 2 * len(self._matrix))
+                self._matrix = np.resize(self._matrix, (size, self.dim))
+                self._used = np.resize(self._used, size)
+            self._keys.append(None)
+            self._groups.append(None)
+            return count
+        # Full: reuse the least recently used row
+        row = int(np.argmin(self._used[:count]))
+        old = self._groups[row]
+        self._rows[old].discard(row)
+        if not self._rows[old]:
+            del self._rows[old]
+        self._by_key.pop(self._keys[row], None)
+        self.stats["evictions"] += 1
+        return row
+
+    def lookup(self, question, language, simplify):
+        """The most similar cached question with the same guard terms, or None.
+
+        Returns ``(cache key of its answer, similarity)``.
+        """
+        group = self._group(question, language, simplify)
+        vector = vectorize(question, self.dim)
+        with self._lock:
+            self.stats["lookups"] += 1
+            rows = self._rows.get(group)
+            if not rows:
+                return None
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            scores = self._matrix[rows] @ vector
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                return None
+            row = int(rows[best])
+            self._used[row] = self.clock()
+            self.stats["hits"] += 1
+            return self._keys[row], score
+
+    def discard(self, key):
+        """Forget the question cached under ``key`` (e.g. its answer has expired)."""
+        with self._lock:
+            row = self._by_key.pop(key, None)
+            if row is None:
+                return
+            group = self._groups[row]
+            self._rows[group].discard(row)
+            if not self._rows[group]:
+                del self._rows[group]
+            self._free.append(row)
@@ -0,0 +1,182 @@
+"""Process-wide registry of browser sessions, and reclaiming idle ones.
+
+Every Streamlit session keeps its own ``st.session_state``: the
+Assistants ``thread_id``, the local Conversation, the last question. A
+session that is never closed cleanly keeps all of it, and its OpenAI
+thread lives on remotely. The registry records each session's last
+activity and an estimate of the bytes its state holds. A background
+sweep evicts sessions idle for PILLAI_SESSION_IDLE seconds. It drops the
+app's keys from their state and deletes their OpenAI threads on a small
+pool, so a day of traffic leaves memory flat.
+
+History per session is capped separately. Local conversations keep at
+most PILLAI_SESSION_MAX_TURNS turns verbatim, and older turns are
+folded into the summary. Assistants runs only read that many recent
+turns of the thread.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+SESSION_IDLE_SECONDS = float(os.getenv("PILLAI_SESSION_IDLE", 1800))
+SESSION_MAX_TURNS = int(os.getenv("PILLAI_SESSION_MAX_TURNS", 20))
+SWEEP_INTERVAL = float(os.getenv("PILLAI_SESSION_SWEEP", 60))
+# Assistants runs read the last SESSION_MAX_TURNS turns of the thread, plus the new question
+THREAD_TRUNCATION = {"type": "last_messages", "last_messages": 2 * SESSION_MAX_TURNS + 1}
+
+# What app.py keeps per session; everything else there is widget state
+SESSION_KEYS = ("thread_id", "conversation", "question_submitted", "last_run_polls", "last_ttft")
+
+
+def approx_bytes(value):
+    """Rough size of a session_state value, following the containers app.py stores."""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approx_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_bytes(k) + approx_bytes(v) for k, v in value.items())
+    if hasattr(value, "footprint"):
+        return value.footprint()
+    return sys.getsizeof(value)
+
+
+class Session:
+    def __init__(self, session_id, state, now):
+        self.session_id = session_id
+        self.state = state
+        self.created = now
+        self.last_active = now
+        self.bytes = 0
+        self.runs = 0
+
+
+class SessionRegistry:
+    """Active sessions by id; ``sweep`` evicts the idle ones."""
+
+    def __init__(self, delete_thread=None, idle_timeout=SESSION_IDLE_SECONDS, sweep_interval=SWEEP_INTERVAL,
+                 clock=time.monotonic):
+        # delete_thread(thread_id) removes an Assistants thread; called on the reaper pool
+        self.delete_thread = delete_thread
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = ThreadPoolExecutor(max_workers=2, thread_name_prefix="session-reaper")
+        self._stop = threading.Event()
+        self._thread = None
+        # evicted_bytes: what would still be held without eviction
+        self.stats = {"seen": 0, "evicted": 0, "evicted_bytes": 0, "threads_deleted": 0,
+                      "thread_delete_failures": 0}
+
+    def touch(self, session_id, state):
+        """Record activity at the start of a script run; the size is of the state so far."""
+        now = self.clock()
+        size = sum(approx_bytes(state[key]) for key in SESSION_KEYS if key in state)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, state, now)
+                self.stats["seen"] += 1
+            session.state = state
+            session.last_active = now
+            session.bytes = size
+            session.runs += 1
+
+    def sweep(self):
+        """Evict every session idle for longer than ``idle_timeout``; returns how many."""
+        cutoff = self.clock() - self.idle_timeout
+        with self._lock:
+            idle = [s for s in self._sessions.values() if s.last_active < cutoff]
+            for session in idle:
+                del self._sessions[session.session_id]
+        for session in idle:
+            self._evict(session)
+        return len(idle)
+
+    def _evict(self, session):
+        thread_id = None
+        for key in SESSION_KEYS:
+            try:
+                value = session.state[key]
+                del session.state[key]
+            except (KeyError, AttributeError):
+                continue
+            if key == "thread_id":
+                thread_id = value
+        with self._lock:
+            self.stats["evicted"] += 1
+            self.stats["evicted_bytes"] += session.bytes
+        if thread_id and self.delete_thread is not None:
+            self._reaper.submit(self._delete_thread, thread_id)
+        log.info("Evicted idle session %s (%d bytes)", session.session_id, session.bytes)
+
+    def _delete_thread(self, thread_id):
+        try:
+            self.delete_thread(thread_id)
+            key = "threads_deleted"
+        except Exception as e:
+            log.warning("Could not delete thread %s: %s", thread_id, e)
+            key = "thread_delete_failures"
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="session-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                log.warning("Session sweep failed: %s", e)
+
+    def report(self):
+        with self._lock:
+            sizes = [s.bytes for s in self._sessions.values()]
+            return {
+                "sessions": len(sizes),
+                "bytes": sum(sizes),
+                "largest_bytes": max(sizes, default=0),
+                **self.stats,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry(api_key=None):
+    """The process-wide registry; the first call (with ``api_key``) starts its sweeper.
+
+    The OpenAI client is only created when the first idle thread is deleted,
+    so touching the registry on every script run doesn't import openai.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None and api_key:
+            client = None
+            client_lock = threading.Lock()
+
+            def delete_thread(thread_id):
+                nonlocal client
+                with client_lock:
+                    if client is None:
+                        import openai
+                        client = openai.OpenAI(api_key=api_key, max_retries=0)
+                from pillai.upstream import get_upstream
+                get_upstream("openai").call(client.beta.threads.delete, thread_id)
+
+            _registry = SessionRegistry(delete_thread).start()
+        return _registry
@@ -0,0 +1,120 @@
+"""Coalescing identical questions that are being answered right now.
+
+When a medicine is in the news many sessions ask the same thing within
+seconds. The first session to ask becomes the leader of a Flight and does
+the work; sessions asking the same question (same cache key) while it is
+in progress join as followers. They are shown the leader's streamed text
+as it is rendered and get its final answer, without making any upstream
+calls of their own.
+"""
+import threading
+import time
+
+
+class Flight:
+    """One in-progress answer and the text rendered for it so far."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+        self.snapshot = None
+        self.done = False
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+    def publish(self, text):
+        """Leader: the text currently shown (called on every streamed update)."""
+        with self._cond:
+            self.snapshot = text
+            self.version += 1
+            self._cond.notify_all()
+
+    def finish(self, result):
+        """Leader: the final result, handed to every follower as is."""
+        with self._cond:
+            self.result = result
+            self.done = True
+            self._cond.notify_all()
+
+    def fail(self, error):
+        with self._cond:
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def updates(self, timeout=120):
+        """Follower: yield each new snapshot, then return the final answer.
+
+        Raises the leader's exception if it failed, or TimeoutError.
+        """
+        deadline = time.monotonic() + timeout
+        seen = 0
+        while True:
+            with self._cond:
+                while self.version == seen and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for an identical question to be answered.")
+                    self._cond.wait(remaining)
+                version, snapshot, done = self.version, self.snapshot, self.done
+            if version != seen:
+                seen = version
+                yield snapshot
+            elif done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+    def tee(self, placeholder):
+        """Wrap a Streamlit placeholder so what the leader renders is shared."""
+        return _TeePlaceholder(placeholder, self)
+
+
+class _TeePlaceholder:
+    def __init__(self, placeholder, flight):
+        self._placeholder = placeholder
+        self._flight = flight
+
+    def markdown(self, text, **kwargs):
+        self._flight.publish(text)
+        return self._placeholder.markdown(text, **kwargs)
+
+
+class SingleFlight:
+    """Process-wide table of in-progress flights keyed by cache key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "in_flight": 0}
+
+    def begin(self, key):
+        """Return ``(flight, is_leader)``. Leaders must call ``end`` when done."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.stats["leaders"] += 1
+            self.stats["in_flight"] = len(self._flights)
+            return flight, True
+
+    def end(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            self.stats["in_flight"] = len(self._flights)
+
+
+def follow(placeholder, flight, timeout=120):
+    """Render a leader's updates into ``placeholder``; returns the final answer."""
+    for snapshot in flight.updates(timeout):
+        if snapshot:
+            placeholder.markdown(snapshot)
+    return flight.result
+
+
+in_flight = SingleFlight()
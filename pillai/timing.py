@@ -0,0 +1,63 @@
+"""Cold-start and warm-rerun timings for the Streamlit script.
+
+Streamlit re-executes app.py on every widget interaction, so the cost of a
+rerun is what every click pays. The first run in a process (which builds
+the cached resources) is recorded separately as the cold start, and so
+are runs where Send was clicked: they take seconds to answer, which would
+swamp the per-rerun cost.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class RerunStats:
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self.cold_ms = None
+        self.reruns = 0
+        self._warm = deque(maxlen=window)
+        self._send = deque(maxlen=window)
+
+    def record(self, started, finished=None, send=False):
+        """Record one script run that began at ``started`` (perf_counter).
+
+        ``send`` is set for runs that answered a question.
+        """
+        finished = time.perf_counter() if finished is None else finished
+        elapsed_ms = (finished - started) * 1000
+        with self._lock:
+            self.reruns += 1
+            if send:
+                self._send.append(elapsed_ms)
+                kind = "send"
+            elif self.cold_ms is None:
+                self.cold_ms = elapsed_ms
+                kind = "cold"
+            else:
+                self._warm.append(elapsed_ms)
+                kind = "warm"
+        log.info("Script run (%s) took %.1f ms", kind, elapsed_ms)
+        return elapsed_ms
+
+    def report(self):
+        with self._lock:
+            warm = sorted(self._warm)
+            send = sorted(self._send)
+        def pct(values, p):
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2) if values else None
+        return {
+            "runs": self.reruns,
+            "cold_ms": round(self.cold_ms, 2) if self.cold_ms is not None else None,
+            "warm_p50_ms": pct(warm, 50),
+            "warm_p95_ms": pct(warm, 95),
+            "warm_last_ms": round(self._warm[-1], 2) if warm else None,
+            "send_runs": len(send),
+            "send_p50_ms": pct(send, 50),
+        }
+
+
+rerun_stats = RerunStats()
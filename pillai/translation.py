@@ -0,0 +1,377 @@
+"""Translating answers chunk by chunk.
+
+Answers are split at paragraph and markdown list boundaries, each chunk is
+translated on a small shared thread pool, and the pieces are put back
+together with the original spacing and list markers. Every (chunk,
+language) pair is memoised, so boilerplate paragraphs are translated once
+per process, and in the shared cache store (pillai.cache) so other
+processes and replicas reuse them.
+
+With a pillai.engine Engine, backend calls run on the engine's threads
+under its translator limit and priorities instead of the translator's own
+pool.
+
+The backend is pluggable: GoogleBackend wraps deep_translator and
+FakeBackend is a local stand-in for tests and benchmarks
+(PILLAI_TRANSLATOR=fake).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from pillai.engine import INTERACTIVE
+from pillai.upstream import get_upstream
+
+log = logging.getLogger(__name__)
+
+# deep_translator's Google backend rejects text over 5000 characters
+MAX_CHUNK_CHARS = 4500
+
+# Leading list marker / heading / quote plus indentation, kept untranslated
+_MARKER_RE = re.compile(r"^(\s*(?:[-*+–•]|\d+[.)]|#{1,6}|>)\s+)")
+_BLANK_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+")
+TRANSLATION_TTL = int(os.getenv("PILLAI_TRANSLATION_TTL", 30 * 24 * 3600))  # seconds, in the shared store
+
+
+def split_chunks(text):
+    """Split text into ``(prefix, body, separator)`` pieces.
+
+    ``prefix`` is a list marker or heading marker (kept as is), ``body`` is
+    what gets translated and ``separator`` is the exact whitespace that
+    followed, so ``"".join(p + b + s for p, b, s in pieces)`` gives the
+    text back (paragraphs over MAX_CHUNK_CHARS are split at sentences and
+    rejoined with single spaces).
+    """
+    pieces = []
+    for block, sep in _iter_blocks(text):
+        lines = block.split("\n")
+        # A block that is a list: each item becomes its own chunk
+        if len(lines) > 1 and all(_MARKER_RE.match(line) for line in lines[1:]):
+            for i, line in enumerate(lines):
+                pieces.extend(_split_line(line, "\n" if i < len(lines) - 1 else sep))
+        else:
+            pieces.extend(_split_line(block, sep))
+    return pieces
+
+
+def _iter_blocks(text):
+    start = 0
+    for m in _BLANK_RE.finditer(text):
+        yield text[start:m.start()], m.group()
+        start = m.end()
+    yield text[start:], ""
+
+
+def _split_line(block, sep):
+    m = _MARKER_RE.match(block)
+    prefix = m.group(1) if m else ""
+    body = block[len(prefix):]
+    if len(body) <= MAX_CHUNK_CHARS:
+        return [(prefix, body, sep)]
+    # Too long for one request: fall back to sentence boundaries
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(body):
+        if current and len(current) + len(sentence) + 1 > MAX_CHUNK_CHARS:
+            pieces.append([current, " "])
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    pieces.append([current, sep])
+    return [(prefix if i == 0 else "", b, s) for i, (b, s) in enumerate(pieces)]
+
+
+class GoogleBackend:
+    """deep_translator's GoogleTranslator, one instance per thread and target language.
+
+    A GoogleTranslator keeps the text being translated in its request
+    parameters, so an instance shared between threads (parallel chunks,
+    hedged calls) can send one chunk's request with another chunk's text.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _translator(self, target):
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get(target)
+        if translator is None:
+            from deep_translator import GoogleTranslator
+            translator = translators[target] = GoogleTranslator(source="auto", target=target)
+        return translator
+
+    def translate(self, text, target):
+        return self._translator(target).translate(text)
+
+
+class FakeBackend:
+    """Offline stand-in: tags text with the target language after a delay."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text, target):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            threading.Event().wait(self.delay)
+        return f"[{target}] {text}"
+
+
+class Translator:
+    """Chunked, memoised, parallel translation over a backend."""
+
+    def __init__(self, backend, max_workers=4, memo_size=4096, upstream=None, store=None, engine=None):
+        self.backend = backend
+        # Optional pillai.upstream.Upstream: deadline, retries, hedging, breaker
+        self.upstream = upstream
+        # Optional shared store (pillai.cache), consulted after the memo
+        self.store = store
+        # Optional pillai.engine.Engine that runs the chunk translations
+        self.engine = engine
+        self.memo_size = memo_size
+        self._memo = OrderedDict()  # (chunk, target) -> translation
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+        self.stats = {"chunks": 0, "memo_hits": 0, "store_hits": 0, "backend_calls": 0}
+
+    def translate(self, text, target, priority=INTERACTIVE):
+        """Translate ``text`` into ``target`` keeping its markdown layout."""
+        return self.translate_counted(text, target, priority)[0]
+
+    def translate_counted(self, text, target, priority=INTERACTIVE, shared=True):
+        """Like translate, also returning how many backend calls it made.
+
+        ``priority`` only matters with an engine (see pillai.engine).
+        ``shared=False`` keeps the text and its translation out of the shared
+        store (for questions, which are not stored).
+        """
+        pieces = split_chunks(text)
+        chunks = {body.strip() for _, body, _ in pieces if body.strip()}
+        done = {}
+        with self._lock:
+            self.stats["chunks"] += len(chunks)
+            for chunk in chunks:
+                hit = self._memo.get((chunk, target))
+                if hit is not None:
+                    self._memo.move_to_end((chunk, target))
+                    done[chunk] = hit
+            self.stats["memo_hits"] += len(done)
+        todo = [chunk for chunk in chunks if chunk not in done]
+        if todo and shared and self.store is not None:
+            done.update(self._load(todo, target))
+            todo = [chunk for chunk in todo if chunk not in done]
+        if len(todo) == 1 and self.engine is None:
+            done[todo[0]] = self._translate_chunk(todo[0], target)
+        elif todo:
+            jobs = [self._submit(self._translate_chunk, chunk, target, priority=priority) for chunk in todo]
+            done.update(zip(todo, (job.result() for job in jobs)))
+        if todo and shared:
+            self._save({chunk: done[chunk] for chunk in todo}, target)
+        translated = "".join(prefix + _rewrap(body, done) + sep for prefix, body, sep in pieces)
+        return translated, len(todo)
+
+    def submit(self, chunk, target, priority=INTERACTIVE):
+        """Translate one chunk on the shared pool.
+
+        Returns a Future for ``(translation, called_backend)``.
+        """
+        return self._submit(self._translate_one, chunk, target, priority=priority)
+
+    def _submit(self, fn, *args, priority=INTERACTIVE):
+        if self.engine is not None:
+            return self.engine.run_sync(fn, *args, upstream="translator", priority=priority)
+        return self._pool.submit(fn, *args)
+
+    def translate_chunk(self, chunk, target):
+        """Translate one already-split chunk, using the memo."""
+        return self._translate_one(chunk, target)[0]
+
+    def _translate_one(self, chunk, target):
+        stripped = chunk.strip()
+        if not stripped:
+            return chunk, False
+        with self._lock:
+            self.stats["chunks"] += 1
+            hit = self._memo.get((stripped, target))
+            if hit is not None:
+                self._memo.move_to_end((stripped, target))
+                self.stats["memo_hits"] += 1
+        if hit is None and self.store is not None:
+            hit = self._load([stripped], target).get(stripped)
+        called = hit is None
+        if called:
+            hit = self._translate_chunk(stripped, target)
+            self._save({stripped: hit}, target)
+        return _rewrap(chunk, {stripped: hit}), called
+
+    def _translate_chunk(self, chunk, target):
+        if self.upstream is not None:
+            result = self.upstream.call(self.backend.translate, chunk, target)
+        else:
+            result = self.backend.translate(chunk, target)
+        result = result or chunk
+        with self._lock:
+            self.stats["backend_calls"] += 1
+            self._memo[(chunk, target)] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+    def _load(self, chunks, target):
+        """Translations of ``chunks`` found in the shared store (and memoised)."""
+        if self.store is None:
+            return {}
+        keys = {_store_key(chunk, target): chunk for chunk in chunks}
+        try:
+            found = self.store.get_many(keys, TRANSLATION_TTL, time.time())
+        except Exception as e:
+            log.warning("Translation store unavailable: %s", e)
+            return {}
+        loaded = {keys[key]: value for key, value in found.items()}
+        with self._lock:
+            self.stats["store_hits"] += len(loaded)
+            for chunk, value in loaded.items():
+                self._memo[(chunk, target)] = value
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return loaded
+
+    def _save(self, translations, target):
+        if self.store is None:
+            return
+        try:
+            self.store.set_many([(_store_key(chunk, target), text) for chunk, text in translations.items()],
+                                time.time())
+        except Exception as e:
+            log.warning("Could not store translations: %s", e)
+
+
+def _store_key(chunk, target):
+    return f"{target}|{hashlib.sha1(chunk.encode('utf-8')).hexdigest()}"
+
+
+def _rewrap(body, translations):
+    """Swap the stripped body for its translation, keeping the whitespace around it."""
+    stripped = body.strip()
+    if not stripped:
+        return body
+    lead = body[:len(body) - len(body.lstrip())]
+    trail = body[len(body.rstrip()):]
+    return lead + translations[stripped] + trail
+
+
+class TranslationPipeline:
+    """Translate text while it is still being generated.
+
+    Text is fed in as it streams from the model. Each time a paragraph,
+    list item or (in long lines) a sentence closes, it is split like
+    ``split_chunks`` and its pieces are sent to the translator pool.
+    ``ready_text`` returns the in-order prefix whose translations are done,
+    so the UI can show translated text while generation continues.
+    """
+
+    # Lines longer than this are cut at their last sentence end
+    MAX_OPEN_CHARS = 240
+
+    def __init__(self, translator, target):
+        self.translator = translator
+        self.target = target
+        self._buffer = ""
+        self._pieces = []  # (prefix, body, future or None, separator)
+        self._ready = 0
+        self._ready_text = []
+        self.backend_calls = 0
+        self.failed = False
+        self.error = None
+
+    def feed(self, text):
+        self._buffer += text
+        cut = self._buffer.rfind("\n") + 1
+        if not cut and len(self._buffer) > self.MAX_OPEN_CHARS:
+            ends = list(_SENTENCE_RE.finditer(self._buffer))
+            cut = ends[-1].end() if ends else 0
+        if cut:
+            closed, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            self._submit(closed)
+
+    def close(self):
+        """Flush the last open segment once the stream has ended."""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = ""
+
+    def _submit(self, text):
+        for prefix, body, sep in split_chunks(text):
+            job = self.translator.submit(body, self.target) if body.strip() else None
+            self._pieces.append((prefix, body, job, sep))
+
+    def ready_text(self):
+        """Translated text for every segment finished so far, in order.
+
+        A segment whose translation failed is kept in the original language
+        and ``failed`` is set.
+        """
+        while self._ready < len(self._pieces):
+            prefix, body, job, sep = self._pieces[self._ready]
+            text = body
+            if job is not None:
+                if not job.done():
+                    break
+                try:
+                    text, called = job.result()
+                    self.backend_calls += called
+                except Exception as e:
+                    self.failed = True
+                    self.error = e
+            self._ready_text.append(prefix + text + sep)
+            self._ready += 1
+        return "".join(self._ready_text)
+
+    def pending(self):
+        return len(self._pieces) - self._ready
+
+    def result(self):
+        """Wait for every segment and return the full translation."""
+        self.close()
+        for _, _, job, _ in self._pieces[self._ready:]:
+            if job is not None:
+                wait([job])
+        return self.ready_text()
+
+
+def make_backend(name=None):
+    """Backend from a name: "google" (default) or "fake[:delay seconds]"."""
+    name = name or os.getenv("PILLAI_TRANSLATOR", "google")
+    if name.startswith("fake"):
+        _, _, delay = name.partition(":")
+        return FakeBackend(delay=float(delay or 0))
+    return GoogleBackend()
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """The process-wide Translator (created on first use)."""
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            from pillai.cache import open_store
+            from pillai.engine import get_engine
+
+            _translator = Translator(make_backend(), upstream=get_upstream("translator"),
+                                     store=open_store("translations", retention=TRANSLATION_TTL),
+                                     engine=get_engine())
+        return _translator
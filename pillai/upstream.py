@@ -0,0 +1,403 @@
+"""Resilient calls to OpenAI and the translator.
+
+``Upstream.call`` wraps a single request with:
+
+- a per-call deadline (the attempt runs on a worker thread and we stop
+  waiting when time is up),
+- retries with jittered exponential backoff for 429, 5xx and connection
+  errors, honouring ``Retry-After`` / ``retry-after-ms``,
+- optional hedging: for idempotent calls, if the first attempt is slower
+  than the observed p95 a second identical request is sent and whichever
+  finishes first wins,
+- a circuit breaker that fails fast with CircuitOpen after repeated
+  failures, so callers can fall back (cached or English-only answers)
+  instead of waiting on a service that is down. Only errors that say the
+  service is unhealthy (429, 5xx, connection errors, timeouts) count;
+  a rejected request (400 for an oversized prompt, 401, 404) doesn't.
+
+Non-idempotent calls (creating thread messages or runs) are only retried
+on 429, which means the request was rejected before it was processed.
+
+``Upstream.acall`` and ``Upstream.aguard`` do the same for coroutines on an
+event loop (see pillai.engine), sharing the breaker, latency samples and
+stats with the threaded calls.
+"""
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+
+log = logging.getLogger(__name__)
+
+# Exception class names (from openai, httpx, requests, deep_translator)
+# that mean the request never got a usable answer and can be retried.
+TRANSIENT_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "ConnectionError", "ConnectTimeout",
+    "ReadTimeout", "Timeout", "TimeoutError", "TooManyRequests", "RemoteDisconnected",
+}
+
+
+class UpstreamError(RuntimeError):
+    pass
+
+
+class CircuitOpen(UpstreamError):
+    """The upstream has been failing; calls are refused until it cools down."""
+
+
+class DeadlineExceeded(UpstreamError, TimeoutError):
+    pass
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(error, idempotent=True):
+    code = status_code(error)
+    if code == 429 or type(error).__name__ == "TooManyRequests":
+        return True
+    if not idempotent:
+        return False
+    if code is not None:
+        return code >= 500
+    return type(error).__name__ in TRANSIENT_ERRORS or isinstance(error, DeadlineExceeded)
+
+
+def is_unhealthy(error):
+    """Whether ``error`` counts toward the circuit breaker."""
+    return (is_retryable(error) or isinstance(error, TimeoutError)
+            or type(error).__name__ == "RunTimedOut")
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if it said."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None  # malformed; the normal backoff applies
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures, for ``cooldown`` seconds.
+
+    After the cooldown one trial call is let through (half-open): success
+    closes the circuit, failure opens it again. A trial that is cancelled
+    or interrupted before either is given back with ``abandon``.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go ahead; "trial" for the half-open trial call."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return "trial"
+            return False
+
+    def abandon(self):
+        """The trial call ended with neither a success nor a failure."""
+        with self._lock:
+            self._trial = False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+class Upstream:
+    def __init__(self, name, deadline=60.0, retries=3, backoff=0.5, max_backoff=8.0,
+                 hedge=False, hedge_min_samples=20, breaker=None, max_workers=32):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"upstream-{name}")
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                      "failures": 0, "rejected": 0}
+
+    def p95(self):
+        with self._lock:
+            values = sorted(self._latencies)
+        if len(values) < self.hedge_min_samples:
+            return None
+        return values[int(0.95 * (len(values) - 1))]
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def call(self, fn, *args, idempotent=True, deadline=None, hedge=None, **kwargs):
+        """Call ``fn(*args, **kwargs)`` with deadline, retries, hedging and breaker."""
+        trial = self._admit()
+        hedge = self.hedge if hedge is None else hedge
+        end = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    result = self._attempt(fn, args, kwargs, end, hedge and idempotent)
+                except Exception as e:
+                    time.sleep(self._retry_delay(e, attempt, idempotent, end, trial))
+                    continue
+                self.breaker.success()
+                return result
+        except BaseException as e:
+            self._interrupted(e, trial)
+            raise
+
+    async def acall(self, fn, *args, idempotent=True, deadline=None, hedge=None, **kwargs):
+        """Like ``call`` for an async ``fn``, awaited on the running event loop."""
+        trial = self._admit()
+        hedge = self.hedge if hedge is None else hedge
+        end = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    result = await self._aattempt(fn, args, kwargs, end, hedge and idempotent)
+                except Exception as e:
+                    await asyncio.sleep(self._retry_delay(e, attempt, idempotent, end, trial))
+                    continue
+                self.breaker.success()
+                return result
+        except BaseException as e:
+            self._interrupted(e, trial)
+            raise
+
+    def _admit(self):
+        """Count the call in, or raise CircuitOpen; True if it is the breaker's trial."""
+        allowed = self.breaker.allow()
+        if not allowed:
+            self._count("rejected")
+            raise CircuitOpen(f"{self.name} is unavailable (circuit open).")
+        self._count("calls")
+        return allowed == "trial"
+
+    def _interrupted(self, error, trial):
+        # Cancelled, a Streamlit rerun, a closed generator: no verdict on the
+        # upstream, but a trial call must not keep the breaker half-open for good
+        if trial and not isinstance(error, Exception):
+            self.breaker.abandon()
+
+    def _failed(self, error, trial):
+        self._count("failures")
+        if is_unhealthy(error):
+            self.breaker.failure()
+        elif trial:
+            # The request was refused, which says nothing about the upstream
+            self.breaker.abandon()
+
+    def _retry_delay(self, error, attempt, idempotent, end, trial=False):
+        """Seconds to wait before retrying after ``error``; re-raises it if it's final."""
+        remaining = end - time.monotonic()
+        if attempt > self.retries or not is_retryable(error, idempotent) or remaining <= 0:
+            self._failed(error, trial)
+            raise error
+        delay = retry_after(error)
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            delay *= random.uniform(0.5, 1.0)
+        if delay >= remaining:
+            self._failed(error, trial)
+            raise error
+        log.info("%s attempt %d failed (%s); retrying in %.2fs", self.name, attempt, error, delay)
+        self._count("retries")
+        return delay
+
+    def _attempt(self, fn, args, kwargs, end, hedge):
+        started = time.monotonic()
+        self._count("attempts")
+        futures = [self._pool.submit(fn, *args, **kwargs)]
+        try:
+            hedge_delay = self.p95() if hedge else None
+            if hedge_delay is not None:
+                done, _ = wait(futures, timeout=min(hedge_delay, max(0.0, end - time.monotonic())))
+                if not done and time.monotonic() < end:
+                    self._count("hedges")
+                    self._count("attempts")
+                    futures.append(self._pool.submit(fn, *args, **kwargs))
+            error = None
+            pending = set(futures)
+            while pending:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is not futures[0]:
+                            self._count("hedge_wins")
+                        with self._lock:
+                            self._latencies.append(time.monotonic() - started)
+                        return future.result()
+                    error = future.exception()
+            if error is not None and not pending:
+                raise error
+            raise DeadlineExceeded(f"{self.name} did not answer within the deadline.")
+        finally:
+            # Attempts still queued for a worker are never sent; a running
+            # one can't be stopped and its result is dropped
+            for future in futures:
+                future.cancel()
+
+    async def _aattempt(self, fn, args, kwargs, end, hedge):
+        started = time.monotonic()
+        self._count("attempts")
+        tasks = [asyncio.ensure_future(fn(*args, **kwargs))]
+        try:
+            hedge_delay = self.p95() if hedge else None
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=min(hedge_delay, max(0.0, end - time.monotonic())))
+                if not done and time.monotonic() < end:
+                    self._count("hedges")
+                    self._count("attempts")
+                    tasks.append(asyncio.ensure_future(fn(*args, **kwargs)))
+            error = None
+            pending = set(tasks)
+            while pending:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._count("hedge_wins")
+                        with self._lock:
+                            self._latencies.append(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not pending:
+                raise error
+            raise DeadlineExceeded(f"{self.name} did not answer within the deadline.")
+        finally:
+            # The losing hedge, or everything once the deadline has passed
+            for task in tasks:
+                task.cancel()
+
+    @contextmanager
+    def guard(self):
+        """Breaker bookkeeping for calls that can't be retried (e.g. streams)."""
+        trial = self._admit()
+        try:
+            yield
+        except Exception as e:
+            self._failed(e, trial)
+            raise
+        except BaseException as e:
+            self._interrupted(e, trial)
+            raise
+        self.breaker.success()
+
+    @asynccontextmanager
+    async def aguard(self, admitted=False):
+        """``guard`` for an async with block.
+
+        ``admitted=True`` when ``acall`` already let the request in (it opened
+        a stream), so only how the rest of it goes is recorded.
+        """
+        trial = False if admitted else self._admit()
+        try:
+            yield
+        except Exception as e:
+            self._failed(e, trial)
+            raise
+        except BaseException as e:
+            self._interrupted(e, trial)
+            raise
+        self.breaker.success()
+
+
+def _env(name, default):
+    return type(default)(os.getenv(name, default))
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name):
+    """Process-wide Upstream for "openai" or "translator"."""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            prefix = f"PILLAI_{name.upper()}_"
+            if name == "translator":
+                upstream = Upstream(name, deadline=_env(prefix + "DEADLINE", 10.0),
+                                    retries=_env(prefix + "RETRIES", 2), backoff=0.25,
+                                    hedge=_env(prefix + "HEDGE", 1) == 1,
+                                    breaker=CircuitBreaker(threshold=5, cooldown=30.0))
+            else:
+                upstream = Upstream(name, deadline=_env(prefix + "DEADLINE", 60.0),
+                                    retries=_env(prefix + "RETRIES", 3),
+                                    hedge=_env(prefix + "HEDGE", 0) == 1,
+                                    breaker=CircuitBreaker(threshold=5, cooldown=30.0))
+            _upstreams[name] = upstream
+        return upstream
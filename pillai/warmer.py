@@ -0,0 +1,153 @@
+"""Background warm-up of the answer cache for the most common questions.
+
+The questions from the FAQ and the question box placeholders (or a file
+named by PILLAI_WARM_QUESTIONS, one question per line) are answered in
+every language, with and without simplification, on a daemon thread, so
+the first page render never waits for them. Answers already fresh in the
+cache are skipped, so restarts are cheap. OpenAI requests are limited to
+PILLAI_WARM_CONCURRENCY at a time and PILLAI_WARM_RATE starts per second,
+and, with the engine on (pillai.engine), queue behind every user's question.
+With PILLAI_WARM_INTERVAL set, the pass repeats every that many seconds
+to replace answers that have expired; PILLAI_WARM=0 turns it off.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pillai.labels import labels
+
+log = logging.getLogger(__name__)
+
+WARM_ENABLED = os.getenv("PILLAI_WARM", "1") != "0"
+WARM_QUESTIONS_FILE = os.getenv("PILLAI_WARM_QUESTIONS")
+WARM_CONCURRENCY = int(os.getenv("PILLAI_WARM_CONCURRENCY", 2))
+WARM_RATE = float(os.getenv("PILLAI_WARM_RATE", 0.5))
+WARM_INTERVAL = float(os.getenv("PILLAI_WARM_INTERVAL", 0))  # seconds; 0 = once at startup
+
+# Asked in every language
+TOP_QUESTIONS = [
+    "What is cetirizine for?",
+    "Can I take ibuprofen with food?",
+    "Can I take ibuprofen with Panadol?",
+    "What is paracetamol used for?",
+    "What are the side effects of ibuprofen?",
+]
+
+_PLACEHOLDER_RE = re.compile(r"^\W*(?:[^:：]+[:：])?\s*")
+
+
+def placeholder_questions():
+    """(question, language) for each placeholder that is an example question."""
+    pairs = []
+    for language, L in labels.items():
+        text = _PLACEHOLDER_RE.sub("", L["placeholder"], count=1)
+        if text.endswith(("?", "？")):
+            pairs.append((text, language))
+    return pairs
+
+
+def warm_questions():
+    """Every (question, language, simplify) to keep warm."""
+    if WARM_QUESTIONS_FILE:
+        with open(WARM_QUESTIONS_FILE, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        pairs = [(q, language) for q in questions for language in labels]
+    else:
+        pairs = [(q, language) for q in TOP_QUESTIONS for language in labels]
+        pairs += placeholder_questions()
+    return [(q, language, simplify) for q, language in pairs for simplify in (False, True)]
+
+
+class CacheWarmer:
+    """Answers ``questions`` into the cache with an answerer from ``make_answerer``."""
+
+    def __init__(self, make_answerer, questions, concurrency=WARM_CONCURRENCY, rate=WARM_RATE,
+                 interval=WARM_INTERVAL):
+        self.make_answerer = make_answerer
+        self.questions = questions
+        self.concurrency = concurrency
+        self.rate = rate
+        self.interval = interval
+        self.stats = {"passes": 0, "warmed": 0, "fresh": 0, "failed": 0, "last_pass_s": None}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        try:
+            # Built here, not in start(), so the page never waits for it
+            answerer = self.make_answerer()
+        except Exception as e:
+            log.warning("Cache warmer could not start: %s", e)
+            return
+        while not self._stop.is_set():
+            self.run_once(answerer)
+            if not self.interval or self._stop.wait(self.interval):
+                break
+
+    def run_once(self, answerer):
+        from pillai.batch import RateLimiter
+
+        limiter = RateLimiter(self.rate, burst=self.concurrency) if self.rate else None
+        started = time.monotonic()
+
+        def warm(item):
+            question, language, simplify = item
+            if self._stop.is_set():
+                return
+            try:
+                _, _, cached = answerer.answer(question, language, simplify, limiter)
+                self._count("fresh" if cached else "warmed")
+            except Exception as e:
+                log.warning("Could not warm %r (%s): %s", question, language, e)
+                self._count("failed")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cache-warmer") as pool:
+            list(pool.map(warm, self.questions))
+        self.stats["passes"] += 1
+        self.stats["last_pass_s"] = round(time.monotonic() - started, 1)
+        log.info("Cache warm-up pass done: %s", self.stats)
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer(api_key):
+    """Start the process-wide warmer once; returns it, or None if disabled."""
+    global _warmer
+    if not WARM_ENABLED:
+        return None
+
+    def make_answerer():
+        import openai
+
+        from pillai.batch import BatchAnswerer
+        from pillai.engine import WARM, get_engine
+        return BatchAnswerer(openai.OpenAI(api_key=api_key, max_retries=0), engine=get_engine(api_key),
+                             priority=WARM)
+
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer(make_answerer, warm_questions()).start()
+        return _warmer
+
+
+def get_cache_warmer():
+    """The running warmer, if one was started."""
+    return _warmer
@@ -0,0 +1,70 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from pillai.answer import stream_thread_run
+from pillai.runs import RunTimedOut
+
+
+class StalledRun:
+    """An Assistants stream that sends one delta and then nothing at all.
+
+    With ``ends_on_cancel`` the server ends the stream once the run is
+    cancelled; otherwise only the request's read timeout stops it.
+    """
+
+    def __init__(self, ends_on_cancel, stall=3.0):
+        self.ends_on_cancel = ends_on_cancel
+        self.stall = stall
+        self.cancelled = threading.Event()
+        self.timeout = None
+        self.current_run = SimpleNamespace(id="run_1", status="in_progress")
+
+    # client.beta.threads.runs
+    def stream(self, thread_id, assistant_id, timeout=None, **options):
+        self.timeout = timeout
+        return self
+
+    def cancel(self, thread_id, run_id):
+        self.cancelled.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        text = SimpleNamespace(value="Take it", annotations=None)
+        yield SimpleNamespace(event="thread.message.delta",
+                              data=SimpleNamespace(delta=SimpleNamespace(content=[SimpleNamespace(text=text)])))
+        if self.ends_on_cancel:
+            self.cancelled.wait(self.stall)
+            self.current_run.status = "cancelled"
+            return
+        time.sleep(min(self.stall, self.timeout or self.stall))
+        raise TimeoutError("The read operation timed out")
+
+    def get_final_run(self):
+        return self.current_run
+
+
+def client(runs):
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+
+
+@pytest.mark.parametrize("ends_on_cancel", [True, False])
+def test_stalled_stream_times_out_on_time(ends_on_cancel):
+    runs = StalledRun(ends_on_cancel)
+    deltas = []
+    started = time.monotonic()
+
+    with pytest.raises(RunTimedOut):
+        for delta in stream_thread_run(client(runs), "thread_1", "asst_1", max_wait=0.5):
+            deltas.append(delta)
+
+    assert time.monotonic() - started < 1.5
+    assert deltas == ["Take it"]
+    assert runs.cancelled.is_set()
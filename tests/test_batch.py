@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pillai import translation
+from pillai.batch import BatchAnswerer
+from pillai.translation import FakeBackend, Translator
+
+
+class FailingBackend:
+    def translate(self, text, target):
+        raise RuntimeError("translator down")
+
+
+def fake_client(answer):
+    def create(model, messages, **kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def answerer(monkeypatch, backend):
+    monkeypatch.setattr(translation, "_translator", Translator(backend))
+    return BatchAnswerer(fake_client("Take it with food.【4:0†source】"), use_cache=False)
+
+
+def test_answers_through_the_app_pipeline(monkeypatch):
+    answer, medicines, cached = answerer(monkeypatch, FakeBackend()).answer(
+        "Can I take ibuprofen with food?", "Samoan")
+
+    assert answer.startswith("[sm] Take it with food.")
+    assert "IbuprofenRelieve.pdf" in answer and medicines
+    assert not cached
+
+
+def test_failed_translation_is_an_error(monkeypatch):
+    with pytest.raises(RuntimeError):
+        answerer(monkeypatch, FailingBackend()).answer("Can I take ibuprofen with food?", "Samoan")
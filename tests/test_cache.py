@@ -0,0 +1,42 @@
+import sqlite3
+
+from pillai.cache import AnswerCache, SQLiteStore, cache_key, unpack
+from pillai.semantic import SemanticIndex
+
+
+def test_store_holds_no_question_text(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = AnswerCache(SQLiteStore(path), semantic=SemanticIndex())
+    cache.set("Can I take panadol with nurofen?", "English", False, "Yes, they can be taken together.")
+
+    rows = sqlite3.connect(path).execute("SELECT key FROM answers").fetchall()
+    assert rows == [(cache_key("Can I take panadol with nurofen?", "English", False),)]
+    assert "panadol" not in rows[0][0]
+    assert "panadol" not in repr(vars(cache.semantic))
+    assert cache.find("can i take panadol with nurofen", "English", False) == \
+        ("Yes, they can be taken together.", "memory")
+    assert cache.find("Is it ok to take panadol with nurofen?", "English", False)[1] == "semantic"
+
+
+def test_plaintext_keys_are_forgotten(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"))
+    store.set("English|0|can i take panadol with nurofen", "Yes.", 0)
+    cache = AnswerCache(store)
+    cache.set("What is panadol for?", "English", False, "Pain and fever.")
+
+    assert cache.forget_plaintext() == 1
+    assert store.keys(0) == [cache_key("What is panadol for?", "English", False)]
+
+
+def test_semantic_index_rebuilt_from_stored_vectors(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = AnswerCache(SQLiteStore(path), semantic=SemanticIndex(), vectors=SQLiteStore(path, "semantic"))
+    first.set("Can I take ibuprofen when pregnant?", "English", False, "Ask your doctor first.")
+
+    # Another process on the same file
+    second = AnswerCache(SQLiteStore(path), semantic=SemanticIndex(), vectors=SQLiteStore(path, "semantic"))
+    assert second.index_stored() == 1
+    assert second.find("Can I take ibuprofen while pregnant?", "English", False) == \
+        ("Ask your doctor first.", "semantic")
+    stored = sqlite3.connect(path).execute("SELECT value FROM semantic").fetchone()[0]
+    assert "ibuprofen" not in unpack(stored)
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from pillai.citations import Citations, FileNames
+from pillai.medicines import get_medicine_index
+
+
+class Names:
+    def __init__(self):
+        self.requested = []
+
+    def request(self, file_id):
+        self.requested.append(file_id)
+
+
+def cite(index, file_id=None, kind="file_citation"):
+    citation = SimpleNamespace(file_id=file_id) if file_id else None
+    return SimpleNamespace(type=kind, index=index, file_citation=citation)
+
+
+def test_streamed_pieces_are_merged_by_index():
+    names = Names()
+    citations = Citations(names, medicine_index=None)
+    citations.add([cite(0)])  # the file id arrives in a later delta
+    citations.add([cite(0, "file-a")])
+    citations.add([cite(0, "file-a"), cite(1, "file-b")])
+    citations.add([cite(2, "file-a"), cite(3, "file-c", kind="file_path")])
+    citations.add(None)
+
+    assert citations.file_ids == ["file-a", "file-b"]
+    assert names.requested == ["file-a", "file-b"]
+
+
+def test_whole_message_annotations_keep_their_order():
+    citations = Citations(Names(), medicine_index=None)
+    citations.add([cite(None, "file-b"), cite(None, "file-a"), cite(None, "file-b")])
+    assert citations.file_ids == ["file-b", "file-a"]
+
+
+def test_cited_files_resolve_to_leaflets_once():
+    listing = [SimpleNamespace(id="file-a", filename="IbuprofenRelieve.pdf"),
+               SimpleNamespace(id="file-b", filename="ibuprofenrelieve.PDF"),
+               SimpleNamespace(id="file-c", filename="notes.txt")]
+    names = FileNames(lambda: listing, retrieve_file=None).prefetch()
+    citations = Citations(names, get_medicine_index())
+    citations.add([cite(0, "file-a"), cite(1, "file-b"), cite(2, "file-c")])
+
+    cited = citations.medicines(timeout=5)
+    assert [m.url.rsplit("/", 1)[-1] for m in cited] == ["IbuprofenRelieve.pdf"]
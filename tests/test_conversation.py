@@ -0,0 +1,67 @@
+import threading
+from types import SimpleNamespace
+
+from pillai.conversation import Conversation
+
+
+class Summariser:
+    """chat.completions for the summary call; ``release`` lets it answer."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages):
+        self.prompts.append(messages[-1]["content"])
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Asked about panadol."))])
+
+
+def filled(client, turns=5, max_turns=4):
+    conversation = Conversation(client, budget=10_000, max_turns=max_turns)
+    for n in range(turns):
+        conversation.add(f"Question {n}?", f"Answer {n}.")
+    return conversation
+
+
+def test_history_waits_for_compaction():
+    client = Summariser()
+    conversation = filled(client)
+    assert client.started.wait(5)
+    history = []
+    reader = threading.Thread(target=lambda: history.extend(conversation.history()))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()  # the summary is still being written
+
+    client.release.set()
+    reader.join(5)
+    # The oldest turns are folded until at most half the turn cap is left
+    assert "Question 0?" in client.prompts[0] and "Question 2?" in client.prompts[0]
+    assert history[0] == {"role": "system",
+                          "content": "Summary of the earlier conversation:\nAsked about panadol."}
+    assert [m["content"] for m in history[1:]] == ["Question 3?", "Answer 3.", "Question 4?", "Answer 4."]
+    assert conversation.compactions == 1
+
+
+def test_failed_summary_drops_the_oldest_turns():
+    client = Summariser(error=RuntimeError("OpenAI down"))
+    client.release.set()
+    conversation = filled(client)
+
+    history = conversation.history()
+    assert [m["content"] for m in history[::2]] == ["Question 1?", "Question 2?", "Question 3?", "Question 4?"]
+    assert conversation.summary == "" and conversation.compactions == 0
+
+
+def test_under_budget_is_left_alone():
+    client = Summariser()
+    conversation = filled(client, turns=3)
+    assert len(conversation.history()) == 6
+    assert client.prompts == []
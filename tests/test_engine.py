@@ -0,0 +1,64 @@
+import asyncio
+
+from pillai.engine import BATCH, INTERACTIVE, WARM, PriorityLimiter
+
+
+async def queued(limiter, *priorities):
+    """Tasks acquiring ``limiter`` at each priority, in order, once they are all waiting."""
+    tasks = []
+    for priority in priorities:
+        tasks.append(asyncio.ensure_future(limiter.acquire(priority)))
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_waiters_get_in_by_priority_then_arrival():
+    async def scenario():
+        limiter = PriorityLimiter("test", 1)
+        await limiter.acquire()
+        tasks = await queued(limiter, WARM, BATCH, INTERACTIVE, BATCH)
+        names = dict(zip(tasks, ["warm", "batch 1", "interactive", "batch 2"]))
+        assert limiter.queue_depth() == 4 and limiter.queue_depth(BATCH) == 2
+
+        order = []
+        while len(order) < len(tasks):
+            limiter.release()
+            done, _ = await asyncio.wait([t for t in tasks if names[t] not in order],
+                                         return_when=asyncio.FIRST_COMPLETED)
+            order += [names[t] for t in done]
+            assert limiter.active == 1
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "batch 1", "batch 2", "warm"]
+
+
+def test_slot_handed_to_a_cancelled_waiter_goes_to_the_next():
+    async def scenario():
+        limiter = PriorityLimiter("test", 1)
+        await limiter.acquire()
+        first, second = await queued(limiter, INTERACTIVE, BATCH)
+        limiter.release()  # hands the slot to first...
+        first.cancel()  # ...which is cancelled before it runs
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.wait_for(second, 1)
+        assert first.cancelled()
+        assert limiter.active == 1
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        limiter = PriorityLimiter("test", 1)
+        await limiter.acquire()
+        first, second = await queued(limiter, INTERACTIVE, BATCH)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert limiter.queue_depth() == 1
+        limiter.release()
+        await asyncio.wait_for(second, 1)
+        assert limiter.active == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+import pytest
+
+from pillai.inbound import detect_language
+
+
+@pytest.mark.parametrize("question", [
+    "what about kai after panadol",
+    "When should I take panadol?",
+    "Which is better, nurofen or panadol?",
+])
+def test_english_stays_english(question):
+    assert detect_language(question) is None
+
+
+@pytest.mark.parametrize("question, language", [
+    ("He aha te rongoā mō te mate upoko?", "mi"),
+    ("Me pēhea taku whakamahi i te panadol?", "mi"),
+    ("E mafai ona ou inu le panadol pe a ma'itaga?", "sm"),
+    ("布洛芬可以和扑热息痛一起吃吗？", "zh-CN"),
+])
+def test_other_languages(question, language):
+    assert detect_language(question) == language
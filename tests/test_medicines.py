@@ -0,0 +1,31 @@
+import pytest
+
+from pillai.medicines import get_medicine_index
+
+
+@pytest.fixture(scope="module")
+def index():
+    return get_medicine_index()
+
+
+def brands(index, question):
+    return [m.brand for m in index.detect(question)]
+
+
+@pytest.mark.parametrize("question, unwanted", [
+    ("What is the usual dose of loratadine?", "lasix high dose"),
+    ("What time should I take loratadine?", "mersynonight night time pain relief"),
+    ("Can I drink alcohol with panadol?", "elocon alcohol free"),
+    ("What helps a sore throat?", "betadine sore throat gargle"),
+])
+def test_generic_words_link_nothing(index, question, unwanted):
+    assert unwanted not in brands(index, question)
+
+
+def test_form_words_link_nothing(index):
+    assert brands(index, "Can film coated tablets be crushed?") == []
+
+
+def test_brand_still_linked(index):
+    assert brands(index, "Is Lasix high dose safe?") == ["lasix"]
+    assert "betadine sore throat gargle" in brands(index, "Can kids use Betadine sore throat gargle?")
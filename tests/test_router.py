@@ -0,0 +1,62 @@
+import pytest
+
+from pillai.router import MAX_SPILL, ModelRouter, classify
+
+
+@pytest.mark.parametrize("question, known, kind", [
+    ("What is panadol used for?", ["panadol"], "simple"),
+    ("Can I take panadol with nurofen?", ["panadol", "nurofen"], "complex"),
+    ("Is panadol safe in pregnancy?", ["panadol"], "complex"),
+    ("What should I do after an overdose of panadol?", ["panadol"], "complex"),
+    ("Can I take panadol with food?", ["panadol"], "complex"),
+    ("How should I store panadol tablets so they keep well in a hot and humid climate like ours?",
+     ["panadol"], "complex"),
+])
+def test_classify(question, known, kind):
+    assert classify(question, known) == kind
+
+
+def slow(router, tier, seconds, count=20):
+    for _ in range(count):
+        router.record(router.models[tier], seconds)
+
+
+def test_slow_strong_model_spills_up_to_its_cap():
+    router = ModelRouter(fast="fast", strong="strong", sla=10, rng=lambda: 0.0)
+    slow(router, "fast", 1)
+    slow(router, "strong", 20, count=50)
+    assert router.spill["strong"] == MAX_SPILL["strong"]
+
+    route = router.route("Can I take panadol with food?", ["panadol"])
+    assert (route.model, route.kind, route.spilled) == ("fast", "complex", True)
+
+
+@pytest.mark.parametrize("question", [
+    "Is panadol safe in pregnancy?",
+    "What should I do after an overdose of panadol?",
+    "Can I drink alcohol with panadol?",
+])
+def test_risk_questions_are_never_spilled(question):
+    router = ModelRouter(fast="fast", strong="strong", sla=10, rng=lambda: 0.0)
+    slow(router, "fast", 1)
+    slow(router, "strong", 20, count=50)
+
+    route = router.route(question, ["panadol"])
+    assert (route.model, route.spilled) == ("strong", False)
+
+
+def test_no_spill_when_both_models_are_slow():
+    router = ModelRouter(fast="fast", strong="strong", sla=10, rng=lambda: 0.0)
+    slow(router, "fast", 20)
+    slow(router, "strong", 20)
+    assert router.route("Can I take panadol with food?", ["panadol"]).model == "strong"
+
+
+def test_spill_shrinks_once_back_within_the_sla():
+    router = ModelRouter(fast="fast", strong="strong", sla=10, window=20, rng=lambda: 0.0)
+    slow(router, "fast", 1)
+    slow(router, "strong", 20)
+    assert router.spill["strong"] > 0
+    slow(router, "strong", 1, count=40)
+    assert router.spill["strong"] == 0
+    assert router.route("Can I take panadol with food?", ["panadol"]).model == "strong"
@@ -0,0 +1,60 @@
+import pytest
+
+from pillai.cache import cache_key
+from pillai.semantic import SEMANTIC_THRESHOLD, SemanticIndex, guard_terms, vectorize
+
+
+def cached(*questions):
+    index = SemanticIndex()
+    for question in questions:
+        index.add(question, "en", False)
+    return index
+
+
+def test_paraphrase_hits():
+    index = cached("Can I take ibuprofen when pregnant?")
+    assert index.lookup("Can I take ibuprofen while pregnant?", "en", False)[0] == \
+        cache_key("Can I take ibuprofen when pregnant?", "en", False)
+
+
+def test_different_amount_misses():
+    index = cached("Can I take 2 panadol at once?")
+    assert index.lookup("Can I take 8 panadol at once?", "en", False) is None
+    assert index.lookup("Can I take eight panadol at once?", "en", False) is None
+
+
+def test_different_unit_misses():
+    index = cached("Is 500 mg of paracetamol too much?")
+    assert index.lookup("Is 500 ml of paracetamol too much?", "en", False) is None
+
+
+def test_negation_misses():
+    index = cached("Can I take ibuprofen when pregnant?")
+    assert index.lookup("Can I not take ibuprofen when pregnant?", "en", False) is None
+    assert index.lookup("Why can't I take ibuprofen when pregnant?", "en", False) is None
+
+
+def test_short_guard_terms_kept():
+    assert {"2", "mg", "no"} <= guard_terms("No more than 2 mg?")
+
+
+@pytest.mark.parametrize("cached_question, question", [
+    ("Can I give panadol to my dog?", "Can I give panadol to my cat?"),
+    ("Can I take ibuprofen with tea?", "Can I take ibuprofen with gin?"),
+    ("Can I take panadol if I have flu?", "Can I take panadol if I have HIV?"),
+    ("Is ibuprofen ok for my son?", "Is ibuprofen ok for my mum?"),
+    ("Can I take ibuprofen while pregnant?", "Can she take ibuprofen while pregnant?"),
+])
+def test_short_content_words_miss(cached_question, question):
+    # These score above the threshold, so only the guard terms keep them apart
+    assert vectorize(cached_question) @ vectorize(question) > SEMANTIC_THRESHOLD
+    assert cached(cached_question).lookup(question, "en", False) is None
+
+
+@pytest.mark.parametrize("cached_question, question", [
+    ("Can I take panadol with food?", "is it ok to take panadol with food"),
+    ("What are the side effects of panadol?", "panadol side effects"),
+    ("How often can I take panadol?", "how often should I take panadol"),
+])
+def test_rewordings_hit(cached_question, question):
+    assert cached(cached_question).lookup(question, "en", False)[0] == cache_key(cached_question, "en", False)
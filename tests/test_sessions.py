@@ -0,0 +1,53 @@
+from pillai.sessions import SessionRegistry
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sweep_evicts_idle_sessions_and_deletes_their_threads():
+    clock = Clock()
+    deleted = []
+
+    def delete_thread(thread_id):
+        if thread_id == "thread_broken":
+            raise RuntimeError("404")
+        deleted.append(thread_id)
+
+    registry = SessionRegistry(delete_thread, idle_timeout=60, clock=clock)
+    idle = {"thread_id": "thread_idle", "last_ttft": 0.4, "memory_toggle": True}
+    broken = {"thread_id": "thread_broken"}
+    active = {"thread_id": "thread_active"}
+    registry.touch("idle", idle)
+    registry.touch("broken", broken)
+    clock.now = 50
+    registry.touch("active", active)
+
+    clock.now = 61
+    assert registry.sweep() == 2
+    registry._reaper.shutdown(wait=True)
+
+    # The app's keys go, widget state stays; the active session is untouched
+    assert idle == {"memory_toggle": True}
+    assert active == {"thread_id": "thread_active"}
+    assert deleted == ["thread_idle"]
+    report = registry.report()
+    assert report["sessions"] == 1
+    assert (report["evicted"], report["threads_deleted"], report["thread_delete_failures"]) == (2, 1, 1)
+
+
+def test_activity_keeps_a_session():
+    clock = Clock()
+    registry = SessionRegistry(idle_timeout=60, clock=clock)
+    state = {"last_ttft": 0.4}
+    registry.touch("s", state)
+    clock.now = 50
+    registry.touch("s", state)
+    clock.now = 100
+    assert registry.sweep() == 0
+    clock.now = 111
+    assert registry.sweep() == 1
+    assert state == {}
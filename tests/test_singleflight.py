@@ -0,0 +1,29 @@
+import threading
+
+from pillai.singleflight import SingleFlight, follow
+
+
+class Box:
+    def __init__(self):
+        self.shown = []
+
+    def markdown(self, text, **kwargs):
+        self.shown.append(text)
+
+
+def test_follower_gets_the_leaders_answer_and_warning():
+    flights = SingleFlight()
+    flight, leader = flights.begin("key")
+    follower_flight, follower = flights.begin("key")
+    assert leader and not follower and follower_flight is flight
+
+    box = Box()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(follow(box, follower_flight, timeout=5)))
+    thread.start()
+    flight.tee(Box()).markdown("Take it")
+    flight.finish(("Take it with food.", "translation_unavailable"))
+    thread.join()
+
+    assert result == [("Take it with food.", "translation_unavailable")]
+    assert box.shown in ([], ["Take it"])  # the follower may join after the update
@@ -0,0 +1,16 @@
+from pillai.timing import RerunStats
+
+
+def test_send_runs_are_kept_apart_from_warm_reruns():
+    stats = RerunStats()
+    stats.record(0.0, 2.0)  # cold start
+    stats.record(0.0, 0.01)
+    stats.record(0.0, 3.0, send=True)
+    stats.record(0.0, 0.03)
+
+    report = stats.report()
+    assert report["cold_ms"] == 2000
+    assert report["warm_p95_ms"] == 30
+    assert report["warm_last_ms"] == 30
+    assert (report["send_runs"], report["send_p50_ms"]) == (1, 3000)
+    assert report["runs"] == 4
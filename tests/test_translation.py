@@ -0,0 +1,34 @@
+import time
+from types import SimpleNamespace
+
+from deep_translator import google
+
+from pillai.cache import SQLiteStore
+from pillai.translation import FakeBackend, GoogleBackend, Translator
+
+
+def test_google_backend_keeps_concurrent_chunks_apart(monkeypatch):
+    def fake_get(url, params=None, **kwargs):
+        # Read the text late, like a slow request, so a translator shared
+        # between threads would have had its parameters overwritten by now
+        time.sleep(0.005)
+        html = f'<div class="t0">[{params["tl"]}] {params["q"]}</div>'
+        return SimpleNamespace(status_code=200, text=html, close=lambda: None)
+
+    monkeypatch.setattr(google.requests, "get", fake_get)
+    translator = Translator(GoogleBackend(), max_workers=8)
+    paragraphs = [f"Paragraph {n} about taking panadol." for n in range(40)]
+
+    translated = translator.translate("\n\n".join(paragraphs), "mi")
+
+    assert translated.split("\n\n") == [f"[mi] {p}" for p in paragraphs]
+
+
+def test_unshared_text_stays_out_of_the_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cache.sqlite3"), "translations")
+    translator = Translator(FakeBackend(), store=store)
+
+    translator.translate_counted("He aha te rongoā mō te mate upoko?", "en", shared=False)
+    assert store.keys(0) == []
+    translator.translate_counted("Take it with food.", "mi")
+    assert len(store.keys(0)) == 1
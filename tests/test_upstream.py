@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from pillai.upstream import CircuitBreaker, CircuitOpen, DeadlineExceeded, Upstream
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def half_open():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+    breaker.failure()
+    clock.now = 10
+    assert breaker.state == "half-open"
+    return Upstream("test", retries=0, breaker=breaker)
+
+
+def test_interrupted_guard_gives_the_trial_back():
+    upstream = half_open()
+    with pytest.raises(KeyboardInterrupt):
+        with upstream.guard():
+            raise KeyboardInterrupt
+    with upstream.guard():
+        pass
+    assert upstream.breaker.state == "closed"
+
+
+def test_closed_stream_gives_the_trial_back():
+    upstream = half_open()
+
+    def stream():
+        with upstream.guard():
+            yield "a"
+            yield "b"
+
+    chunks = stream()
+    next(chunks)
+    chunks.close()  # GeneratorExit inside the guard
+    assert upstream.call(lambda: "ok") == "ok"
+
+
+def test_cancelled_acall_gives_the_trial_back():
+    upstream = half_open()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def cancel():
+        task = asyncio.ensure_future(upstream.acall(slow))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert upstream.call(lambda: "ok") == "ok"
+
+
+def test_only_one_trial_at_a_time():
+    upstream = half_open()
+    with upstream.guard():
+        with pytest.raises(CircuitOpen):
+            upstream.call(lambda: "ok")
+
+
+def test_stream_failing_part_way_counts_as_a_failure():
+    upstream = Upstream("test")
+
+    async def broken_stream():
+        async with upstream.aguard(admitted=True):
+            raise ConnectionError("stream cut off")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(broken_stream())
+    assert upstream.breaker.failures == 1
+    assert upstream.stats["calls"] == 0  # already counted when the stream was opened
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def failing(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_rejected_requests_leave_the_breaker_closed():
+    upstream = Upstream("test", retries=0)
+    for code in (400, 400, 401, 404, 400, 400):
+        with pytest.raises(APIError):
+            upstream.call(failing(APIError(code)))
+    assert upstream.breaker.state == "closed"
+    assert upstream.stats["failures"] == 6
+
+    for _ in range(5):
+        with pytest.raises(APIError):
+            upstream.call(failing(APIError(503)))
+    assert upstream.breaker.state == "open"
+
+
+def test_rejected_trial_leaves_the_breaker_half_open():
+    upstream = half_open()
+    with pytest.raises(APIError):
+        upstream.call(failing(APIError(400)))
+    assert upstream.call(lambda: "ok") == "ok"
+    assert upstream.breaker.state == "closed"
+
+
+def test_deadline_cancels_queued_attempts():
+    upstream = Upstream("test", retries=0, max_workers=1)
+    release = threading.Event()
+    upstream._pool.submit(release.wait)  # the only worker is busy
+    sent = []
+
+    with pytest.raises(DeadlineExceeded):
+        upstream.call(sent.append, "request", deadline=0.05)
+    release.set()
+    upstream._pool.shutdown(wait=True)
+    assert sent == []
+
+
+def test_malformed_retry_after_falls_back_to_backoff():
+    upstream = Upstream("test", retries=1, backoff=0.01)
+    errors = [APIError(429, {"retry-after": "in a bit"})]
+
+    def fn():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert upstream.call(fn) == "ok"
+    assert upstream.stats["retries"] == 1